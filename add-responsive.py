@@ -2,6 +2,8 @@
 
 import os
 
+from blogbuild.output import write_atomic
+
 # 記事ページ用の共通レスポンシブCSS
 RESPONSIVE_CSS = '''
   /* スマホ対応 */
@@ -141,27 +143,38 @@ FILES = [
     "about/index.html"
 ]
 
-for filepath in FILES:
-    if not os.path.exists(filepath):
-        print(f"File not found: {filepath}")
-        continue
-    
-    print(f"Processing {filepath}...")
-    
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
+def add_responsive_css(content):
+    """HTML文字列の</style>の直前にレスポンシブCSSを挿入して返す"""
     # すでにレスポンシブCSSがあるかチェック
     if "/* スマホ対応 */" in content:
-        print(f"  -> Already has responsive CSS, skipping")
-        continue
-    
-    # </style>の直前に挿入
-    content = content.replace("</style>", RESPONSIVE_CSS + "\n</style>")
-    
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(content)
-    
-    print(f"  -> Added responsive CSS")
+        return content
+    return content.replace("</style>", RESPONSIVE_CSS + "\n</style>")
+
+
+def main():
+    for filepath in FILES:
+        if not os.path.exists(filepath):
+            print(f"File not found: {filepath}")
+            continue
+        
+        print(f"Processing {filepath}...")
+        
+        with open(filepath, 'r', encoding='utf-8') as f:
+            content = f.read()
+        
+        # すでにレスポンシブCSSがあるかチェック
+        if "/* スマホ対応 */" in content:
+            print(f"  -> Already has responsive CSS, skipping")
+            continue
+        
+        content = add_responsive_css(content)
+        
+        write_atomic(filepath, content)
+        
+        print(f"  -> Added responsive CSS")
+
+    print("Done!")
+
 
-print("Done!")
+if __name__ == '__main__':
+    main()
@@ -9,10 +9,14 @@
 5. 404ページ（別途作成）
 """
 
+import html as html_lib
+import json
 import os
 import re
 from pathlib import Path
 
+from blogbuild.output import write_atomic
+
 # 記事のカテゴリ分類
 CATEGORIES = {
     'news': {
@@ -125,6 +129,133 @@ ARTICLE_INFO = {
     }
 }
 
+# パンくずリストのCSS
+BREADCRUMB_CSS = '''.breadcrumb {
+  font-size: 12px;
+  color: #999;
+  padding: 8px 24px;
+  background: #fff;
+  border-bottom: 1px solid #eee;
+}
+.breadcrumb a {
+  color: #e63946;
+  text-decoration: none;
+}
+.breadcrumb a:hover {
+  text-decoration: underline;
+}
+.breadcrumb .current {
+  color: #333;
+}
+'''
+
+# SNSシェアボタンのCSS
+SHARE_BUTTONS_CSS = '''.share-buttons {
+  margin: 40px 0;
+  padding: 24px;
+  background: #fafafa;
+  border-radius: 8px;
+  text-align: center;
+}
+.share-title {
+  font-size: 14px;
+  font-weight: 700;
+  color: #666;
+  margin-bottom: 16px;
+}
+.share-buttons-inner {
+  display: flex;
+  gap: 12px;
+  justify-content: center;
+  flex-wrap: wrap;
+}
+.share-btn {
+  display: inline-flex;
+  align-items: center;
+  gap: 8px;
+  padding: 12px 24px;
+  background: #fff;
+  border: 1px solid #ddd;
+  border-radius: 6px;
+  color: #333;
+  text-decoration: none;
+  font-size: 14px;
+  font-weight: 700;
+  transition: all 0.2s ease;
+  box-shadow: 0 1px 3px rgba(0,0,0,0.05);
+}
+.share-btn:hover {
+  transform: translateY(-2px);
+  box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+}
+.share-btn-x:hover {
+  background: #000;
+  color: #fff;
+  border-color: #000;
+}
+.share-btn-hatena:hover {
+  background: #00A4DE;
+  color: #fff;
+  border-color: #00A4DE;
+}
+.share-icon {
+  font-size: 18px;
+}
+'''
+
+# 関連記事のCSS
+RELATED_ARTICLES_CSS = '''.related-articles {
+  margin: 48px 0;
+  padding: 32px;
+  background: #fafafa;
+  border-radius: 8px;
+}
+.related-title {
+  font-size: 20px;
+  font-weight: 700;
+  color: #333;
+  margin-bottom: 24px;
+  text-align: center;
+}
+.related-cards {
+  display: grid;
+  grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
+  gap: 16px;
+}
+.related-card {
+  display: block;
+  padding: 16px;
+  background: #fff;
+  border-left: 3px solid #e63946;
+  border-radius: 4px;
+  text-decoration: none;
+  color: #333;
+  transition: transform 0.2s ease, box-shadow 0.2s ease;
+  box-shadow: 0 1px 3px rgba(0,0,0,0.05);
+}
+.related-card:hover {
+  transform: translateY(-2px);
+  box-shadow: 0 4px 12px rgba(0,0,0,0.1);
+}
+.related-card-title {
+  font-size: 15px;
+  font-weight: 700;
+  color: #333;
+  margin-bottom: 8px;
+  line-height: 1.4;
+}
+.related-card-desc {
+  font-size: 13px;
+  color: #666;
+  line-height: 1.6;
+}
+@media (max-width: 768px) {
+  .related-cards {
+    grid-template-columns: 1fr;
+  }
+}
+'''
+
 def get_category(article_slug):
     """記事のカテゴリを取得"""
     for cat_key, cat_data in CATEGORIES.items():
@@ -132,6 +263,12 @@ def get_category(article_slug):
             return cat_key, cat_data['label']
     return None, None
 
+def get_article_info(article_slug, articles=None):
+    """記事の情報を取得（articles にあればそちらを優先、なければ ARTICLE_INFO）"""
+    if articles and article_slug in articles:
+        return articles[article_slug]
+    return ARTICLE_INFO.get(article_slug, {})
+
 def get_related_articles(article_slug, max_count=3):
     """関連記事を取得（同じカテゴリから2-3本）"""
     cat_key, _ = get_category(article_slug)
@@ -154,70 +291,69 @@ def get_related_articles(article_slug, max_count=3):
     
     return same_category[:max_count]
 
-def create_breadcrumb(article_slug):
-    """パンくずリストHTMLを生成"""
+def breadcrumb_category(article_slug, category=None):
+    """パンくずの2番目の (表示名, サイトのルートからのパス)
+
+    category を渡せばそれを使う（CATEGORIES にない記事のタグなど）。パスが None ならリンクなし。
+    """
+    if category is not None:
+        return category
     cat_key, cat_label = get_category(article_slug)
-    article_title = ARTICLE_INFO.get(article_slug, {}).get('title', article_slug)
-    
-    breadcrumb_html = f'''
-<!-- パンくずリスト -->
-<nav class="breadcrumb" aria-label="Breadcrumb">
-  <a href="../">Home</a> &gt; <span>{cat_label}</span> &gt; <span class="current">{article_title}</span>
-</nav>
+    return cat_label, (f'category/{cat_key}/' if cat_key else None)
 
-<style>
-.breadcrumb {{
-  font-size: 12px;
-  color: #999;
-  padding: 8px 24px;
-  background: #fff;
-  border-bottom: 1px solid #eee;
-}}
-.breadcrumb a {{
-  color: #e63946;
-  text-decoration: none;
-}}
-.breadcrumb a:hover {{
-  text-decoration: underline;
-}}
-.breadcrumb .current {{
-  color: #333;
-}}
-</style>
+def create_breadcrumb_nav(article_slug, articles=None, category=None):
+    """パンくずリストの<nav>を生成（カテゴリはカテゴリ別の記事一覧へのリンク。カテゴリがなければ省く）"""
+    cat_label, cat_path = breadcrumb_category(article_slug, category)
+    article_title = get_article_info(article_slug, articles).get('title', article_slug)
+    crumbs = ['<a href="../">Home</a>']
+    if cat_label:
+        label = html_lib.escape(cat_label)
+        crumbs.append(f'<a href="../{cat_path}">{label}</a>' if cat_path else f'<span>{label}</span>')
+    crumbs.append(f'<span class="current">{html_lib.escape(article_title)}</span>')
+    return f'''<nav class="breadcrumb" aria-label="Breadcrumb">
+  {' &gt; '.join(crumbs)}
+</nav>'''
 
-<!-- Schema.org BreadcrumbList -->
-<script type="application/ld+json">
+def create_breadcrumb_list(article_slug, articles=None, category=None):
+    """Schema.org の BreadcrumbList（JSON-LD）を生成（カテゴリがなければ Home → 記事の2件）"""
+    cat_label, cat_path = breadcrumb_category(article_slug, category)
+    article_title = get_article_info(article_slug, articles).get('title', article_slug)
+    items = [('Home', '')]
+    if cat_label:
+        items.append((cat_label, cat_path or '#'))
+    items.append((article_title, f'{article_slug}/'))
+    elements = ',\n'.join(f'''    {{
+      "@type": "ListItem",
+      "position": {position},
+      "name": {json.dumps(name, ensure_ascii=False)},
+      "item": "https://daisuki-koshian.github.io/blog/{path}"
+    }}''' for position, (name, path) in enumerate(items, 1))
+    return f'''<script type="application/ld+json">
 {{
   "@context": "https://schema.org",
   "@type": "BreadcrumbList",
   "itemListElement": [
-    {{
-      "@type": "ListItem",
-      "position": 1,
-      "name": "Home",
-      "item": "https://daisuki-koshian.github.io/blog/"
-    }},
-    {{
-      "@type": "ListItem",
-      "position": 2,
-      "name": "{cat_label}",
-      "item": "https://daisuki-koshian.github.io/blog/#"
-    }},
-    {{
-      "@type": "ListItem",
-      "position": 3,
-      "name": "{article_title}",
-      "item": "https://daisuki-koshian.github.io/blog/{article_slug}/"
-    }}
+{elements}
   ]
 }}
-</script>
+</script>'''
+
+def create_breadcrumb(article_slug, articles=None, category=None):
+    """パンくずリストHTMLを生成"""
+    return f'''
+<!-- パンくずリスト -->
+{create_breadcrumb_nav(article_slug, articles, category)}
+
+<style>
+{BREADCRUMB_CSS}</style>
+
+<!-- Schema.org BreadcrumbList -->
+{create_breadcrumb_list(article_slug, articles, category)}
 '''
-    return breadcrumb_html
 
-def create_reading_time(article_slug):
+def create_reading_time(article_slug, articles=None):
     """読了時間HTMLを生成"""
-    reading_time = ARTICLE_INFO.get(article_slug, {}).get('reading_time', 3)
+    reading_time = get_article_info(article_slug, articles).get('reading_time', 3)
     
     return f'''
 <div class="reading-time" style="font-size: 13px; color: #999; text-align: center; margin: 24px 0; padding: 12px; background: #f9f9f9; border-radius: 4px;">
@@ -225,9 +361,9 @@ def create_reading_time(article_slug):
 </div>
 '''
 
-def create_share_buttons(article_slug):
+def create_share_buttons(article_slug, articles=None):
     """SNSシェアボタンHTMLを生成"""
-    article_title = ARTICLE_INFO.get(article_slug, {}).get('title', article_slug)
+    article_title = get_article_info(article_slug, articles).get('title', article_slug)
     article_url = f"https://daisuki-koshian.github.io/blog/{article_slug}/"
     
     import urllib.parse
@@ -251,73 +387,23 @@ def create_share_buttons(article_slug):
 </div>
 
 <style>
-.share-buttons {{
-  margin: 40px 0;
-  padding: 24px;
-  background: #fafafa;
-  border-radius: 8px;
-  text-align: center;
-}}
-.share-title {{
-  font-size: 14px;
-  font-weight: 700;
-  color: #666;
-  margin-bottom: 16px;
-}}
-.share-buttons-inner {{
-  display: flex;
-  gap: 12px;
-  justify-content: center;
-  flex-wrap: wrap;
-}}
-.share-btn {{
-  display: inline-flex;
-  align-items: center;
-  gap: 8px;
-  padding: 12px 24px;
-  background: #fff;
-  border: 1px solid #ddd;
-  border-radius: 6px;
-  color: #333;
-  text-decoration: none;
-  font-size: 14px;
-  font-weight: 700;
-  transition: all 0.2s ease;
-  box-shadow: 0 1px 3px rgba(0,0,0,0.05);
-}}
-.share-btn:hover {{
-  transform: translateY(-2px);
-  box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-}}
-.share-btn-x:hover {{
-  background: #000;
-  color: #fff;
-  border-color: #000;
-}}
-.share-btn-hatena:hover {{
-  background: #00A4DE;
-  color: #fff;
-  border-color: #00A4DE;
-}}
-.share-icon {{
-  font-size: 18px;
-}}
-</style>
+{SHARE_BUTTONS_CSS}</style>
 '''
     return share_html
 
-def create_related_articles(article_slug):
-    """関連記事セクションHTMLを生成"""
-    related = get_related_articles(article_slug, 3)
+def create_related_articles(article_slug, articles=None, related=None):
+    """関連記事セクションHTMLを生成（related を渡さなければ同じカテゴリから選ぶ）"""
+    if related is None:
+        related = get_related_articles(article_slug, 3)
     
     if not related:
         return ""
     
     cards_html = ""
     for rel_slug in related:
-        rel_info = ARTICLE_INFO.get(rel_slug, {})
-        rel_title = rel_info.get('title', rel_slug)
-        rel_desc = rel_info.get('desc', '')
+        rel_info = get_article_info(rel_slug, articles)
+        rel_title = html_lib.escape(rel_info.get('title', rel_slug))
+        rel_desc = html_lib.escape(rel_info.get('desc', ''))
         
         cards_html += f'''
         <a href="../{rel_slug}/" class="related-card">
@@ -336,60 +422,95 @@ def create_related_articles(article_slug):
 </div>
 
 <style>
-.related-articles {{
-  margin: 48px 0;
-  padding: 32px;
-  background: #fafafa;
-  border-radius: 8px;
-}}
-.related-title {{
-  font-size: 20px;
-  font-weight: 700;
-  color: #333;
-  margin-bottom: 24px;
-  text-align: center;
-}}
-.related-cards {{
-  display: grid;
-  grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-  gap: 16px;
-}}
-.related-card {{
-  display: block;
-  padding: 16px;
-  background: #fff;
-  border-left: 3px solid #e63946;
-  border-radius: 4px;
-  text-decoration: none;
-  color: #333;
-  transition: transform 0.2s ease, box-shadow 0.2s ease;
-  box-shadow: 0 1px 3px rgba(0,0,0,0.05);
-}}
-.related-card:hover {{
-  transform: translateY(-2px);
-  box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-}}
-.related-card-title {{
-  font-size: 15px;
-  font-weight: 700;
-  color: #333;
-  margin-bottom: 8px;
-  line-height: 1.4;
-}}
-.related-card-desc {{
-  font-size: 13px;
-  color: #666;
-  line-height: 1.6;
-}}
-@media (max-width: 768px) {{
-  .related-cards {{
-    grid-template-columns: 1fr;
-  }}
-}}
-</style>
+{RELATED_ARTICLES_CSS}</style>
 '''
     return related_html
 
+# 挿入済みの関連記事セクション（create_related_articles の出力。<style>は外部CSSに移されていることがある）
+RELATED_BLOCK_PATTERN = re.compile(
+    r'\n<!-- 関連記事 -->\n<div class="related-articles">.*?\n  </div>\n</div>\n'
+    r'(?:\n<style>\n\.related-articles \{.*?</style>)?\n',
+    re.DOTALL)
+
+# ビルド（create_breadcrumb）が入れたパンくず: 目印のコメントのすぐ後の<nav>と、その後の BreadcrumbList
+BREADCRUMB_BLOCK = re.compile(
+    r'(<!-- パンくずリスト -->\n)<nav class="breadcrumb" aria-label="Breadcrumb">.*?</nav>'
+    r'((?:(?!<div class="hero">|<nav ).)*?<!-- Schema\.org BreadcrumbList -->\n)'
+    r'<script type="application/ld\+json">.*?</script>',
+    re.DOTALL)
+# 手で書いたパンくず（ビルドの目印がなければ、これがあるページには入れない）
+EXISTING_BREADCRUMB = re.compile(r'<nav class="breadcrumb"|"@type": *"BreadcrumbList"')
+
+def insert_breadcrumb(html, article_slug, articles=None, category=None):
+    """パンくずリストを<div class="hero">の直前に挿入（ビルドで挿入済みならその中身を更新）"""
+    block = BREADCRUMB_BLOCK.search(html)
+    if block:
+        updated = (block.group(1) + create_breadcrumb_nav(article_slug, articles, category) + block.group(2)
+                   + create_breadcrumb_list(article_slug, articles, category))
+        return html[:block.start()] + updated + html[block.end():]
+    if EXISTING_BREADCRUMB.search(html):
+        return html
+    breadcrumb = create_breadcrumb(article_slug, articles, category)
+    return html.replace('<div class="hero">', f'{breadcrumb}\n<div class="hero">')
+
+# ビルド（create_reading_time）が入れた読了時間の分数
+READING_TIME_MINUTES = re.compile(r'(<div class="reading-time"[^>]*>\s*⏱ 約)\d+(分で読めます\s*</div>)')
+
+def insert_reading_time(html, article_slug, articles=None):
+    """読了時間をhero直後、<div class="content-wrapper">の前に挿入（挿入済みなら分数だけ更新）
+
+    ビルドが入れた .reading-time がなくても「⏱ 約」があれば、手で書いた読了時間があるので何もしない。
+    """
+    if 'class="reading-time"' in html:
+        minutes = get_article_info(article_slug, articles).get('reading_time', 3)
+        return READING_TIME_MINUTES.sub(lambda m: f'{m.group(1)}{minutes}{m.group(2)}', html, count=1)
+    if '⏱ 約' in html:
+        return html
+    reading_time = create_reading_time(article_slug, articles)
+    hero_end = '</div>\n</div>\n\n<div class="content-wrapper">'
+    if hero_end in html:
+        return html.replace(hero_end, f'</div>\n</div>\n{reading_time}\n<div class="content-wrapper">')
+    # 別パターンを試す
+    hero_end_alt = '</div>\n\n<div class="content-wrapper">'
+    if hero_end_alt in html:
+        return html.replace(hero_end_alt, f'</div>\n{reading_time}\n<div class="content-wrapper">')
+    return html
+
+def insert_share_buttons(html, article_slug, articles=None):
+    """SNSシェアボタンをfeedback-sectionの直後に挿入（挿入済みか、手で書いたボタンがあれば何もしない）"""
+    if '<!-- SNSシェアボタン -->' in html or '<div class="share-buttons">' in html:
+        return html
+    share_buttons = create_share_buttons(article_slug, articles)
+    feedback_end = re.search(r'(<div class="feedback-section">.*?</div>)', html, re.DOTALL)
+    if feedback_end:
+        insert_pos = feedback_end.end()
+        html = html[:insert_pos] + '\n' + share_buttons + html[insert_pos:]
+    return html
+
+def insert_related_articles(html, article_slug, articles=None, related=None):
+    """既存のnext-readを削除し、関連記事を</article>の直前に挿入（挿入済みなら差し替え）"""
+    related_articles = create_related_articles(article_slug, articles, related)
+    if '<!-- 関連記事 -->' in html:
+        return RELATED_BLOCK_PATTERN.sub(lambda m: related_articles, html, count=1)
+    # 手で書いた関連記事があれば、そのままにする
+    if not related_articles or '<div class="related-articles">' in html:
+        return html
+    
+    # 既存のnext-readセクションを削除
+    next_read_pattern = r'<div class="next-read">.*?</div>\s*</div>'
+    html = re.sub(next_read_pattern, '', html, flags=re.DOTALL)
+    
+    # 関連記事を</article>の直前に挿入
+    return html.replace('  </article>', f'{related_articles}\n  </article>')
+
+def add_features(html, article_slug, articles=None):
+    """HTML文字列に4つの機能を追加して返す"""
+    html = insert_breadcrumb(html, article_slug, articles)
+    html = insert_reading_time(html, article_slug, articles)
+    html = insert_share_buttons(html, article_slug, articles)
+    html = insert_related_articles(html, article_slug, articles)
+    return html
+
 def process_article(article_dir):
     """1つの記事を処理"""
     article_slug = os.path.basename(article_dir)
@@ -407,41 +528,10 @@ def process_article(article_dir):
         print(f"✓ {article_slug}: already processed")
         return False
     
-    # 1. パンくずリスト（<div class="hero">の直前）
-    breadcrumb = create_breadcrumb(article_slug)
-    html = html.replace('<div class="hero">', f'{breadcrumb}\n<div class="hero">')
-    
-    # 2. 読了時間（</div><!-- /hero -->の直後、<div class="content-wrapper">の前）
-    reading_time = create_reading_time(article_slug)
-    hero_end = '</div>\n</div>\n\n<div class="content-wrapper">'
-    if hero_end in html:
-        html = html.replace(hero_end, f'</div>\n</div>\n{reading_time}\n<div class="content-wrapper">')
-    else:
-        # 別パターンを試す
-        hero_end_alt = '</div>\n\n<div class="content-wrapper">'
-        if hero_end_alt in html:
-            html = html.replace(hero_end_alt, f'</div>\n{reading_time}\n<div class="content-wrapper">')
-    
-    # 3. SNSシェアボタン（feedback-sectionの直後）
-    share_buttons = create_share_buttons(article_slug)
-    feedback_end = re.search(r'(<div class="feedback-section">.*?</div>)', html, re.DOTALL)
-    if feedback_end:
-        insert_pos = feedback_end.end()
-        html = html[:insert_pos] + '\n' + share_buttons + html[insert_pos:]
-    
-    # 4. 関連記事（既存のnext-readを置き換え、または追加）
-    related_articles = create_related_articles(article_slug)
-    
-    # 既存のnext-readセクションを削除
-    next_read_pattern = r'<div class="next-read">.*?</div>\s*</div>'
-    html = re.sub(next_read_pattern, '', html, flags=re.DOTALL)
-    
-    # 関連記事を</article>の直前に挿入
-    html = html.replace('  </article>', f'{related_articles}\n  </article>')
+    html = add_features(html, article_slug)
     
     # ファイルに書き戻し
-    with open(index_path, 'w', encoding='utf-8') as f:
-        f.write(html)
+    write_atomic(index_path, html)
     
     print(f"✓ {article_slug}: features added")
     return True
@@ -6,14 +6,14 @@ Replaces analytics placeholders or inserts before </body>.
 import re
 from pathlib import Path
 
+from blogbuild.output import write_atomic
+
 GOATCOUNTER_SCRIPT = '''<script data-goatcounter="https://daisuki-koshian.goatcounter.com/count" async src="//gc.zgo.at/count.js"></script>'''
 
-def process_html_file(filepath):
-    """Add GoatCounter script to an HTML file."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    original_content = content
+def insert_goatcounter(content):
+    """Return content with the GoatCounter script in place (unchanged if impossible)."""
+    if 'data-goatcounter=' in content:
+        return content
     
     # Check for analytics placeholder comments
     analytics_patterns = [
@@ -22,25 +22,30 @@ def process_html_file(filepath):
         r'<!--\s*Analytics placeholder[^>]*-->'
     ]
     
-    replaced = False
     for pattern in analytics_patterns:
         if re.search(pattern, content):
-            content = re.sub(pattern, GOATCOUNTER_SCRIPT, content)
-            replaced = True
-            break
+            return re.sub(pattern, GOATCOUNTER_SCRIPT, content)
     
     # If no placeholder found, insert before </body>
-    if not replaced:
-        if '</body>' in content:
-            content = content.replace('</body>', f'{GOATCOUNTER_SCRIPT}\n</body>')
-        else:
-            print(f"Warning: No </body> tag found in {filepath}")
-            return False
+    if '</body>' in content:
+        return content.replace('</body>', f'{GOATCOUNTER_SCRIPT}\n</body>')
+    return content
+
+def process_html_file(filepath):
+    """Add GoatCounter script to an HTML file."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    original_content = content
+    
+    content = insert_goatcounter(content)
+    if content == original_content and '</body>' not in content:
+        print(f"Warning: No </body> tag found in {filepath}")
+        return False
     
     # Only write if content changed
     if content != original_content:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(content)
+        write_atomic(filepath, content)
         return True
     return False
 
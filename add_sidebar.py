@@ -7,6 +7,8 @@ import os
 import re
 from pathlib import Path
 
+from blogbuild.output import write_atomic
+
 SIDEBAR_CSS = """
   /* 2カラムレイアウト */
   .content-wrapper {
@@ -100,6 +102,27 @@ SIDEBAR_CSS = """
     color: #fff;
   }
 
+  .search-form {
+    margin: 0 0 12px 0;
+  }
+  .search-input {
+    width: 100%;
+    padding: 8px 12px;
+    font-size: 14px;
+    font-family: inherit;
+    color: var(--color-text);
+    background: var(--color-bg);
+    border: 1px solid var(--color-border);
+    border-radius: 6px;
+  }
+  .search-input:focus {
+    outline: none;
+    border-color: var(--color-accent);
+  }
+  .search-results:empty {
+    display: none;
+  }
+
   @media (max-width: 1024px) {
     .content-wrapper {
       flex-direction: column;
@@ -122,8 +145,19 @@ SIDEBAR_CSS = """
   }
 """
 
+# 記事検索（検索のスクリプトは blogbuild/search.py がビルド時に書き出して読み込ませる）
+SEARCH_SECTION = """        <div class="sidebar-section sidebar-search">
+          <h3>記事を検索</h3>
+          <form class="search-form" role="search">
+            <input type="search" class="search-input" id="search-input" name="q" placeholder="キーワードを入力" aria-label="記事を検索" autocomplete="off">
+          </form>
+          <ul class="sidebar-list search-results" id="search-results" aria-live="polite"></ul>
+        </div>
+        
+"""
+
 SIDEBAR_HTML = """      <aside class="sidebar">
-        <div class="sidebar-section">
+""" + SEARCH_SECTION + """        <div class="sidebar-section">
           <h3>最新記事</h3>
           <ul class="sidebar-list">
             <li><a href="../backtest-overview/">トレードシステム概要編</a></li>
@@ -146,55 +180,77 @@ SIDEBAR_HTML = """      <aside class="sidebar">
         <div class="sidebar-section">
           <h3>タグ</h3>
           <ul class="sidebar-tags">
-            <li><span class="sidebar-tag">OpenClaw</span></li>
-            <li><span class="sidebar-tag">Claude Code</span></li>
-            <li><span class="sidebar-tag">トレードシステム</span></li>
-            <li><span class="sidebar-tag">ComfyUI</span></li>
-            <li><span class="sidebar-tag">自動化</span></li>
-            <li><span class="sidebar-tag">コスト削減</span></li>
+            <li><a class="sidebar-tag" href="?q=OpenClaw">OpenClaw</a></li>
+            <li><a class="sidebar-tag" href="?q=Claude+Code">Claude Code</a></li>
+            <li><a class="sidebar-tag" href="?q=トレードシステム">トレードシステム</a></li>
+            <li><a class="sidebar-tag" href="?q=ComfyUI">ComfyUI</a></li>
+            <li><a class="sidebar-tag" href="?q=自動化">自動化</a></li>
+            <li><a class="sidebar-tag" href="?q=コスト削減">コスト削減</a></li>
           </ul>
         </div>
       </aside>"""
 
+# ビルド時に blogbuild/sidebar.py がメタデータから作り直すときの「人気記事」
+# （GoatCounter のエクスポートがなければこの順に載せる）
+POPULAR_ARTICLES = ['soul-md-merged', 'token-efficiency', 'backtest-overview']
 
-def process_file(filepath):
-    """HTMLファイルにサイドバーを追加"""
-    print(f"処理中: {filepath}")
-    
-    with open(filepath, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
+SIDEBAR_PATTERN = re.compile(r'[ \t]*<aside class="sidebar">.*?</aside>', re.DOTALL)
+
+
+# サイドバーを追加する記事
+TARGET_ARTICLES = [
+    'day1',
+    'soul-md-merged',
+    'comfyui',
+    'morning-briefing',
+    'token-efficiency',
+    'cron-heartbeat',
+    'multi-agent-flow',
+    'backtest-overview',
+    'backtest-failures',
+    'backtest-method',
+    'about',
+]
+
+
+def replace_sidebar(content, sidebar_html):
+    """既にあるサイドバーを sidebar_html に置き換えて返す（なければそのまま返す）"""
+    return SIDEBAR_PATTERN.sub(lambda m: sidebar_html, content, count=1)
+
+
+def add_sidebar(content, sidebar_html=SIDEBAR_HTML):
+    """HTML文字列にサイドバーを追加して返す（追加できなければそのまま返す）"""
     # 既にサイドバーがあるかチェック
     if 'class="sidebar"' in content:
-        print(f"  スキップ（既にサイドバーあり）")
-        return
+        return content
     
     # CSSを追加（.containerの定義の後に）
     # .container { の直後の } を探して、その後に追加
     css_pattern = r'(\.container\s*{[^}]+})'
     css_match = re.search(css_pattern, content)
     
-    if css_match:
-        # CSSを追加
-        insert_pos = css_match.end()
-        content = content[:insert_pos] + '\n' + SIDEBAR_CSS + content[insert_pos:]
-    else:
+    if not css_match:
         print(f"  警告: .containerのCSS定義が見つかりません")
-        return
-    
-    # HTMLを変更: <div class="container"> を見つけて、content-wrapperで囲む
-    # <div class="container"> を <div class="content-wrapper"><div class="main-content"> に変更
-    # </div> の最後の前にサイドバーを追加
+        return content
     
     # まず <div class="container"> を探す
     container_start_pattern = r'<div class="container">'
-    container_start_match = re.search(container_start_pattern, content)
-    
-    if not container_start_match:
+    if not re.search(container_start_pattern, content):
         print(f"  警告: <div class=\"container\"> が見つかりません")
-        return
+        return content
+    
+    # bodyの終了タグの位置を探す
+    if not re.search(r'</body>', content):
+        print(f"  警告: </body> が見つかりません")
+        return content
     
-    # <div class="container">を置換
+    # CSSを追加
+    insert_pos = css_match.end()
+    content = content[:insert_pos] + '\n' + SIDEBAR_CSS + content[insert_pos:]
+    
+    # HTMLを変更: <div class="container"> を見つけて、content-wrapperで囲む
+    # <div class="container"> を <div class="content-wrapper"><div class="main-content"> に変更
+    # </div> の最後の前にサイドバーを追加
     content = content.replace(
         '<div class="container">',
         '<div class="content-wrapper">\n  <div class="main-content">',
@@ -204,14 +260,7 @@ def process_file(filepath):
     # 最後の</div>の前にサイドバーを挿入
     # </body>の前で</div>を2つ閉じる必要がある
     # 戦略: </body>の直前に来る</div>を探して、その前にサイドバーを挿入
-    
-    # bodyの終了タグの位置を探す
-    body_end_pattern = r'</body>'
-    body_end_match = re.search(body_end_pattern, content)
-    
-    if not body_end_match:
-        print(f"  警告: </body> が見つかりません")
-        return
+    body_end_match = re.search(r'</body>', content)
     
     # </body>の前に戻って、最後の</div>を探す
     before_body = content[:body_end_match.start()]
@@ -220,19 +269,35 @@ def process_file(filepath):
     
     if last_div_end == -1:
         print(f"  警告: 終了</div>が見つかりません")
-        return
+        return content
     
     # その</div>の前にサイドバーを挿入し、さらに</div>を1つ追加
-    content = (
+    return (
         content[:last_div_end] +
-        '\n' + SIDEBAR_HTML + '\n' +
+        '\n' + sidebar_html + '\n' +
         '  </div>\n' +  # main-content の終了
         content[last_div_end:]  # 元の</div>（これがcontent-wrapperの終了になる）
     )
+
+
+def process_file(filepath):
+    """HTMLファイルにサイドバーを追加"""
+    print(f"処理中: {filepath}")
+    
+    with open(filepath, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    # 既にサイドバーがあるかチェック
+    if 'class="sidebar"' in content:
+        print(f"  スキップ（既にサイドバーあり）")
+        return
+    
+    new_content = add_sidebar(content)
+    if new_content == content:
+        return
     
     # ファイルに書き出し
-    with open(filepath, 'w', encoding='utf-8') as f:
-        f.write(content)
+    write_atomic(filepath, new_content)
     
     print(f"  完了")
 
@@ -241,21 +306,7 @@ def main():
     """メイン処理"""
     base_dir = Path('/tmp/blog-work')
     
-    articles = [
-        'day1',
-        'soul-md-merged',
-        'comfyui',
-        'morning-briefing',
-        'token-efficiency',
-        'cron-heartbeat',
-        'multi-agent-flow',
-        'backtest-overview',
-        'backtest-failures',
-        'backtest-method',
-        'about',
-    ]
-    
-    for article in articles:
+    for article in TARGET_ARTICLES:
         filepath = base_dir / article / 'index.html'
         if filepath.exists():
             try:
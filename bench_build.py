@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+ビルド全体のベンチマーク（記事数を増やした合成ブログで）
+
+今のブログ（記事28本）のページをひな形にして、記事を 100 / 1,000 / 10,000 本に増やした
+合成ブログを作り、次の2つのパイプラインを最初から最後まで実行する。
+  legacy : 既存のスクリプトを1ファイルずつ順に（add_sidebar.process_file →
+           add-responsive → enhance_mobile.enhance_article → add_features.process_article →
+           add_goatcounter.process_html_file）
+  build  : build.py と同じステージでの全ページビルド（--full）と、そのままもう一度
+           （rebuild、マニフェストで全ページスキップされるはず）
+それぞれ経過時間・最大RSS・ステージごとの時間を測り、JSONに保存する。
+--compare で前のコミットの結果と比べて、増えたものを表示する。
+
+合成した記事は、ひな形の記事と同じカテゴリ・サイドバー・モバイル対応の対象に加える
+（このプロセスの中でだけ CATEGORIES などに追加する）。最大RSSを記事数・パイプラインごとに
+測るため、それぞれ別のプロセスで実行する。
+
+使い方:
+  python3 bench_build.py [--templates .] [--sizes 100 1000 10000] [-j N]
+                         [--output .bench-results/build-<commit>.json] [--compare OLD.json]
+"""
+
+import argparse
+import contextlib
+import importlib
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Windowsでは最大RSSを測らない
+    resource = None
+
+import add_features
+import add_goatcounter
+import add_sidebar
+import enhance_mobile
+
+from blogbuild.engine import build
+from blogbuild.stages import CODE_FILES, DATA_NAMES, FINISH_STAGES, SITE_STAGES, STAGES, resolve_dependency
+
+add_responsive = importlib.import_module('add-responsive')
+
+RESULTS_VERSION = 1
+RESULTS_DIR = '.bench-results'
+CORPUS_NAME = '.bench-corpus.json'  # 合成した記事のスラッグ → ひな形のスラッグ
+DEFAULT_SIZES = [100, 1000, 10000]
+# ひな形からコピーしないもの（ビルドの出力とキャッシュ）
+IGNORE = shutil.ignore_patterns('.*', '__pycache__', '*.py', '*.sh', '*.jsonl', '*.md', 'tag', 'category',
+                                'page', 'sitemap.xml', 'feed.json')
+# 時間・メモリが増えたと判断する割合（1回ずつの計測なので、揺れより大きめに）
+THRESHOLD = 0.15
+# これより短い（経過時間に対する割合）ステージは揺れが大きいので比べない
+MIN_SHARE = 0.05
+
+
+def template_articles():
+    """カテゴリに登録された記事（ひな形）"""
+    return [slug for data in add_features.CATEGORIES.values() for slug in data['articles']]
+
+
+def generate_corpus(templates, dest, count):
+    """ひな形のブログをコピーし、記事が count 本になるまで合成した記事を足す。戻り値は合成した記事"""
+    shutil.copytree(templates, dest, ignore=IGNORE)
+    sources = [slug for slug in template_articles() if (dest / slug / 'index.html').exists()]
+    corpus = {}
+    for number in range(max(0, count - len(sources))):
+        source = sources[number % len(sources)]
+        slug = f'{source}-{number + 1:05d}'
+        html = (dest / source / 'index.html').read_text(encoding='utf-8')
+        # タイトルだけ変えて、メタデータ・検索・一覧で別の記事として扱われるようにする
+        html = html.replace('<title>', f'<title>#{number + 1} ', 1)
+        html = re.sub(r'(<meta property="og:title" content=")', rf'\g<1>#{number + 1} ', html, count=1)
+        (dest / slug).mkdir()
+        (dest / slug / 'index.html').write_text(html, encoding='utf-8')
+        corpus[slug] = source
+    (dest / CORPUS_NAME).write_text(json.dumps(corpus), encoding='utf-8')
+    return corpus
+
+
+def register_corpus(src_dir):
+    """合成した記事を、ひな形と同じカテゴリ・対象リストに加える（このプロセスの中だけ）"""
+    corpus = json.loads((src_dir / CORPUS_NAME).read_text(encoding='utf-8'))
+    categories = {slug: key for key, data in add_features.CATEGORIES.items() for slug in data['articles']}
+    for slug, source in corpus.items():
+        add_features.CATEGORIES[categories[source]]['articles'].append(slug)
+        if source in add_features.ARTICLE_INFO:
+            add_features.ARTICLE_INFO[slug] = add_features.ARTICLE_INFO[source]
+        if source in add_sidebar.TARGET_ARTICLES:
+            add_sidebar.TARGET_ARTICLES.append(slug)
+        if source in enhance_mobile.TARGET_DIRS:
+            enhance_mobile.TARGET_DIRS.append(slug)
+        if f'{source}/index.html' in add_responsive.FILES:
+            add_responsive.FILES.append(f'{slug}/index.html')
+    return corpus
+
+
+def peak_rss_kb():
+    """このプロセス（と終わった子プロセス）の最大RSS（KB）"""
+    if resource is None:
+        return None
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # macOS はバイト単位
+    scale = 1024 if sys.platform == 'darwin' else 1
+    return max(own, children) // scale
+
+
+def responsive_file(path):
+    """add-responsive.py の1ファイル分（main はパスが固定なので）"""
+    content = path.read_text(encoding='utf-8')
+    updated = add_responsive.add_responsive_css(content)
+    if updated != content:
+        path.write_text(updated, encoding='utf-8')
+
+
+def enhance_file(path, home):
+    """enhance_mobile.main の1ファイル分（ホームとaboutは目次なし）"""
+    if path == home:
+        enhance_mobile.enhance_article(path, add_toc=False, script_src=enhance_mobile.MOBILE_JS_FILE)
+    else:
+        enhance_mobile.enhance_article(path, add_toc=path.parent.name != 'about')
+
+
+def run_legacy(src_dir):
+    """既存のスクリプトを1ファイルずつ順に実行。戻り値はステージ → [秒, ファイル数]"""
+    steps = [
+        ('add_sidebar', add_sidebar.process_file,
+         [src_dir / slug / 'index.html' for slug in add_sidebar.TARGET_ARTICLES]),
+        ('add_responsive', responsive_file, [src_dir / rel_path for rel_path in add_responsive.FILES]),
+        ('enhance_mobile', partial(enhance_file, home=src_dir / 'index.html'),
+         [src_dir / slug / 'index.html' for slug in enhance_mobile.TARGET_DIRS] + [src_dir / 'index.html']),
+        ('add_features', lambda path: add_features.process_article(str(path.parent)),
+         [src_dir / slug / 'index.html' for slug in template_articles()]),
+        ('add_goatcounter', add_goatcounter.process_html_file, sorted(src_dir.glob('**/index.html'))),
+    ]
+    stages = {}
+    for name, func, paths in steps:
+        paths = [path for path in paths if path.exists()]
+        start = time.perf_counter()
+        for path in paths:
+            func(path)
+        stages[name] = [time.perf_counter() - start, len(paths)]
+    return stages
+
+
+def run_build(src_dir, full, jobs):
+    site, timer = build(src_dir, STAGES, site_stages=SITE_STAGES, code_files=CODE_FILES, data_names=DATA_NAMES,
+                        resolve=resolve_dependency, full=full, jobs=jobs, finish_stages=FINISH_STAGES)
+    return timer.totals
+
+
+def worker(pipeline, src_dir, jobs):
+    """1つのパイプラインを実行して、結果をJSONで標準出力に書く（別プロセスで呼ばれる）"""
+    src_dir = Path(src_dir)
+    register_corpus(src_dir)
+    start = time.perf_counter()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        if pipeline == 'legacy':
+            stages = run_legacy(src_dir)
+        else:
+            stages = run_build(src_dir, full=pipeline == 'build', jobs=jobs)
+    wall = time.perf_counter() - start
+    print(json.dumps({'wall': wall, 'peak_rss_kb': peak_rss_kb(),
+                      'stages': {name: {'seconds': seconds, 'pages': count}
+                                 for name, (seconds, count) in stages.items()}}))
+
+
+def run_worker(pipeline, src_dir, jobs):
+    output = subprocess.run([sys.executable, __file__, '--worker', pipeline, str(src_dir), '--jobs', str(jobs)],
+                            check=True, capture_output=True, text=True, cwd=Path(__file__).parent).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).parent,
+                              check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def print_run(run):
+    rss = f"{run['peak_rss_kb'] / 1024:,.0f} MB" if run['peak_rss_kb'] else '-'
+    print(f"⏱  {run['articles']:>6,} articles {run['pipeline']:<8} {run['wall']:>9.2f}s  "
+          f"{run['pages'] / run['wall']:>8.1f} pages/s  peak RSS {rss}")
+    slowest = sorted(run['stages'].items(), key=lambda item: -item[1]['seconds'])[:5]
+    print('   ' + ', '.join(f"{name} {stage['seconds']:.2f}s" for name, stage in slowest))
+
+
+def compare(old, new):
+    """前の結果と比べて、THRESHOLD 以上増えた時間・メモリを表示する。戻り値は増えたものの数"""
+    previous = {(run['articles'], run['pipeline']): run for run in old['runs']}
+    regressions = 0
+    print(f"\n{'articles':>8} {'pipeline':<8} {'metric':<20} {old['commit']:>10} {new['commit']:>10} {'change':>8}")
+    for run in new['runs']:
+        before = previous.get((run['articles'], run['pipeline']))
+        if before is None:
+            continue
+        metrics = [('wall', before['wall'], run['wall']),
+                   ('peak_rss_mb', (before['peak_rss_kb'] or 0) / 1024, (run['peak_rss_kb'] or 0) / 1024)]
+        metrics += [(name, before['stages'][name]['seconds'], stage['seconds'])
+                    for name, stage in run['stages'].items() if name in before['stages']]
+        for name, old_value, new_value in metrics:
+            if not old_value or not new_value:
+                continue
+            if name not in ('wall', 'peak_rss_mb') and max(old_value, new_value) < run['wall'] * MIN_SHARE:
+                continue
+            change = new_value / old_value - 1
+            mark = ''
+            if change > THRESHOLD:
+                mark = ' ⚠️'
+                regressions += 1
+            print(f"{run['articles']:>8,} {run['pipeline']:<8} {name:<20} {old_value:>10.2f} {new_value:>10.2f} "
+                  f"{change:>+7.0%}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合成ブログでのビルド全体のベンチマーク')
+    parser.add_argument('--templates', default=str(Path(__file__).parent),
+                        help='ひな形にするブログのディレクトリ（ビルド前のもの）')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='記事数')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='build のプロセス数（0でCPUコア数）')
+    parser.add_argument('--output', help=f'結果のJSON（省略時は {RESULTS_DIR}/build-<commit>.json）')
+    parser.add_argument('--compare', help='比べる前の結果のJSON')
+    parser.add_argument('--worker', nargs=2, metavar=('PIPELINE', 'DIR'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(*args.worker, args.jobs)
+        return
+
+    commit = current_commit()
+    results = {
+        'version': RESULTS_VERSION,
+        'commit': commit,
+        'created': datetime.now().astimezone().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'jobs': args.jobs,
+        'runs': [],
+    }
+    templates = Path(args.templates).resolve()
+    for size in args.sizes:
+        for pipelines in (['legacy'], ['build', 'rebuild']):
+            with tempfile.TemporaryDirectory(prefix='bench-build-') as tmp:
+                src_dir = Path(tmp) / 'blog'
+                start = time.perf_counter()
+                corpus = generate_corpus(templates, src_dir, size)
+                generate = time.perf_counter() - start
+                pages = sum(1 for _ in src_dir.glob('**/index.html'))
+                if pipelines == ['legacy']:
+                    print(f"\n📚 {size:,} articles ({len(corpus):,} synthetic, {pages:,} pages, "
+                          f"generated in {generate:.1f}s)")
+                for pipeline in pipelines:
+                    run = {'articles': size, 'pipeline': pipeline, 'pages': pages,
+                           **run_worker(pipeline, src_dir, args.jobs)}
+                    results['runs'].append(run)
+                    print_run(run)
+
+    output = Path(args.output or Path(__file__).parent / RESULTS_DIR / f'build-{commit}.json')
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=1) + '\n', encoding='utf-8')
+    print(f"\n💾 {output}")
+
+    if args.compare:
+        regressions = compare(json.loads(Path(args.compare).read_text(encoding='utf-8')), results)
+        print(f"\n{'⚠️ ' if regressions else '✅'} {regressions} regressions (>{THRESHOLD:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+サイト内検索のインデックスのベンチマーク
+
+ビルド済みのブログ（build.py を実行したディレクトリ）のメタデータから検索インデックスを作り直し、
+作成時間・インデックスとシャードの大きさ（gzip後も）・検索語ごとに読み込むバイト数・
+検索にかかる時間を表示する。検索はブラウザのスクリプトと同じ処理を Python で行う。
+
+使い方:
+  python3 bench_search.py [--src /tmp/blog-work] [--repeat 20] [検索語 ...]
+"""
+
+import argparse
+import gzip
+import statistics
+import time
+
+from blogbuild.engine import Site, find_pages
+from blogbuild.metadata import INDEX_NAME, MetadataIndex
+from blogbuild.search import (INDEX_FILE, SEARCH_DIR, build_index, dump, query_index, search_docs,
+                              shard_of, split_shards, tokenize)
+
+DEFAULT_QUERIES = ['OpenClaw', 'Claude Code', 'エージェント', 'トレードシステム', 'コスト削減',
+                   '自動化', 'ComfyUI', 'バックテスト', 'AI', '副業で稼ぐ方法']
+
+
+def gzip_size(text):
+    return len(gzip.compress(text.encode('utf-8'), compresslevel=9, mtime=0))
+
+
+def timed(func, repeat):
+    """(結果, 中央値の秒数)"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return result, statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='検索インデックスのベンチマーク')
+    parser.add_argument('--src', default='/tmp/blog-work', help='ビルド済みのブログのディレクトリ')
+    parser.add_argument('--repeat', type=int, default=20, help='時間を測る回数（中央値を表示）')
+    parser.add_argument('queries', nargs='*', help='検索語（省略時は定番の検索語）')
+    args = parser.parse_args()
+
+    site = Site(args.src)
+    site.rel_paths = find_pages(site.src_dir)
+    metadata = MetadataIndex.load(site.src_dir / INDEX_NAME)
+    metadata.update(site)
+    site.metadata = metadata.by_slug()
+
+    docs = search_docs(site)
+    postings, build_time = timed(lambda: build_index(docs), args.repeat)
+    shards, split_time = timed(lambda: split_shards(postings), args.repeat)
+    texts = [dump(shard) for shard in shards]
+    # 書き出したファイル名ではなく番号で引く（ディスクのインデックスが古くても測れるように）
+    index = {'shards': list(range(len(shards))),
+             'docs': [[url, title] for url, title, *_ in docs]}
+    index_text = dump(index)
+
+    body_chars = sum(len(text) for *_, text in docs)
+    sizes = [len(text.encode('utf-8')) for text in texts]
+    gz_sizes = [gzip_size(text) for text in texts]
+    print(f"📚 {len(docs)} articles, {body_chars:,} chars of body text, {len(postings):,} tokens")
+    print(f"⏱  build {build_time * 1000:.1f} ms, split {split_time * 1000:.1f} ms (median of {args.repeat})")
+    print(f"📦 {INDEX_FILE}: {len(index_text.encode('utf-8')):,} bytes (gz {gzip_size(index_text):,})")
+    print(f"📦 {len(shards)} shards: {sum(sizes):,} bytes (gz {sum(gz_sizes):,}), "
+          f"per shard avg {statistics.mean(sizes):,.0f} / max {max(sizes):,} bytes "
+          f"(gz avg {statistics.mean(gz_sizes):,.0f} / max {max(gz_sizes):,})")
+
+    print(f"\n{'query':<20} {'tokens':>6} {'shards':>6} {'fetch gz':>9} {'hits':>5} {'ms':>8}")
+    for query in args.queries or DEFAULT_QUERIES:
+        tokens = set(tokenize(query))
+        needed = {shard_of(token, len(shards)) for token in tokens}
+        fetched = gzip_size(index_text) + sum(gz_sizes[n] for n in needed)
+        # シャードはパース済みのものを使う（ブラウザでも2回目からはキャッシュから引く）
+        hits, query_time = timed(lambda: query_index(index, lambda n: shards[n], query, limit=len(docs)),
+                                 args.repeat)
+        print(f"{query:<20} {len(tokens):>6} {len(needed):>6} {fetched:>9,} {len(hits):>5} "
+              f"{query_time * 1000:>8.3f}")
+    print(f"\n(最初の検索で読み込むのは {INDEX_FILE} と fetch gz のシャード。書き出し先: {SEARCH_DIR}/)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+"""
+ブログのビルドパイプライン
+
+add_features.py などの個別スクリプトの変換を、1回のパスで全ページに適用する。
+エントリポイントはリポジトリ直下の build.py。
+"""
@@ -0,0 +1,441 @@
+"""
+タグ別・カテゴリ別の記事一覧ページを作る
+
+メタデータ抽出の結果（記事のタグ・タイトル・説明・日付）と CATEGORIES から、
+  tag/<タグ>/index.html、tag/<タグ>/page/<n>/index.html
+  category/<カテゴリ>/index.html、category/<カテゴリ>/page/<n>/index.html
+を1回のパスで作る。1ページに PER_PAGE 件ずつ載せ、それより多ければページを分ける。
+
+書き出した内容のハッシュを .archive-index.json に記録し、タグやカテゴリ（と一覧に載る
+タイトルなど）が変わったページだけ書き直す。書き出したページは次のステップで
+他のページと同じようにステージ（フォント・共通CSS・アナリティクスなど）を通る。
+"""
+
+import html as html_lib
+import json
+import posixpath
+import re
+from urllib.parse import quote
+
+import add_features
+
+from .engine import find_pages
+from .manifest import content_hash
+from .metadata import load_metadata
+from .output import write_atomic
+
+INDEX_NAME = '.archive-index.json'
+INDEX_VERSION = 1
+
+PER_PAGE = 10
+SITE_URL = 'https://daisuki-koshian.github.io/blog/'
+SITE_TITLE = '『AI』と暮らす『非エンジニア』の日常'
+
+UNSAFE_PATH_CHARS = re.compile(r'[\s/\\?#%"<>]+')
+
+ARCHIVE_TEMPLATE = """<!DOCTYPE html>
+<html lang="ja">
+<head>
+<meta charset="UTF-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<title>{title} | {site_title}</title>
+<meta name="description" content="{description}">
+<meta property="og:type" content="website">
+<meta property="og:title" content="{title}">
+<meta property="og:description" content="{description}">
+<meta property="og:url" content="{url}">
+<meta property="og:image" content="{site_url}assets/ogp-default.png">
+<meta property="og:site_name" content="AIと暮らす">
+<meta name="twitter:card" content="summary_large_image">
+<meta name="twitter:site" content="@daisuki_koshian">
+<link rel="canonical" href="{url}">
+{pagination_links}<style>
+  @import url('https://fonts.googleapis.com/css2?family=Noto+Sans+JP:wght@400;700;900&display=swap');
+
+  :root {{
+    --color-bg: #fafafa;
+    --color-text: #333333;
+    --color-text-light: #666666;
+    --color-accent: #e63946;
+    --color-border: #e8e8e8;
+    --font-main: 'Noto Sans JP', sans-serif;
+  }}
+
+  * {{ margin: 0; padding: 0; box-sizing: border-box; }}
+
+  body {{
+    font-family: var(--font-main);
+    color: var(--color-text);
+    background: var(--color-bg);
+    line-height: 1.9;
+    font-size: 16px;
+    -webkit-font-smoothing: antialiased;
+  }}
+
+  .header {{
+    background: #fff;
+    border-bottom: 1px solid #eee;
+    padding: 12px 0;
+  }}
+  .header-inner {{
+    max-width: 1200px;
+    margin: 0 auto;
+    padding: 0 24px;
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+  }}
+  .logo {{
+    color: #1a1a1a;
+    text-decoration: none;
+    font-size: 16px;
+    font-weight: 900;
+  }}
+  .header-nav {{
+    display: flex;
+    gap: 24px;
+  }}
+  .header-nav a {{
+    color: var(--color-text);
+    text-decoration: none;
+    font-size: 14px;
+    font-weight: 700;
+  }}
+  .header-nav a:hover {{
+    color: var(--color-accent);
+  }}
+
+  .archive {{
+    max-width: 780px;
+    margin: 0 auto;
+    padding: 48px 24px 64px;
+  }}
+  .archive-kind {{
+    font-size: 13px;
+    font-weight: 700;
+    color: var(--color-accent);
+  }}
+  .archive-title {{
+    font-size: 28px;
+    font-weight: 900;
+    margin-bottom: 8px;
+  }}
+  .archive-count {{
+    font-size: 14px;
+    color: var(--color-text-light);
+    margin-bottom: 32px;
+  }}
+  .archive-list {{
+    list-style: none;
+  }}
+  .archive-card {{
+    display: block;
+    background: #fff;
+    border-radius: 8px;
+    border-left: 4px solid var(--color-accent);
+    padding: 20px 24px;
+    margin-bottom: 16px;
+    color: inherit;
+    text-decoration: none;
+    box-shadow: 0 2px 8px rgba(0,0,0,0.04);
+    transition: box-shadow 0.2s;
+  }}
+  .archive-card:hover {{
+    box-shadow: 0 4px 16px rgba(0,0,0,0.08);
+  }}
+  .archive-card h2 {{
+    font-size: 18px;
+    font-weight: 900;
+    line-height: 1.6;
+    margin: 4px 0;
+  }}
+  .archive-card .tag {{
+    font-size: 11px;
+    font-weight: 700;
+    color: var(--color-accent);
+  }}
+  .archive-card .desc {{
+    font-size: 14px;
+    color: var(--color-text-light);
+  }}
+  .archive-card .meta {{
+    font-size: 12px;
+    color: #999;
+    margin-top: 4px;
+  }}
+  .pagination {{
+    display: flex;
+    flex-wrap: wrap;
+    justify-content: center;
+    gap: 8px;
+    margin-top: 40px;
+  }}
+  .pagination a, .pagination span {{
+    min-width: 40px;
+    padding: 6px 12px;
+    border: 1px solid var(--color-accent);
+    border-radius: 6px;
+    font-size: 14px;
+    font-weight: 700;
+    text-align: center;
+    text-decoration: none;
+    color: var(--color-accent);
+  }}
+  .pagination .current {{
+    background: var(--color-accent);
+    color: #fff;
+  }}
+
+  .footer {{
+    background: #fff;
+    border-top: 1px solid #eee;
+    padding: 32px 24px;
+    text-align: center;
+    color: #666;
+    font-size: 14px;
+  }}
+  .footer a {{
+    color: var(--color-accent);
+    text-decoration: none;
+  }}
+
+  @media (max-width: 768px) {{
+    .archive-title {{
+      font-size: 22px;
+    }}
+    .header-nav {{
+      display: none;
+    }}
+  }}
+</style>
+</head>
+<body>
+
+<div class="header">
+  <div class="header-inner">
+    <a href="{root}" class="logo">『<span style="color:#e63946">AI</span>』と暮らす『<span style="color:#e63946">非エンジニア</span>』の日常</a>
+    <nav class="header-nav">
+      <a href="{root}">Home</a>
+      <a href="{root}about/">About</a>
+      <a href="https://x.com/daisuki_koshian" target="_blank" rel="noopener" title="X (Twitter)">𝕏</a>
+    </nav>
+  </div>
+</div>
+
+<main class="archive">
+  <div class="archive-kind">{kind}</div>
+  <h1 class="archive-title">{name}</h1>
+  <p class="archive-count">{count}本の記事{page_label}</p>
+  <ul class="archive-list">
+{cards}
+  </ul>
+{pagination}</main>
+
+<footer class="footer">
+  <span class="brand">{site_title}</span> — OpenClaw実践記録<br>
+  <small><a href="{root}">記事一覧に戻る</a></small>
+</footer>
+
+</body>
+</html>
+"""
+
+CARD_TEMPLATE = """    <li><a href="{href}" class="archive-card">
+      <span class="tag">{tag}</span>
+      <h2>{title}</h2>
+      <p class="desc">{desc}</p>
+      <div class="meta">{meta}</div>
+    </a></li>"""
+
+
+def path_name(name):
+    """タグをディレクトリ名にする（'Claude Code' → 'Claude-Code'）"""
+    return UNSAFE_PATH_CHARS.sub('-', name.strip()).strip('-')
+
+
+def article_tags(meta):
+    """記事のタグ（記事ヘッダーの .tag）"""
+    return [meta['tag']] if meta.get('tag') else []
+
+
+def format_date(date):
+    """'2026-02-17' → '2026年2月17日'、'2026-02' → '2026年2月'"""
+    parts = [int(part) for part in date.split('-') if part.isdigit()]
+    return ''.join(f'{value}{unit}' for value, unit in zip(parts, ('年', '月', '日')))
+
+
+def sorted_articles(site):
+    """記事（新しい順）: [(slug, meta), ...]"""
+    articles = [(slug, meta) for slug, meta in site.metadata.items() if slug and meta.get('type') == 'article']
+    articles.sort(key=lambda item: (item[1].get('date', ''), item[0]), reverse=True)
+    return articles
+
+
+def collect_archives(site):
+    """一覧 → 記事のリスト: {(ディレクトリ, 種類, 表示名): [(slug, meta), ...]}（新しい順）"""
+    archives = {}
+    for slug, meta in sorted_articles(site):
+        for tag in article_tags(meta):
+            if path_name(tag):
+                archives.setdefault((f'tag/{path_name(tag)}', 'タグ', tag), []).append((slug, meta))
+        cat_key, cat_label = add_features.get_category(slug)
+        if cat_key:
+            archives.setdefault((f'category/{cat_key}', 'カテゴリ', cat_label), []).append((slug, meta))
+    return archives
+
+
+def page_dir(base, number):
+    """一覧の number ページ目のディレクトリ（base が '.' ならサイトのルート）"""
+    return base if number == 1 else posixpath.normpath(f'{base}/page/{number}')
+
+
+def page_root(here):
+    """一覧ページからサイトのルートへの相対パス"""
+    return '' if here == '.' else '../' * (here.count('/') + 1)
+
+
+def page_url(here):
+    return SITE_URL if here == '.' else f'{SITE_URL}{quote(here)}/'
+
+
+def relative_href(from_dir, to_dir):
+    """一覧ページ同士の相対リンク（どちらもディレクトリ）"""
+    return quote(posixpath.relpath(to_dir, from_dir)) + '/'
+
+
+def render_pagination(base, number, total):
+    """前へ・ページ番号・次へのリンク"""
+    if total == 1:
+        return ''
+    here = page_dir(base, number)
+    items = []
+    if number > 1:
+        items.append(f'<a href="{relative_href(here, page_dir(base, number - 1))}" rel="prev">← 前へ</a>')
+    for n in range(1, total + 1):
+        if n == number:
+            items.append(f'<span class="current" aria-current="page">{n}</span>')
+        else:
+            items.append(f'<a href="{relative_href(here, page_dir(base, n))}">{n}</a>')
+    if number < total:
+        items.append(f'<a href="{relative_href(here, page_dir(base, number + 1))}" rel="next">次へ →</a>')
+    return '  <nav class="pagination" aria-label="ページ送り">\n    ' + '\n    '.join(items) + '\n  </nav>\n'
+
+
+def render_page(base, kind, name, articles, number, total, count):
+    """一覧ページ1枚分のHTML（kind: 'タグ' など、count: 一覧全体の記事数）"""
+    here = page_dir(base, number)
+    root = page_root(here)
+    cards = []
+    for slug, meta in articles:
+        info = add_features.get_article_info(slug, {slug: meta})
+        details = [format_date(meta.get('date', ''))]
+        if info.get('reading_time'):
+            details.append(f"約{info['reading_time']}分")
+        cards.append(CARD_TEMPLATE.format(
+            href=f'{root}{slug}/',
+            tag=html_lib.escape(meta.get('tag', '')),
+            title=html_lib.escape(info.get('title', slug)),
+            desc=html_lib.escape(info.get('desc', '')),
+            meta=' • '.join(detail for detail in details if detail),
+        ))
+    links = []
+    if number > 1:
+        links.append(f'<link rel="prev" href="{page_url(page_dir(base, number - 1))}">')
+    if number < total:
+        links.append(f'<link rel="next" href="{page_url(page_dir(base, number + 1))}">')
+    # すべての記事の一覧（base が '.'）は「記事一覧」だけにする
+    label = name if base == '.' else f'{kind}「{name}」の記事'
+    title = label + (f'（{number}ページ目）' if number > 1 else '')
+    return ARCHIVE_TEMPLATE.format(
+        title=html_lib.escape(title),
+        site_title=SITE_TITLE,
+        site_url=SITE_URL,
+        description=html_lib.escape(f'{label}一覧' if base != '.' else f'{SITE_TITLE}の{name}'),
+        url=page_url(here),
+        pagination_links=''.join(link + '\n' for link in links),
+        root=root,
+        kind=kind,
+        name=html_lib.escape(name),
+        count=count,
+        page_label=f' — {number} / {total}ページ' if total > 1 else '',
+        cards='\n'.join(cards),
+        pagination=render_pagination(base, number, total),
+    )
+
+
+def render_listing(base, kind, name, articles, first=1, per_page=PER_PAGE):
+    """1つの一覧の first ページ目以降: rel_path → HTML"""
+    total = max(1, (len(articles) + per_page - 1) // per_page)
+    pages = {}
+    for number in range(first, total + 1):
+        chunk = articles[(number - 1) * per_page:number * per_page]
+        html = render_page(base, kind, name, chunk, number, total, len(articles))
+        pages[f'{page_dir(base, number)}/index.html'] = html
+    return pages
+
+
+def render_archives(site):
+    """rel_path → HTML（タグ・カテゴリの全部の一覧ページ）"""
+    pages = {}
+    for (base, kind, name), articles in sorted(collect_archives(site).items()):
+        pages.update(render_listing(base, kind, name, articles))
+    return pages
+
+
+def load_index(path, version=INDEX_VERSION):
+    """生成したファイルの記録（読めなければ空）"""
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    return data if data.get('version') == version else {}
+
+
+def remove_page(src_dir, rel_path):
+    """生成したファイルを消し、空になったディレクトリも消す"""
+    path = src_dir / rel_path
+    path.unlink(missing_ok=True)
+    for parent in path.parents:
+        if parent == src_dir or not parent.exists() or any(parent.iterdir()):
+            break
+        parent.rmdir()
+
+
+def sync_pages(site, pages, previous):
+    """生成したファイル（rel_path → 内容）のうち、変わったものだけ書き出し、要らなくなったものは消す
+
+    previous は前回の rel_path → ハッシュ。戻り値は (今回の rel_path → ハッシュ, 書いた数, 消した数)。
+    """
+    written = 0
+    hashes = {}
+    for rel_path, text in pages.items():
+        digest = content_hash(text)
+        hashes[rel_path] = digest
+        path = site.src_dir / rel_path
+        if previous.get(rel_path) == digest and path.exists():
+            continue
+        write_atomic(path, text)
+        written += 1
+    removed = [rel_path for rel_path in previous if rel_path not in pages]
+    for rel_path in removed:
+        remove_page(site.src_dir, rel_path)
+    return hashes, written, len(removed)
+
+
+def refresh_pages(site):
+    """書き出したページもこのビルドで変換し、メタデータ（フォントの文字など）にも入れる"""
+    site.rel_paths = find_pages(site.src_dir)
+    load_metadata(site)
+
+
+def write_archives(site):
+    """一覧ページのステージ: 内容が変わったページだけ書き出し、要らなくなったページは消す"""
+    index_path = site.src_dir / INDEX_NAME
+    previous = load_index(index_path).get('pages', {})
+    pages = render_archives(site)
+    hashes, written, removed = sync_pages(site, pages, previous)
+    write_atomic(index_path, json.dumps({'version': INDEX_VERSION, 'pages': hashes}, ensure_ascii=False,
+                                        indent=1, sort_keys=True))
+    if written or removed:
+        print(f"🗂  archives: {written} written, {removed} removed, {len(pages) - written} unchanged")
+        refresh_pages(site)
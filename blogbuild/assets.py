@@ -0,0 +1,140 @@
+"""
+静的なファイル（画像）のファイル名に内容のハッシュを入れる
+
+assets/ogp-default.png や eyecatch_blog.png、記事の画像（backtest-overview/*.jpg など）は
+決まった名前で参照されているので長期キャッシュできず、ブラウザは毎回問い合わせ直す。
+元のファイルの隣に <name>.<hash>.<ext> のコピーを置き、ページの中の参照（属性の値・<style> の
+url()・JSON-LD の文字列）と共通スタイルシートの参照を、1つの対応表（元のパス → ハッシュ付きの
+パス）で書き換える。対応表は asset-manifest.json に書き出す（デプロイのスクリプトなどから使う）。
+
+元のファイルはソースとしてそのまま残すので、記事はこれまでどおり元の名前で書ける（前回の
+ビルドで書き換えたハッシュ付きの参照も、元のパスに戻してから引き直す）。ハッシュは内容から
+作るので、変わっていないファイルは前回と同じ名前のまま（ブラウザのキャッシュが効き続ける）。
+ハッシュを取ったファイルは .asset-index.json に更新日時とサイズで記録し、次のビルドでは読み直さない。
+"""
+
+import json
+import os
+import posixpath
+import re
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from .archives import SITE_URL
+from .links import site_path
+from .manifest import content_hash
+from .output import write_atomic
+
+MANIFEST_NAME = 'asset-manifest.json'
+INDEX_NAME = '.asset-index.json'
+INDEX_VERSION = 1
+
+ASSET_SUFFIXES = {'.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.avif'}
+HASH_LENGTH = 10
+# ハッシュ付きのファイル名（このステージのコピーのほか、OGPのカードや共通スタイルシートなども）
+HASHED_NAME = re.compile(r'\.[0-9a-f]{10}(\.[A-Za-z0-9]+)$')
+# 参照になりうる文字列: 引用符・括弧・空白・カンマ（srcset の区切り）の後ろにある画像のURL
+ASSET_URL = re.compile(r'(?<=["\'(\s,])([^\s"\'(),<>]+?\.(?:png|jpe?g|gif|svg|webp|avif))(?=[\s"\'),?#])',
+                       re.IGNORECASE)
+
+
+def hashed_name(rel_path, digest):
+    """'eyecatch_blog.png' → 'eyecatch_blog.<hash>.png'"""
+    stem, ext = posixpath.splitext(rel_path)
+    return f'{stem}.{digest[:HASH_LENGTH]}{ext}'
+
+
+def original_name(rel_path):
+    """ハッシュ付きのパスを元のパスに戻す（ハッシュがなければそのまま）"""
+    return HASHED_NAME.sub(r'\1', rel_path)
+
+
+def find_assets(src_dir):
+    """(元のファイル, ハッシュ付きのファイル) の相対パス（隠しファイル・隠しディレクトリは除く）"""
+    originals = []
+    hashed = []
+    for dirpath, dirnames, filenames in os.walk(src_dir):
+        dirnames[:] = sorted(name for name in dirnames if not name.startswith('.'))
+        rel_dir = Path(dirpath).relative_to(src_dir)
+        for name in sorted(filenames):
+            if name.startswith('.') or Path(name).suffix.lower() not in ASSET_SUFFIXES:
+                continue
+            rel_path = (rel_dir / name).as_posix()
+            (hashed if HASHED_NAME.search(name) else originals).append(rel_path)
+    return originals, hashed
+
+
+def load_index(path):
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    return data.get('assets', {}) if data.get('version') == INDEX_VERSION else {}
+
+
+def write_assets(site):
+    """ハッシュ付きのファイル名のステージ: 変わったファイルだけコピーし直して、対応表を作る"""
+    src_dir = site.src_dir
+    index_path = src_dir / INDEX_NAME
+    previous = load_index(index_path)
+    originals, hashed = find_assets(src_dir)
+
+    entries = {}
+    table = {}
+    copied = 0
+    for rel_path in originals:
+        path = src_dir / rel_path
+        stat = path.stat()
+        entry = previous.get(rel_path)
+        if not (entry and (entry['mtime_ns'], entry['size']) == (stat.st_mtime_ns, stat.st_size)):
+            entry = {'hash': content_hash(path.read_bytes()), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+        entries[rel_path] = entry
+        table[rel_path] = hashed_name(rel_path, entry['hash'])
+        if not (src_dir / table[rel_path]).exists():
+            write_atomic(src_dir / table[rel_path], path.read_bytes())
+            copied += 1
+
+    # 元のファイルが変わった・なくなったコピーを消す（元のないOGPのカードなどは残す）
+    current = set(table.values())
+    stale = [rel_path for rel_path in hashed
+             if rel_path not in current and (original_name(rel_path) in table or original_name(rel_path) in previous)]
+    for rel_path in stale:
+        (src_dir / rel_path).unlink()
+
+    if entries != previous:
+        write_atomic(index_path, json.dumps({'version': INDEX_VERSION, 'assets': entries}, indent=1, sort_keys=True))
+    write_atomic(src_dir / MANIFEST_NAME, json.dumps(table, ensure_ascii=False, indent=1, sort_keys=True))
+    if copied or stale:
+        print(f"🔖 assets: {len(table)} fingerprinted ({copied} copied, {len(stale)} removed)")
+    site.assets = table
+
+
+def rewrite_refs(text, rel_path, table):
+    """rel_path のファイルの中にある画像の参照を、対応表のハッシュ付きのパスに書き換える
+
+    参照の形（絶対URL・/blog/ からのパス・相対パス）はそのまま保つ。
+    """
+    if not table:
+        return text
+    base = posixpath.dirname(rel_path)
+
+    def replace(match):
+        url = match.group(1)
+        target, _ = site_path(rel_path, url)
+        if target is None or target == '..':
+            return url
+        name = table.get(original_name(target))
+        if name is None or name == target:
+            return url
+        if urlsplit(url).scheme:
+            return SITE_URL + quote(name)
+        if url.startswith('/'):
+            return urlsplit(SITE_URL).path + quote(name)
+        return quote(posixpath.relpath(name, base or '.'))
+
+    return ASSET_URL.sub(replace, text)
+
+
+def link_assets(page, site):
+    """ページの中の画像の参照をハッシュ付きのファイルに向ける"""
+    page.html = rewrite_refs(page.html, page.rel_path, site.assets)
@@ -0,0 +1,143 @@
+"""
+ファーストビューに必要なCSSだけをインラインにする（クリティカルCSS）
+
+共通スタイルシートを<link>で読むと、最初の描画がそのダウンロードを待つことになる。
+ページのHTMLを1回パースしてファーストビューの要素（ヘッダー・ヒーロー・パンくず・
+読了時間）とその祖先のタグ・クラス・IDを集め、共通スタイルシートの規則のうち
+それらに当たるものだけを<head>に<style>で入れる。スタイルシート本体は
+preload + onload で非同期に読み込む（JavaScriptがなければ<noscript>の<link>）。
+"""
+
+import re
+from functools import lru_cache
+from html.parser import HTMLParser
+
+from .css_bundle import LINK_PATTERN, SNIPPETS_ATTR, bundle_css, bundled, normalize_rule, split_rules
+
+# ファーストビューとみなす要素（タグ名か .クラス名）
+# プログレスバーはページ最上部に固定表示されるので含める
+FOLD_SELECTORS = ('header', '.header', '.hero', '.breadcrumb', '.reading-time', '.progress-bar')
+
+CRITICAL_BLOCK = re.compile(r'<style id="critical-css">.*?</style>\n', re.DOTALL)
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+             'source', 'track', 'wbr'}
+
+PSEUDO = re.compile(r'::?[\w-]+(?:\([^)]*\))?')
+ATTRIBUTE = re.compile(r'\[[^\]]*\]')
+COMBINATOR = re.compile(r'\s*[>+~]\s*|\s+')
+SIMPLE = re.compile(r'([.#]?)([\w-]+)')
+
+
+def element_tokens(tag, attrs):
+    """要素を {'div', '.hero', '#progressBar'} のような集合にする"""
+    attrs = dict(attrs)
+    tokens = {tag}
+    tokens.update('.' + name for name in (attrs.get('class') or '').split())
+    if attrs.get('id'):
+        tokens.add('#' + attrs['id'])
+    return frozenset(tokens)
+
+
+class FoldParser(HTMLParser):
+    """ファーストビューの要素と、その祖先の要素を集めるパーサー"""
+
+    def __init__(self, fold=FOLD_SELECTORS):
+        super().__init__(convert_charrefs=True)
+        self.fold = set(fold)
+        self.elements = set()  # 要素ごとのトークン集合
+        self._stack = []  # (tag, トークン集合, ファーストビューの中か)
+
+    def handle_starttag(self, tag, attrs):
+        tokens = element_tokens(tag, attrs)
+        inside = bool(self._stack and self._stack[-1][2]) or bool(tokens & self.fold)
+        if inside:
+            self.elements.add(tokens)
+            # 祖先（body・content-wrapper など）の規則も描画に効く
+            self.elements.update(open_tokens for _, open_tokens, _ in self._stack)
+        if tag not in VOID_TAGS:
+            self._stack.append((tag, tokens, inside))
+
+    def handle_startendtag(self, tag, attrs):
+        tokens = element_tokens(tag, attrs)
+        if (self._stack and self._stack[-1][2]) or tokens & self.fold:
+            self.elements.add(tokens)
+
+    def handle_endtag(self, tag):
+        # 閉じ忘れの要素があっても対応するタグまで戻る
+        if not any(open_tag == tag for open_tag, _, _ in self._stack):
+            return
+        while self._stack and self._stack.pop()[0] != tag:
+            pass
+
+
+def fold_elements(html):
+    """ファーストビューの要素（本文の<article>より後ろはファーストビューではないのでパースしない）"""
+    start = max(html.find('<body'), 0)
+    end = html.find('<article', start)
+    parser = FoldParser()
+    parser.feed(html[start:end if end >= 0 else len(html)])
+    parser.close()
+    return parser.elements
+
+
+@lru_cache(maxsize=None)
+def selector_parts(selector):
+    """'.toc a:hover' → (frozenset({'.toc'}), frozenset({'a'}))（疑似クラス・属性は無視）"""
+    selector = ATTRIBUTE.sub('', PSEUDO.sub('', selector)).strip()
+    return tuple(frozenset(prefix + name for prefix, name in SIMPLE.findall(compound))
+                 for compound in COMBINATOR.split(selector) if compound and compound != '*')
+
+
+def selector_matches(selector, elements):
+    """セレクタの各部分（子孫・子など）に当てはまる要素がファーストビューにあるか
+
+    結合子の関係までは見ないので、少し多めに拾う方に倒れる。
+    """
+    return all(any(part <= element for element in elements) for part in selector_parts(selector))
+
+
+@lru_cache(maxsize=None)
+def parsed_rules(css):
+    """(セレクタ部分, 規則) のタプル（ページごとにCSSをパースし直さないようにキャッシュ）"""
+    rules = (normalize_rule(rule) for rule in split_rules(css)[0])
+    return tuple((rule.split('{', 1)[0], rule) for rule in rules if '{' in rule)
+
+
+def critical_rules(css, elements):
+    """CSSのうちファーストビューの要素に当たる規則（@mediaは中身を絞り込む）"""
+    result = []
+    for head, rule in parsed_rules(css):
+        if head.startswith('@media'):
+            inner = critical_rules(rule[len(head) + 1:-1], elements)
+            if inner:
+                result.append(head + '{' + ''.join(inner) + '}')
+        elif head.startswith('@'):
+            continue  # @keyframes などは後から読み込めば足りる
+        elif any(selector_matches(selector, elements) for selector in head.split(',')):
+            result.append(rule)
+    return result
+
+
+def inline_critical_css(page, site):
+    """共通スタイルシートへの<link>を、クリティカルCSS + 非同期読み込みに置き換える"""
+    # <link>もクリティカルCSSも<head>にしかないので、置換は<head>の中だけで行う
+    end = page.html.find('</head>')
+    if end < 0:
+        return
+    head = CRITICAL_BLOCK.sub('', page.html[:end])
+    link = LINK_PATTERN.search(head)
+    if link is None:
+        return
+    href = re.search(r'href="([^"]*)"', link.group()).group(1)
+    names = SNIPPETS_ATTR.search(link.group())
+    attr = names.group() if names else ''
+    css = ''.join(critical_rules(bundle_css(bundled(head), site.assets), fold_elements(page.html)))
+    deferred = (
+        f'<link rel="preload" href="{href}"{attr} as="style" onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+        f'<noscript><link rel="stylesheet" href="{href}"{attr}></noscript>\n'
+    )
+    if css:
+        deferred = f'<style id="critical-css">{css}</style>\n' + deferred
+    head = LINK_PATTERN.sub('', head)
+    page.html = head[:link.start()] + deferred + head[link.start():] + page.html[end:]
+    page.notes.append(f'critical {len(css.encode("utf-8")):,} bytes')
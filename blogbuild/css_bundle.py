@@ -0,0 +1,222 @@
+"""
+挿入したCSSを共通のスタイルシートにまとめる
+
+パンくず・シェアボタン・関連記事・サイドバー・目次・プログレスバー・トップに戻る・
+レスポンシブ・画像のCSSは、それを使うページにそれぞれ同じものがコピーされている。
+ページのインラインの<style>に規則が全部そろっているCSS（スニペット）だけを取り除き、
+そのスニペットだけをまとめた assets/site.<hash>.css への<link>を、取り除いた規則があった
+場所に入れる（カスケードの順番を変えず、ページになかった規則も持ち込まない）。
+スニペットの組み合わせはページごとに違うので、組み合わせごとに1ファイルになる。
+ファイル名に内容のハッシュを入れるので、長期キャッシュできる。
+"""
+
+import importlib
+import json
+import re
+import textwrap
+from functools import lru_cache
+
+import add_features
+import add_sidebar
+import enhance_mobile
+
+from .assets import rewrite_refs
+from .images import IMAGE_CSS
+from .manifest import content_hash
+from .output import write_atomic
+
+add_responsive = importlib.import_module('add-responsive')
+
+ASSETS_DIR = 'assets'
+BUNDLE_PATTERN = re.compile(r'site\.[0-9a-f]{10}\.css')
+STYLE_BLOCK = re.compile(r'\n?<style>(.*?)</style>', re.DOTALL)
+# 通常の<link>と、クリティカルCSSを入れた後の preload / <noscript> の<link>
+LINK_PATTERN = re.compile(
+    r'<(?:noscript><)?link rel="(?:stylesheet|preload)" href="[^"]*assets/site\.[0-9a-f]{10}\.css"[^>]*>'
+    r'(?:</noscript>)?\n?')
+# <link>に書いておく、まとめたスニペットの名前（次のビルドで同じ組み合わせを作り直す）
+SNIPPETS_ATTR = re.compile(r' data-css="([^"]*)"')
+INDEX_NAME = '.css-index.json'
+INDEX_VERSION = 1
+
+# ビルドで挿入するCSS（この順で共通スタイルシートに入れる）
+SHARED_SNIPPETS = {
+    'sidebar': add_sidebar.SIDEBAR_CSS,
+    'toc': enhance_mobile.TOC_CSS,
+    'progress': enhance_mobile.PROGRESS_BAR_CSS,
+    'section_number': enhance_mobile.SECTION_NUMBER_CSS,
+    'back_to_top': enhance_mobile.BACK_TO_TOP_CSS,
+    'responsive': add_responsive.RESPONSIVE_CSS,
+    'breadcrumb': add_features.BREADCRUMB_CSS,
+    'share': add_features.SHARE_BUTTONS_CSS,
+    'related': add_features.RELATED_ARTICLES_CSS,
+    'image': IMAGE_CSS,
+}
+
+
+# 規則の区切りに関わる部分（コメントと文字列の中の { } ; は区切りではない）
+CSS_TOKEN = re.compile(r'/\*.*?(?:\*/|$)|"[^"]*"?|\'[^\']*\'?|[{};]', re.DOTALL)
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+CSS_SPACE = re.compile(r'\s+')
+CSS_PUNCT_SPACE = re.compile(r'\s*([{};:,>])\s*')
+
+
+def split_rules(css):
+    """CSSをトップレベルの規則（@mediaはブロックごと）に分ける
+
+    直前のコメントと空白はその規則に含める。戻り値は (規則のリスト, 末尾の余り)。
+    """
+    rules = []
+    depth = 0
+    start = 0
+    for match in CSS_TOKEN.finditer(css):
+        char = match.group()
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                rules.append(css[start:match.end()])
+                start = match.end()
+        elif char == ';' and depth == 0:
+            rules.append(css[start:match.end()])
+            start = match.end()
+    return rules, css[start:]
+
+
+@lru_cache(maxsize=None)
+def normalize_rule(rule):
+    """比較用に、コメントと余分な空白を取り除く"""
+    rule = CSS_SPACE.sub(' ', CSS_COMMENT.sub('', rule)).strip()
+    return CSS_PUNCT_SPACE.sub(lambda m: m.group(1), rule)
+
+
+def bundle_css(names=None, assets=None):
+    """共通スタイルシートの中身（names のスニペットだけ。None なら全部）"""
+    css = '\n'.join(textwrap.dedent(snippet).strip() + '\n' for name, snippet in SHARED_SNIPPETS.items()
+                    if names is None or name in names)
+    return rewrite_refs(css, f'{ASSETS_DIR}/site.css', assets or {})
+
+
+def bundle_name(css):
+    return f'site.{content_hash(css)[:10]}.css'
+
+
+def shared_rules():
+    """スニペットの名前 → 規則（比較用に正規化したもの）の集合"""
+    return {name: frozenset(normalize_rule(rule) for rule in split_rules(snippet)[0])
+            for name, snippet in SHARED_SNIPPETS.items()}
+
+
+def bundled(html):
+    """ページの<link>でまとめているスニペットの名前（挿入するCSSはもう入っているものとして扱う）"""
+    link = LINK_PATTERN.search(html)
+    if link is None:
+        return frozenset()
+    names = SNIPPETS_ATTR.search(link.group())
+    return frozenset(names.group(1).split()) if names else frozenset()
+
+
+def has_content(css):
+    return bool(CSS_COMMENT.sub('', css).strip())
+
+
+def prepare_bundles(site):
+    """共通スタイルシートのステージ: スニペットの規則を用意する（ファイルはページの変換で書き出す）"""
+    site.css_rules = shared_rules()
+    site.css_key = content_hash(bundle_css(assets=site.assets))
+
+
+def write_bundle(site, names):
+    """スニペットの組み合わせのスタイルシートを書き出して、そのパスを返す（ワーカーからも呼ばれる）"""
+    css = bundle_css(names, site.assets)
+    name = bundle_name(css)
+    path = site.src_dir / ASSETS_DIR / name
+    if not path.exists():
+        write_atomic(path, css)
+    return f'{ASSETS_DIR}/{name}'
+
+
+def link_shared_css(page, site):
+    """インラインCSSに全部そろっているスニペットを外し、そのスニペットのスタイルシートへの<link>を入れる"""
+    blocks = list(STYLE_BLOCK.finditer(page.html))
+    rules_by_block = [split_rules(block.group(1)) for block in blocks]
+    found = {normalize_rule(rule) for rules, _ in rules_by_block for rule in rules}
+    present = {name for name, rules in site.css_rules.items() if rules <= found}
+    names = bundled(page.html) | present
+    if not names:
+        return
+    stripped = frozenset().union(*(site.css_rules[name] for name in present))
+    before = len(page.html.encode('utf-8'))
+    ordered = [name for name in SHARED_SNIPPETS if name in names]
+    href = write_bundle(site, ordered)
+    link = f'<link rel="stylesheet" href="{page.root}{href}" data-css="{" ".join(ordered)}">\n'
+
+    # <link>は前回の<link>の場所か、最初に取り除く規則があった場所に入れる
+    placed = LINK_PATTERN.search(page.html) is not None
+    parts = []
+    pos = 0
+    for block, (rules, tail) in zip(blocks, rules_by_block):
+        parts.append(page.html[pos:block.start()])
+        pos = block.end()
+        if not any(normalize_rule(rule) in stripped for rule in rules):
+            parts.append(block.group())
+            continue
+        newline = '\n' if block.group().startswith('\n') else ''
+        kept = []
+        for rule in rules:
+            if normalize_rule(rule) not in stripped:
+                kept.append(rule)
+            elif not placed:
+                # ここまでの規則を閉じて、<link>を挟んで続きを新しい<style>にする
+                if has_content(''.join(kept)):
+                    parts.append(f'{newline}<style>{"".join(kept)}</style>')
+                    newline = '\n'
+                parts.append(newline + link.rstrip('\n'))
+                newline = '\n'
+                kept = []
+                placed = True
+        if has_content(''.join(kept) + tail):
+            parts.append(f'{newline}<style>{"".join(kept)}{tail}</style>')
+    parts.append(page.html[pos:])
+    html = ''.join(parts)
+
+    # 前回の<link>（クリティカルCSSの preload / <noscript> も）は、最初のものを新しい<link>に置き換える
+    first = LINK_PATTERN.search(html)
+    if first is not None:
+        html = html[:first.start()] + link + LINK_PATTERN.sub('', html[first.end():])
+    page.html = html
+    saved = before - len(html.encode('utf-8'))
+    if saved:
+        page.notes.append(f'css {-saved:+,} bytes')
+
+
+def clean_bundles(site):
+    """使われなくなった組み合わせのスタイルシートを消す（書き出したページの<link>を記録しておく）"""
+    index_path = site.src_dir / INDEX_NAME
+    try:
+        data = json.loads(index_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        data = {}
+    previous = data.get('pages', {}) if data.get('version') == INDEX_VERSION else {}
+    if not previous:
+        # 索引がなければ全ページから作り直す
+        previous = {rel_path: None for rel_path in site.rel_paths}
+    pages = {rel_path: names for rel_path, names in previous.items() if rel_path in site.rel_paths}
+    html_by_page = {page.rel_path: page.html for page in site.pages}
+    for rel_path in site.rel_paths:
+        if rel_path in html_by_page or pages.get(rel_path, None) is None:
+            html = html_by_page.get(rel_path) or (site.src_dir / rel_path).read_text(encoding='utf-8')
+            pages[rel_path] = sorted({BUNDLE_PATTERN.search(m.group()).group()
+                                      for m in LINK_PATTERN.finditer(html)})
+    used = {name for names in pages.values() for name in names}
+    assets = site.src_dir / ASSETS_DIR
+    removed = 0
+    for path in assets.iterdir() if assets.is_dir() else []:
+        if BUNDLE_PATTERN.fullmatch(path.name) and path.name not in used:
+            path.unlink()
+            removed += 1
+    if pages != previous:
+        write_atomic(index_path, json.dumps({'version': INDEX_VERSION, 'pages': pages}, indent=1, sort_keys=True))
+    if removed:
+        print(f"🎨 css: {len(used)} stylesheets in use, {removed} removed")
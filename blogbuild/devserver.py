@@ -0,0 +1,329 @@
+"""
+ローカルの開発サーバー（serve.py）
+
+起動時に1回ビルドし、その結果（メタデータ・サイドバー・共通CSSのパスなどを載せた Site と
+マニフェスト）をメモリに持ったまま、ソースのツリーを監視する（watch.py）。
+
+ページ（index.html）が変わったら
+  1. そのページのメタデータだけ抽出し直し、そのページにだけステージを適用して書き出し、
+     ブラウザにリロードを送る（ここまでが編集からリロードまでの時間）
+  2. その後で通常の差分ビルドを実行する（一覧・サイドバー・関連記事・検索インデックスなど、
+     ほかのページやサイト全体に影響するもの）。何か書き出したら、もう一度リロードを送る
+ページ以外のファイル（画像など）が変わったら 2. だけ、変換コード（CODE_FILES）が変わったら
+サーバーを起動し直す。ビルドが書き出したファイルの変更（出力のハッシュがマニフェストと同じページ・
+ビルド直後の状態と同じファイル）は無視する。
+
+配信するHTMLにはリロードを受け取るスクリプト（Server-Sent Events）を差し込む（ファイルには
+書かない）。テキストのファイルは gzip / brotli で返し（隣に .gz / .br があればそれを使い、
+なければ圧縮したものをメモリにキャッシュする）、ETag で304を返す。内容のハッシュが名前に入った
+ファイル（site.<hash>.css など）は1年キャッシュさせ、それ以外は毎回確認させる。
+"""
+
+import gzip
+import json
+import mimetypes
+import os
+import posixpath
+import sys
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import unquote, urlsplit
+
+from .assets import HASHED_NAME
+from .engine import Page, StageTimer, build, page_deps, run_stages
+from .manifest import content_hash
+from .metadata import extract_metadata
+from .output import write_atomic
+from .publish import COMPRESS_SUFFIXES
+from .watch import scan, watcher
+
+try:
+    import brotli
+except ImportError:  # brotliがなければ gzip だけで返す
+    brotli = None
+
+LIVERELOAD_PATH = '/__livereload'
+LIVERELOAD_SCRIPT = f"""<script>
+new EventSource('{LIVERELOAD_PATH}').addEventListener('reload', () => location.reload());
+</script>
+"""
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# 続けて届く変更（エディタの保存は複数のイベントになる）をまとめて待つ時間
+DEBOUNCE = 0.01
+KEEPALIVE = 15
+
+
+class Reloads:
+    """リロードの通知（SSE の接続はそれぞれ version が変わるのを待つ）"""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.version = 0
+        self.paths = []
+
+    def notify(self, paths):
+        with self.condition:
+            self.version += 1
+            self.paths = sorted(paths)
+            self.condition.notify_all()
+
+    def wait(self, version, timeout):
+        """(新しい version, 変わったパス)。timeout までに変わらなければ version はそのまま"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.version != version, timeout)
+            return self.version, self.paths
+
+
+class DevServer:
+    """ビルド結果をメモリに持って、変更のたびに必要なところだけ作り直す"""
+
+    def __init__(self, src_dir, build_args, jobs=1, polling=False):
+        self.src_dir = Path(src_dir).resolve()
+        self.build_args = build_args  # build() に渡す stages・site_stages・code_files などの引数
+        self.code_files = {Path(path).resolve() for path in build_args.get('code_files', ())}
+        self.jobs = jobs
+        self.polling = polling
+        self.reloads = Reloads()
+        self.site = None
+        self.files = {}  # ビルド直後のファイル → (更新日時, サイズ)
+
+    # --- ビルド ---
+
+    def full_build(self):
+        """差分ビルドを実行して、書き出したファイルの集合を返す"""
+        self.site, _ = build(self.src_dir, jobs=self.jobs, **self.build_args)
+        files = scan(self.src_dir)
+        changed = {path for path in files.keys() | self.files.keys() if files.get(path) != self.files.get(path)}
+        self.files = files
+        return changed
+
+    def rebuild_page(self, rel_path):
+        """1ページだけ作り直す。戻り値は書き出したか（ビルドの出力そのものなら何もしない）"""
+        path = self.src_dir / rel_path
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return False
+        manifest = self.site.manifest
+        digest = content_hash(data)
+        entry = manifest.pages.get(rel_path)
+        if entry and entry['output'] == digest:
+            return False
+        page = Page(rel_path, data.decode('utf-8'))
+        # タイトルなどはこのページの中でも使う（パンくず・読了時間）ので、先に取り直す
+        self.site.metadata[page.slug] = extract_metadata(page.html)
+        run_stages(page, self.site, self.build_args['stages'], StageTimer())
+        if page.changed:
+            write_atomic(path, page.html)
+        deps = page_deps(page, self.site, self.build_args['stages'], self.build_args['resolve'])
+        manifest.record(rel_path, digest, content_hash(page.html), deps, path.stat())
+        manifest.save()
+        # 保存・書き出した結果はもう通知するので、続く full_build() で変わったファイルに数えない
+        self.files[path] = file_signature(path)
+        return True
+
+    def handle(self, paths):
+        """変わったファイルを処理する"""
+        start = time.perf_counter()
+        if paths & self.code_files:
+            names = ', '.join(sorted(path.name for path in paths & self.code_files))
+            print(f"\n♻️  {names} が変わったので起動し直します")
+            os.execv(sys.executable, [sys.executable, *sys.argv])
+
+        pages = []
+        others = set()
+        for path in paths:
+            if not path.is_relative_to(self.src_dir):
+                continue
+            if path.name == 'index.html':
+                pages.append(path.relative_to(self.src_dir).as_posix())
+            elif self.files.get(path) != file_signature(path):
+                others.add(path)
+
+        rebuilt = [rel_path for rel_path in sorted(pages) if self.rebuild_page(rel_path)]
+        if rebuilt:
+            self.reloads.notify('/' + rel_path for rel_path in rebuilt)
+            print(f"🔄 {', '.join(rebuilt)}: {(time.perf_counter() - start) * 1000:.0f} ms")
+        if not rebuilt and not others:
+            return
+
+        # ほかのページやサイト全体（一覧・検索インデックスなど）への影響
+        start = time.perf_counter()
+        written = self.full_build()
+        if written:
+            self.reloads.notify('/' + path.relative_to(self.src_dir).as_posix() for path in written)
+        print(f"🔁 site: {len(written)} files updated ({time.perf_counter() - start:.2f}s)")
+
+    def watch(self):
+        """ソースのツリー（と変換コードのディレクトリ）を監視し続ける"""
+        code_dirs = sorted({path.parent for path in self.code_files})
+        files = watcher(self.src_dir, code_dirs, polling=self.polling)
+        print(f"👀 watching {self.src_dir} ({files.name})")
+        while True:
+            paths = files.wait()
+            # 保存の途中のイベントもまとめる
+            time.sleep(DEBOUNCE)
+            paths |= files.wait(0)
+            try:
+                self.handle(paths)
+            except Exception as e:  # サーバーは止めずに、次の保存を待つ
+                print(f"⚠️  ビルドに失敗しました: {e!r}")
+
+    # --- 配信 ---
+
+    def serve(self, host='127.0.0.1', port=8000):
+        self.full_build()
+        handler = type('Handler', (RequestHandler,), {'dev': self, 'cache': {}, 'lock': threading.Lock()})
+        httpd = ThreadingHTTPServer((host, port), handler)
+        httpd.daemon_threads = True
+        threading.Thread(target=self.watch, daemon=True).start()
+        print(f"🌐 http://{host}:{port}/")
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            print()
+        finally:
+            httpd.server_close()
+
+
+def file_signature(path):
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def inject_livereload(html):
+    index = html.rfind(b'</body>')
+    script = LIVERELOAD_SCRIPT.encode('utf-8')
+    return html + script if index < 0 else html[:index] + script + html[index:]
+
+
+def cache_control(path):
+    return IMMUTABLE if HASHED_NAME.search(path.name) else 'no-cache'
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """ソースのディレクトリを配信する（dev・cache・lock はサーバーごとに設定する）"""
+
+    server_version = 'blogbuild-dev'
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        if urlsplit(self.path).path == LIVERELOAD_PATH:
+            self.stream_reloads()
+        else:
+            self.send_file(head=False)
+
+    def do_HEAD(self):
+        self.send_file(head=True)
+
+    def log_message(self, format, *args):
+        # 成功したリクエストは表示しない
+        if args and str(args[1]).startswith(('4', '5')):
+            super().log_message(format, *args)
+
+    def resolve(self):
+        """URLのパス → ファイル（ソースのディレクトリの外・隠しファイルは None）"""
+        url_path = unquote(urlsplit(self.path).path)
+        parts = [part for part in posixpath.normpath(url_path).split('/') if part not in ('', '.')]
+        if any(part.startswith('.') or part == '..' for part in parts):
+            return None
+        path = self.dev.src_dir.joinpath(*parts)
+        if path.is_dir():
+            if not url_path.endswith('/'):
+                return 'redirect'
+            path = path / 'index.html'
+        return path if path.is_file() else None
+
+    def load(self, path):
+        """(本文, ETag, {エンコーディング: 圧縮した本文})。更新日時とサイズが同じ間はキャッシュから返す"""
+        signature = file_signature(path)
+        with self.lock:
+            cached = self.cache.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        body = path.read_bytes()
+        if path.suffix == '.html':
+            body = inject_livereload(body)
+        encoded = {}
+        if path.suffix in COMPRESS_SUFFIXES:
+            # 隣に圧縮済みのファイルがあればそれを使う（HTMLはスクリプトを差し込むので使わない）
+            for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+                precompressed = path.with_name(path.name + suffix)
+                if path.suffix != '.html' and file_signature(precompressed) and \
+                        precompressed.stat().st_mtime_ns >= signature[0]:
+                    encoded[encoding] = precompressed.read_bytes()
+            if 'br' not in encoded and brotli is not None:
+                encoded['br'] = brotli.compress(body, quality=5)
+            if 'gzip' not in encoded:
+                encoded['gzip'] = gzip.compress(body, compresslevel=6, mtime=0)
+        result = (body, f'"{content_hash(body)[:16]}"', encoded)
+        with self.lock:
+            self.cache[path] = (signature, result)
+        return result
+
+    def send_file(self, head):
+        path = self.resolve()
+        if path == 'redirect':
+            self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+            self.send_header('Location', urlsplit(self.path).path + '/')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if path is None:
+            self.send_error(HTTPStatus.NOT_FOUND)
+            return
+        body, etag, encoded = self.load(path)
+        headers = {'Cache-Control': cache_control(path), 'ETag': etag}
+        if encoded:
+            headers['Vary'] = 'Accept-Encoding'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            return
+        accepted = {value.split(';')[0].strip() for value in self.headers.get('Accept-Encoding', '').split(',')}
+        encoding = next((name for name in ('br', 'gzip') if name in encoded and name in accepted), None)
+        if encoding:
+            body = encoded[encoding]
+            headers['Content-Encoding'] = encoding
+        content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type in ('application/javascript', 'application/json'):
+            content_type += '; charset=utf-8'
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+    def stream_reloads(self):
+        """Server-Sent Events でリロードを送り続ける"""
+        self.send_response(HTTPStatus.OK)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'keep-alive')
+        self.end_headers()
+        self.close_connection = True
+        version = self.dev.reloads.version
+        try:
+            self.wfile.write(b': connected\n\n')
+            self.wfile.flush()
+            while True:
+                new_version, paths = self.dev.reloads.wait(version, KEEPALIVE)
+                if new_version == version:
+                    self.wfile.write(b': ping\n\n')
+                else:
+                    version = new_version
+                    self.wfile.write(f'event: reload\ndata: {json.dumps(paths)}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
@@ -0,0 +1,347 @@
+"""
+単一パスのビルドエンジン
+
+各ページを1回だけ読み込み、登録されたステージを順番に適用して、1回だけ書き出す。
+ステージごとの処理時間を記録して、どこに時間がかかっているかを表示する。
+tracer を渡すと、ページごと・変換ごとの時間もトレースに記録する（trace.py）。
+マニフェストを使い、入力も依存メタデータも変わっていないページはスキップする。
+書き出しはステージングを経由するので、途中で止まっても変換の前と後のページが混ざらない（output.py）。
+ページ同士は独立しているので、変換はプロセスプールで並列に実行できる。
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .manifest import MANIFEST_NAME, Manifest, code_hash, content_hash
+from .output import Staging
+
+
+class Page:
+    """ビルド中の1ページ（メモリ上のドキュメント）"""
+
+    def __init__(self, rel_path, html):
+        self.rel_path = rel_path  # 例: 'day1/index.html'
+        self.html = html
+        self.original = html
+        self.notes = []  # ステージからの報告（書き出し時に表示）
+
+    @property
+    def slug(self):
+        """記事のスラッグ（ホームは空文字）"""
+        parent = Path(self.rel_path).parent
+        return '' if str(parent) == '.' else parent.as_posix()
+
+    @property
+    def root(self):
+        """ページからサイトのルートへの相対パス（ホームは''、記事は'../'）"""
+        return '../' * (len(Path(self.rel_path).parts) - 1)
+
+    @property
+    def is_home(self):
+        return self.rel_path == 'index.html'
+
+    @property
+    def changed(self):
+        return self.html != self.original
+
+
+class Stage:
+    """ページに適用する変換ステップ"""
+
+    def __init__(self, name, func, applies=None, deps=None):
+        self.name = name
+        self.func = func  # func(page, site) が page.html を書き換える
+        self.applies = applies or _always  # applies(page, site) → このページに適用するか
+        self.deps = deps or _no_deps  # deps(page, site) → 出力が依存するメタデータのキー
+
+
+class SiteStage:
+    """サイト全体に1回だけ適用するステップ（メタデータ抽出など）"""
+
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func  # func(site)
+
+
+def _always(page, site):
+    return True
+
+
+def _no_deps(page, site):
+    return []
+
+
+class Site:
+    """ビルド全体で共有する状態"""
+
+    def __init__(self, src_dir):
+        self.src_dir = Path(src_dir)
+        self.rel_paths = []  # 全ページ
+        self.pages = []  # 今回変換するページ
+        self.metadata = {}  # スラッグ → メタデータ
+        self.related = {}  # スラッグ → 関連記事のスラッグ
+        self.images = {}  # 画像の相対パス → {'width', 'height', 'variants'}
+        self.fonts = {}  # 太さ → 自前で配信するフォントのパス
+        self.ogp = {}  # スラッグ → OGP画像のパス
+        self.assets = {}  # 画像の元のパス → ハッシュ付きのパス
+        self.sidebar = ''  # メタデータから作ったサイドバーのHTML
+        self.search_href = ''  # 検索のスクリプトのパス
+        self.home = {}  # ホームの記事一覧（'region'）とスクリプトのパス（'script'）
+        self.manifest = None  # 書き出しの後のマニフェスト（finish_stages から使う）
+        self.lastmod = {}  # rel_path → ページの内容の日付（sitemap の lastmod）
+        self._bytes = {}
+
+    def read_bytes(self, rel_path):
+        """ページを読み込む（同じビルド中は2回目以降キャッシュから返す）"""
+        if rel_path not in self._bytes:
+            self._bytes[rel_path] = (self.src_dir / rel_path).read_bytes()
+        return self._bytes[rel_path]
+
+    def __getstate__(self):
+        # ワーカーには各ページを個別に渡すので、ページ一覧と読み込みキャッシュは送らない
+        state = self.__dict__.copy()
+        state['pages'] = []
+        state['_bytes'] = {}
+        return state
+
+
+class StageTimer:
+    """ステージごとの累積処理時間"""
+
+    def __init__(self):
+        self.totals = {}  # name -> [秒, 処理ページ数]
+
+    def add(self, name, seconds, count=1):
+        entry = self.totals.setdefault(name, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += count
+
+    def merge(self, totals):
+        """ワーカーで計測した時間を合算"""
+        for name, (seconds, count) in totals.items():
+            self.add(name, seconds, count)
+
+    def report(self):
+        """処理時間の表を出力"""
+        total = sum(seconds for seconds, _ in self.totals.values()) or 1e-9
+        print(f"\n{'stage':<20} {'pages':>6} {'ms':>10} {'share':>7}")
+        for name, (seconds, count) in self.totals.items():
+            print(f"{name:<20} {count:>6} {seconds * 1000:>10.1f} {seconds / total:>6.1%}")
+        print(f"{'total':<20} {'':>6} {total * 1000:>10.1f}")
+
+
+def find_pages(src_dir):
+    """src_dir以下のindex.htmlを列挙（.gitなどの隠しディレクトリは除外）"""
+    src_dir = Path(src_dir)
+    paths = []
+    for path in sorted(src_dir.glob('**/index.html')):
+        rel = path.relative_to(src_dir)
+        if any(part.startswith('.') for part in rel.parts):
+            continue
+        paths.append(rel.as_posix())
+    return paths
+
+
+def run_stages(page, site, stages, timer, tracer=None):
+    """1ページに全ステージを順番に適用"""
+    if tracer is not None:
+        return trace_stages(page, site, stages, timer, tracer)
+    for stage in stages:
+        if not stage.applies(page, site):
+            continue
+        start = time.perf_counter()
+        stage.func(page, site)
+        timer.add(stage.name, time.perf_counter() - start)
+
+
+def trace_stages(page, site, stages, timer, tracer):
+    """run_stages と同じだが、ステージごとにトレースのスパンを記録する"""
+    for stage in stages:
+        if not stage.applies(page, site):
+            continue
+        bytes_in = len(page.html.encode('utf-8'))
+        start = time.perf_counter()
+        tracer.begin(stage.name, 'stage', page=page.rel_path)
+        stage.func(page, site)
+        tracer.end(bytes_in=bytes_in, bytes_out=len(page.html.encode('utf-8')))
+        timer.add(stage.name, time.perf_counter() - start)
+
+
+def run_site_stage(site_stage, site, timer, tracer=None):
+    """サイト全体のステップを1つ実行"""
+    start = time.perf_counter()
+    if tracer is not None:
+        tracer.begin(site_stage.name, 'site')
+    site_stage.func(site)
+    if tracer is not None:
+        tracer.end()
+    timer.add(site_stage.name, time.perf_counter() - start)
+
+
+# ワーカープロセスごとに1回だけ受け取るステージとサイト
+_worker = {}
+
+
+def _init_worker(stages, site, tracer):
+    _worker['stages'] = stages
+    _worker['site'] = site
+    _worker['tracer'] = tracer
+    if tracer is not None:
+        # fork したワーカーは親のイベントをコピーして持っているので捨てる
+        tracer.take_events()
+        tracer.install()
+
+
+def _transform(item):
+    """ワーカーで1ページを変換"""
+    rel_path, html = item
+    page = Page(rel_path, html)
+    timer = StageTimer()
+    tracer = _worker['tracer']
+    run_stages(page, _worker['site'], _worker['stages'], timer, tracer)
+    events = tracer.take_events() if tracer is not None else []
+    return page.html, page.notes, timer.totals, events
+
+
+def transform_pages(site, stages, timer, jobs=1, tracer=None):
+    """全ページを変換（jobs > 1 ならプロセスプールで並列、結果の順序は直列と同じ）"""
+    if jobs <= 1 or len(site.pages) < 2:
+        for page in site.pages:
+            run_stages(page, site, stages, timer, tracer)
+        return
+    items = [(page.rel_path, page.html) for page in site.pages]
+    chunksize = max(1, len(items) // (jobs * 4))
+    # ワーカーは自分のトレーサーを差し込むので、このプロセスのものは外しておく（fork で二重にならないように）
+    if tracer is not None:
+        tracer.uninstall()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                             initargs=(stages, site, tracer)) as pool:
+        for page, (html, notes, totals, events) in zip(site.pages,
+                                                        pool.map(_transform, items, chunksize=chunksize)):
+            page.html = html
+            page.notes = notes
+            timer.merge(totals)
+            if tracer is not None:
+                tracer.events.extend(events)
+    if tracer is not None:
+        tracer.install()
+
+
+def page_deps(page, site, stages, resolve):
+    """ページが依存するメタデータのキー → ハッシュ"""
+    deps = {}
+    for stage in stages:
+        if stage.applies(page, site):
+            for key in stage.deps(page, site):
+                deps[key] = resolve(site, key)
+    return deps
+
+
+def build(src_dir, stages, site_stages=(), code_files=(), data_names=(), resolve=None,
+          full=False, jobs=1, finish_stages=(), tracer=None):
+    """変更のあったページだけ読み込み → 全ステージ適用 → 書き出す
+
+    site_stages: ページの変換前にサイト全体で1回だけ実行するステップ
+    code_files: 変換コードのファイル（どれかが変わると全ページ再ビルド）
+    data_names: code_filesのうちコードではなくメタデータとして扱う定数名
+    resolve: 依存キーからメタデータのハッシュを返す関数
+    full: マニフェストを無視して全ページ再ビルド
+    jobs: 変換に使うプロセス数（0ならCPUコア数）
+    finish_stages: 書き出しの後にサイト全体で1回だけ実行するステップ（site.manifest で各ページの出力のハッシュを見られる）
+    tracer: ステージ・ページ・変換ごとのスパンを記録する Tracer（None ならステージの時間だけ）
+    """
+    if tracer is not None:
+        tracer.install()
+        try:
+            return _build(src_dir, stages, site_stages, code_files, data_names, resolve, full, jobs,
+                          finish_stages, tracer)
+        finally:
+            tracer.uninstall()
+    return _build(src_dir, stages, site_stages, code_files, data_names, resolve, full, jobs, finish_stages, None)
+
+
+def _build(src_dir, stages, site_stages, code_files, data_names, resolve, full, jobs, finish_stages, tracer):
+    wall_start = time.perf_counter()
+    jobs = jobs or os.cpu_count() or 1
+    site = Site(src_dir)
+    timer = StageTimer()
+    resolve = resolve or (lambda site, key: '')
+
+    # 前回のビルドが書き出しの途中で止まっていたら、先に片付ける
+    recovered = Staging.recover(site.src_dir)
+    if recovered:
+        print(f"🩹 前回のビルドの書き出しを {recovered} ページ分済ませました")
+    manifest = Manifest.load(site.src_dir / MANIFEST_NAME)
+    code = code_hash(code_files, data_names)
+    if full or manifest.code_hash != code:
+        manifest.pages = {}
+        manifest.code_hash = code
+
+    # 1. サイト全体のステップ（メタデータ抽出など）
+    site.rel_paths = find_pages(site.src_dir)
+    for site_stage in site_stages:
+        run_site_stage(site_stage, site, timer, tracer)
+
+    # 2. 読み込み（変更があったページだけ、各ページ1回だけ）
+    deps_by_page = {}
+    skipped = 0
+    for rel_path in site.rel_paths:
+        start = time.perf_counter()
+        path = site.src_dir / rel_path
+        deps = page_deps(Page(rel_path, ''), site, stages, resolve)
+        deps_by_page[rel_path] = deps
+        deps_ok = manifest.deps_match(rel_path, deps)
+        stat = path.stat()
+        if deps_ok and manifest.stat_matches(rel_path, stat):
+            skipped += 1
+            timer.add('load', time.perf_counter() - start)
+            continue
+        data = site.read_bytes(rel_path)
+        if deps_ok and manifest.content_matches(rel_path, content_hash(data)):
+            manifest.touch(rel_path, stat)
+            skipped += 1
+            timer.add('load', time.perf_counter() - start)
+            continue
+        site.pages.append(Page(rel_path, data.decode('utf-8')))
+        timer.add('load', time.perf_counter() - start)
+
+    # 3. 変換
+    transform_pages(site, stages, timer, jobs, tracer)
+
+    # 4. 書き出し（各ページ1回だけ。ステージングに書いてから一気に置き換える）
+    written = 0
+    staging = Staging(site.src_dir)
+    for page in site.pages:
+        start = time.perf_counter()
+        if page.changed and staging.add(page.rel_path, page.html):
+            timer.add('write', time.perf_counter() - start)
+            notes = f" ({', '.join(page.notes)})" if page.notes else ''
+            print(f"✓ {page.rel_path}: updated{notes}")
+            written += 1
+        else:
+            print(f"○ {page.rel_path}: unchanged")
+    start = time.perf_counter()
+    staging.commit()
+    if written:
+        timer.add('write', time.perf_counter() - start, count=0)
+    for page in site.pages:
+        manifest.record(page.rel_path, content_hash(page.original), content_hash(page.html),
+                        deps_by_page[page.rel_path], (site.src_dir / page.rel_path).stat())
+
+    # 消えたページはマニフェストからも消す
+    for rel_path in set(manifest.pages) - set(site.rel_paths):
+        del manifest.pages[rel_path]
+    manifest.save()
+
+    # 5. 書き出した結果を使うサイト全体のステップ（サイトマップ・フィードなど）
+    site.manifest = manifest
+    for site_stage in finish_stages:
+        run_site_stage(site_stage, site, timer, tracer)
+
+    wall = time.perf_counter() - wall_start
+    print(f"\n✅ {written}/{len(site.pages)} pages written, {skipped} skipped (up to date)")
+    print(f"⏱  {wall:.3f}s wall, {len(site.pages) / wall:.1f} pages/s (jobs={jobs})")
+    timer.report()
+    return site, timer
@@ -0,0 +1,153 @@
+"""
+sitemap.xml と Atom / JSON のフィードを書き出す
+
+lastmod（フィードの updated）はページの内容から決める。記事は更新日（article:modified_time）か
+公開日、一覧のページは載せている一番新しい記事の日付（ホームはサイト全体で一番新しい記事）。
+ファイルの更新日時は使わないので、チェックアウトし直しても・CIでビルドしても同じ値になる。
+日付のないページは lastmod を付けず、日付のない記事はフィードに載せない。
+
+  sitemap.xml : すべてのページ（日付があれば lastmod 付き）
+  feed.xml    : Atom（新しい記事 FEED_ENTRIES 件）
+  feed.json   : JSON Feed 1.1（同じ記事）
+
+どのファイルも内容が変わったときだけ書き直す。
+"""
+
+import json
+from xml.sax.saxutils import escape
+
+from .archives import SITE_TITLE, SITE_URL, sorted_articles
+from .output import write_atomic
+
+SITEMAP_NAME = 'sitemap.xml'
+ATOM_NAME = 'feed.xml'
+JSON_FEED_NAME = 'feed.json'
+FEED_ENTRIES = 20
+SITE_DESCRIPTION = 'OpenClaw実践記録 — やったこと全部書く'
+AUTHOR = 'daisuki-koshian'
+ATTR_ENTITIES = {'"': '&quot;'}
+
+
+def page_url(rel_path):
+    """'day1/index.html' → 'https://.../blog/day1/'"""
+    return SITE_URL + rel_path[:-len('index.html')]
+
+
+def published(date, fallback=None):
+    """メタデータの日付（'2026-02-17' / '2026-02'）を日時にする（なければ fallback）"""
+    parts = date.split('-')
+    if len(parts) < 2:
+        return fallback
+    year, month, day = (parts + ['01'])[:3]
+    return f'{year}-{month}-{day}T00:00:00+09:00'
+
+
+def page_date(meta):
+    """ページの内容にある日付（更新日、なければ公開日）。'2026-02' のように日がないこともある"""
+    return meta.get('modified') or meta.get('date', '')
+
+
+def update_lastmod(site):
+    """rel_path → lastmod（ページの内容の日付。日付のないページは入れない）"""
+    newest = max((page_date(meta) for _, meta in sorted_articles(site)), default='')
+    lastmod = {}
+    for rel_path in sorted(site.manifest.pages):
+        slug = rel_path[:-len('index.html')].rstrip('/')
+        date = newest if not slug else page_date(site.metadata.get(slug, {}))
+        if date:
+            lastmod[rel_path] = date
+    site.lastmod = lastmod
+
+
+def render_sitemap(rel_paths, lastmod):
+    urls = []
+    for rel_path in sorted(rel_paths):
+        modified = f'    <lastmod>{lastmod[rel_path]}</lastmod>\n' if rel_path in lastmod else ''
+        urls.append(f'  <url>\n    <loc>{escape(page_url(rel_path))}</loc>\n{modified}  </url>\n')
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n'
+            + ''.join(urls) + '</urlset>\n')
+
+
+def feed_entries(site):
+    """フィードに載せる記事（新しい順に FEED_ENTRIES 件）"""
+    entries = []
+    for slug, meta in sorted_articles(site)[:FEED_ENTRIES]:
+        updated = published(page_date(meta))
+        if not updated:
+            continue
+        entries.append({
+            'url': page_url(f'{slug}/index.html'),
+            'title': meta.get('title', slug),
+            'summary': meta.get('desc', ''),
+            'tag': meta.get('tag', ''),
+            'published': published(meta.get('date', ''), updated),
+            'updated': updated,
+        })
+    return entries
+
+
+def render_atom(entries):
+    updated = max((entry['updated'] for entry in entries), default='1970-01-01T09:00:00+09:00')
+    items = []
+    for entry in entries:
+        category = f'    <category term="{escape(entry["tag"], ATTR_ENTITIES)}"/>\n' if entry['tag'] else ''
+        items.append(
+            '  <entry>\n'
+            f'    <title>{escape(entry["title"])}</title>\n'
+            f'    <link href="{escape(entry["url"])}"/>\n'
+            f'    <id>{escape(entry["url"])}</id>\n'
+            f'    <published>{entry["published"]}</published>\n'
+            f'    <updated>{entry["updated"]}</updated>\n'
+            f'{category}'
+            f'    <summary>{escape(entry["summary"])}</summary>\n'
+            '  </entry>\n')
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="ja">\n'
+            f'  <title>{escape(SITE_TITLE)}</title>\n'
+            f'  <subtitle>{escape(SITE_DESCRIPTION)}</subtitle>\n'
+            f'  <link href="{SITE_URL}"/>\n'
+            f'  <link href="{SITE_URL}{ATOM_NAME}" rel="self" type="application/atom+xml"/>\n'
+            f'  <id>{SITE_URL}</id>\n'
+            f'  <updated>{updated}</updated>\n'
+            f'  <author><name>{AUTHOR}</name></author>\n'
+            + ''.join(items) + '</feed>\n')
+
+
+def render_json_feed(entries):
+    feed = {
+        'version': 'https://jsonfeed.org/version/1.1',
+        'title': SITE_TITLE,
+        'description': SITE_DESCRIPTION,
+        'home_page_url': SITE_URL,
+        'feed_url': SITE_URL + JSON_FEED_NAME,
+        'language': 'ja',
+        'authors': [{'name': AUTHOR}],
+        'items': [{
+            'id': entry['url'],
+            'url': entry['url'],
+            'title': entry['title'],
+            'summary': entry['summary'],
+            'date_published': entry['published'],
+            'date_modified': entry['updated'],
+            **({'tags': [entry['tag']]} if entry['tag'] else {}),
+        } for entry in entries],
+    }
+    return json.dumps(feed, ensure_ascii=False, indent=1) + '\n'
+
+
+def write_feeds(site):
+    """サイトマップとフィードのステージ: ページの内容の日付から lastmod を決めて書き出す"""
+    update_lastmod(site)
+    entries = feed_entries(site)
+    files = {
+        SITEMAP_NAME: render_sitemap(site.manifest.pages, site.lastmod),
+        ATOM_NAME: render_atom(entries),
+        JSON_FEED_NAME: render_json_feed(entries),
+    }
+    written = [name for name, text in files.items() if write_atomic(site.src_dir / name, text)]
+    undated = [slug for slug, meta in sorted_articles(site) if not published(page_date(meta))]
+    if undated:
+        print(f"⚠️  feeds: 日付のない記事はフィードに載せません（{', '.join(undated)}）")
+    if written:
+        print(f"📰 feeds: {', '.join(written)} ({len(site.manifest.pages)} pages, {len(entries)} entries)")
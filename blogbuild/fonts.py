@@ -0,0 +1,159 @@
+"""
+Noto Sans JP をサブセット化して自前で配信する
+
+各ページは <style> の中で Google Fonts の CSS を @import しているが、これは描画を止めたうえに
+別ドメインへの連鎖したリクエストになり、読み込むフォントも日本語全体で大きい。
+サイト全体で実際に使われている文字（メタデータ抽出で集めたもの）だけを残した WOFF2 を
+3つの太さ（400/700/900）ぶん assets/ に書き出し、各ページには @font-face（font-display: swap）と
+本文の太さの <link rel="preload"> を入れて @import を取り除く。
+
+ファイル名には文字集合のハッシュが入るので、使われる文字が変わったときだけサブセットし直す。
+サブセットには fontTools（WOFF2には brotli も）と、.fonts/ に置いた元のフォントが必要。
+どちらもなければ前回のサブセットを使い、それもなければページは Google Fonts のままにする。
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from .css_bundle import bundle_css
+from .manifest import content_hash
+
+try:
+    from fontTools import subset
+except ImportError:  # fontToolsがなければ前回のサブセットを使う
+    subset = None
+
+try:
+    import brotli  # noqa: F401  fontToolsがWOFF2を書き出すのに使う
+    FLAVOR = 'woff2'
+except ImportError:
+    FLAVOR = 'woff'
+
+ASSETS_DIR = 'assets'
+SOURCE_DIR = '.fonts'
+FAMILY = 'Noto Sans JP'
+BODY_WEIGHT = 400
+# 太さ → 元のフォント（Google Fonts の静的フォントのファイル名）
+SOURCE_FONTS = {
+    400: 'NotoSansJP-Regular.ttf',
+    700: 'NotoSansJP-Bold.ttf',
+    900: 'NotoSansJP-Black.ttf',
+}
+# 動的に入る数字や英字のために、ASCIIの印字可能文字はいつも入れておく
+BASE_CHARS = ''.join(chr(code) for code in range(0x20, 0x7f))
+
+FONT_PATTERN = re.compile(r'noto-sans-jp-(\d+)\.[0-9a-f]{10}\.woff2?')
+GOOGLE_IMPORT = re.compile(r"[ \t]*@import url\('https://fonts\.googleapis\.com/css2\?family=Noto\+Sans\+JP[^']*'\);\n?")
+FONT_BLOCK = re.compile(
+    r'<link rel="preload" href="[^"]*assets/noto-sans-jp-\d+\.[0-9a-f]{10}\.woff2?"[^>]*>\n'
+    r'<style id="font-face">.*?</style>\n', re.DOTALL)
+CSS_CONTENT = re.compile(r'content:\s*([\'"])(.*?)\1')
+
+
+def site_chars(site):
+    """サイト全体で表示される文字（ページの文字 + 共通スタイルシートの content: の文字）"""
+    chars = set(BASE_CHARS)
+    for meta in site.metadata.values():
+        chars.update(meta.get('chars', ''))
+    for _, text in CSS_CONTENT.findall(bundle_css()):
+        chars.update(text)
+    return ''.join(sorted(chars))
+
+
+def subset_font(src, dest, text):
+    """1つの太さをサブセット化（ワーカーで実行）"""
+    options = subset.Options()
+    options.flavor = FLAVOR
+    options.layout_features = ['*']  # 縦書き・約物の詰めなどの機能は残す
+    options.name_IDs = ['*']
+    font = subset.load_font(src, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(text=text)
+    subsetter.subset(font)
+    tmp = f'{dest}.tmp'
+    subset.save_font(font, tmp, options)
+    os.replace(tmp, dest)
+    return os.path.getsize(dest)
+
+
+def existing_fonts(assets):
+    """前回書き出したサブセット（太さ → ファイル名）"""
+    if not assets.is_dir():
+        return {}
+    fonts = {}
+    for path in assets.iterdir():
+        match = FONT_PATTERN.fullmatch(path.name)
+        if match:
+            fonts[int(match.group(1))] = path.name
+    return fonts
+
+
+def write_fonts(site):
+    """フォントのサブセットのステージ: 文字集合が変わった太さだけサブセットし直す"""
+    assets = site.src_dir / ASSETS_DIR
+    source_dir = site.src_dir / SOURCE_DIR
+    text = site_chars(site)
+    previous = existing_fonts(assets)
+    fonts = {}
+    jobs = []  # (元のフォント, 書き出し先, 文字)
+    for weight, filename in SOURCE_FONTS.items():
+        source = source_dir / filename
+        if not source.exists():
+            continue
+        stat = source.stat()
+        key = content_hash(f'{text}\0{filename}\0{stat.st_size}\0{stat.st_mtime_ns}\0{FLAVOR}')
+        name = f'noto-sans-jp-{weight}.{key[:10]}.{FLAVOR}'
+        fonts[weight] = name
+        if not (assets / name).exists():
+            jobs.append((str(source), str(assets / name), text))
+
+    if jobs and subset is None:
+        print("⚠️  fonts: fontToolsがないのでサブセットできません（pip install fonttools brotli）")
+        fonts = {}
+    elif jobs:
+        assets.mkdir(exist_ok=True)
+        with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+            sizes = list(pool.map(subset_font, *zip(*jobs)))
+        print(f"🔤 fonts: subset {len(jobs)} weights to {len(text):,} chars ({sum(sizes):,} bytes)")
+    if len(fonts) < len(SOURCE_FONTS):
+        if previous:
+            # 元のフォントがないか、サブセットできない環境では前回のものを使い続ける
+            fonts = previous
+        else:
+            if not jobs:
+                print(f"⚠️  fonts: {SOURCE_DIR}/ に元のフォント（{', '.join(SOURCE_FONTS.values())}）がないので"
+                      "Google Fonts のままにします")
+            fonts = {}
+    for weight, name in previous.items():
+        if fonts.get(weight) != name:
+            (assets / name).unlink()
+    site.fonts = {weight: f'{ASSETS_DIR}/{name}' for weight, name in sorted(fonts.items())}
+
+
+def font_face_css(fonts, root):
+    rules = []
+    for weight, href in fonts.items():
+        fmt = 'woff2' if href.endswith('.woff2') else 'woff'
+        rules.append(f"@font-face{{font-family:'{FAMILY}';font-style:normal;font-weight:{weight};"
+                     f"font-display:swap;src:url('{root}{href}') format('{fmt}')}}")
+    return ''.join(rules)
+
+
+def self_host_fonts(page, site):
+    """Google Fonts の @import を、自前のサブセットの @font-face と preload に置き換える"""
+    if not site.fonts:
+        return
+    html = FONT_BLOCK.sub('', page.html)
+    if html == page.html and not GOOGLE_IMPORT.search(html):
+        return
+    html = GOOGLE_IMPORT.sub('', html)
+    body = site.fonts.get(BODY_WEIGHT) or next(iter(site.fonts.values()))
+    fmt = 'woff2' if body.endswith('.woff2') else 'woff'
+    block = (f'<link rel="preload" href="{page.root}{body}" as="font" type="font/{fmt}" crossorigin>\n'
+             f'<style id="font-face">{font_face_css(site.fonts, page.root)}</style>\n')
+    # 先読みの対象を早く見つけられるよう、<head>のできるだけ前（文字コードの指定の直後）に入れる
+    match = re.search(r'<meta charset="[^"]*">\n', html) or re.search(r'<head>\n', html)
+    if match is None:
+        return
+    page.html = html[:match.end()] + block + html[match.end():]
@@ -0,0 +1,325 @@
+"""
+ホームの記事一覧をメタデータから作り、ページ分けして続きを後から読み込む
+
+ホーム（index.html）にはすべての記事のカードを手で並べていたので、記事が増えるほど
+最初に読み込むHTMLが大きくなっていた。メタデータ抽出の結果から新しい順に並べ、
+ホームには HOME_PER_PAGE 件だけ載せて、残りは
+  page/<n>/index.html  : 一覧ページ（スクリプトがなくても辿れる静的なページ）
+  page/<n>/cards.json  : {"cards": [ホームのカードのHTML, ...], "next": 次のファイル or null}
+に書き出す。assets/home.<hash>.js が一覧の終わりが見えたら（か「もっと読む」で）
+次の cards.json を読み込んで足すので、記事が増えてもホームの大きさは変わらない。
+
+カードのサムネイル（記事ごとに手で作ったもの）とタブの分類（data-category）は
+今のホームと書き出したカードから拾って .home-index.json に残し、新しい記事には
+タグを載せた共通のサムネイルを使う。書き出すファイルは一覧ページと同じく、
+内容が変わったものだけ書き直す。
+"""
+
+import html as html_lib
+import json
+import re
+
+import add_features
+import enhance_mobile
+
+from .archives import format_date, load_index, refresh_pages, render_listing, sync_pages
+from .manifest import content_hash
+from .metadata import normalize_date
+from .output import write_atomic
+
+INDEX_NAME = '.home-index.json'
+INDEX_VERSION = 1
+
+HOME_PER_PAGE = 12
+ASSETS_DIR = 'assets'
+CHUNK_NAME = 'cards.json'
+LISTING_NAME = 'すべての記事'
+LISTING_KIND = '記事一覧'
+NEWS_CATEGORY = 'news'
+
+# 手で書いたカードも書き出したカードも同じ形: サムネイル（任意のHTML）→ 本文
+HOME_CARD = re.compile(
+    r'<a href="([^"]+)/" class="article-card[^"]*" data-category="([^"]*)">\n'
+    r'(.*?)      <div class="article-card-content">.*?<div class="meta">([^<]*)</div>', re.DOTALL)
+ARTICLES_REGION = re.compile(
+    r'  <div class="articles">\n.*?\n  </div>\n\n  <div class="load-more-wrap">\n(?:.*?\n)?  </div>\n', re.DOTALL)
+# 以前ホームに埋め込んでいたタブ切り替え・検索・「もっと読む」の処理
+LEGACY_SCRIPTS = (
+    re.compile(r'\n  // タブ切り替え機能\n  \(function\(\) \{\n.*?showTab\(\'news\'\);\n  \}\)\(\);\n', re.DOTALL),
+    re.compile(r'\n  // Search functionality\n  const articlesData = \[.*?(?=\n</script>)', re.DOTALL),
+    re.compile(r'<script>\n\(function\(\) \{\n  var btn = document\.getElementById\(\'loadMore\'\);.*?</script>\n',
+               re.DOTALL),
+)
+SCRIPT_PATTERN = re.compile(r'home\.[0-9a-f]{10}\.js')
+HOME_SCRIPT = re.compile(r'<script src="[^"]*assets/home\.[0-9a-f]{10}\.js" defer></script>\n?')
+
+CARD_TEMPLATE = """    <a href="{slug}/" class="article-card fade-in" data-category="{category}">
+{thumb}      <div class="article-card-content">
+        <span class="tag">{tag}</span>
+        <h2>{title}</h2>
+        <div class="desc">
+          {desc}
+        </div>
+        <div class="meta">{meta}</div>
+      </div>
+    </a>
+"""
+
+DEFAULT_THUMB = """      <div class="article-card-thumb" data-thumb="default" style="background: linear-gradient(135deg, #fff5f5 0%, #fafafa 100%);">
+        <div style="font-size: 18px; font-weight: 900; color: #e63946; line-height: 1.4; text-align: center;">{tag}</div>
+      </div>
+"""
+
+REGION_TEMPLATE = """  <div class="articles">
+
+{cards}
+  </div>
+
+  <div class="load-more-wrap">
+{more}
+  </div>
+"""
+
+MORE_TEMPLATE = ('    <a class="load-more-btn" id="loadMore" href="{href}" data-next="{next}" '
+                 'style="text-decoration: none;" aria-label="記事をもっと読む">もっと読む</a>')
+
+HOME_JS = r"""// ホームの記事一覧（タブ・続きの読み込み・絞り込み）
+(function() {
+  var list = document.querySelector('.articles');
+  if (!list) return;
+  var more = document.getElementById('loadMore');
+  var wrap = more && more.parentNode;
+  var box = document.getElementById('searchBox');
+  var tabs = document.querySelectorAll('.tab-btn');
+  var active = document.querySelector('.tab-btn.active');
+  var tab = active ? active.getAttribute('data-tab') : 'news';
+  var next = more && more.getAttribute('data-next');
+  var query = '';
+  var loading = null;
+  var failed = false;
+
+  function matches(card) {
+    if (query) return card.textContent.toLowerCase().indexOf(query) !== -1;
+    return card.getAttribute('data-category') === tab;
+  }
+
+  function update() {
+    list.querySelectorAll('.article-card').forEach(function(card) {
+      card.classList.remove('card-hidden');
+      card.style.display = matches(card) ? '' : 'none';
+    });
+    if (wrap) wrap.style.display = next || failed ? '' : 'none';
+  }
+
+  // 次のまとまり（page/<n>/cards.json）を一覧の最後に足す。もうなければ false
+  function load() {
+    if (!next || failed) return Promise.resolve(false);
+    if (!loading) {
+      loading = fetch(new URL(next, document.baseURI)).then(function(r) {
+        if (!r.ok) throw new Error(r.status);
+        return r.json();
+      }).then(function(data) {
+        var count = list.querySelectorAll('.article-card').length;
+        list.insertAdjacentHTML('beforeend', data.cards.join('\n'));
+        next = data.next;
+        if (next) more.href = next.replace(/CHUNK_NAME$/, '');
+        var added = Array.prototype.slice.call(list.querySelectorAll('.article-card'), count);
+        requestAnimationFrame(function() {
+          added.forEach(function(card) { card.classList.add('fade-in-visible'); });
+        });
+        loading = null;
+        update();
+        return true;
+      }, function() {
+        // 読み込めなければ「もっと読む」は普通のリンク（次の一覧ページ）に戻す
+        failed = true;
+        loading = null;
+        update();
+        return false;
+      });
+    }
+    return loading;
+  }
+
+  // 一覧の終わりが見えている間は読み込み続ける（タブの記事が少ないときも埋まるように）
+  function fill() {
+    if (!wrap || !next || query) return;
+    if (wrap.getBoundingClientRect().top < window.innerHeight + 400) {
+      load().then(function(loaded) { if (loaded) fill(); });
+    }
+  }
+
+  function loadAll() {
+    return load().then(function(loaded) { return loaded ? loadAll() : null; });
+  }
+
+  if (more) {
+    more.addEventListener('click', function(e) {
+      if (failed) return;
+      e.preventDefault();
+      load();
+    });
+  }
+  tabs.forEach(function(btn) {
+    btn.addEventListener('click', function() {
+      tab = btn.getAttribute('data-tab');
+      tabs.forEach(function(b) { b.classList.toggle('active', b === btn); });
+      update();
+      fill();
+    });
+  });
+  if (box) {
+    box.addEventListener('input', function() {
+      query = box.value.trim().toLowerCase();
+      update();
+      if (query) loadAll();
+      else fill();
+    });
+  }
+  if (wrap && 'IntersectionObserver' in window) {
+    new IntersectionObserver(function(entries) {
+      if (entries[0].isIntersecting) fill();
+    }, { rootMargin: '0px 0px 400px 0px' }).observe(wrap);
+  }
+  update();
+})();
+""".replace('CHUNK_NAME', CHUNK_NAME.replace('.', r'\.'))
+
+
+def chunk_dir(number):
+    return f'page/{number}'
+
+
+def harvest_cards(html):
+    """ホームやカードのHTMLから手で作ったカードの見た目を拾う: スラッグ → {category, thumb, date}"""
+    cards = {}
+    for slug, category, thumb, meta in HOME_CARD.findall(html):
+        if 'data-thumb="default"' in thumb:
+            continue  # 共通のサムネイルはタグが変わったら作り直す
+        cards[slug] = {'category': category, 'thumb': thumb, 'date': normalize_date(meta)}
+    return cards
+
+
+def collect_cards(site, previous):
+    """前回の記録に、今のホームと書き出したカードから拾ったものを重ねる"""
+    cards = dict(previous)
+    for path in sorted(site.src_dir.glob(f'page/*/{CHUNK_NAME}')):
+        try:
+            chunk = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            continue
+        cards.update(harvest_cards('\n'.join(chunk.get('cards', []))))
+    home = site.src_dir / 'index.html'
+    if home.exists():
+        # ホームで手直ししたサムネイルを優先する
+        cards.update(harvest_cards(home.read_text(encoding='utf-8')))
+    return cards
+
+
+def home_articles(site, cards):
+    """ホームに並べる記事（新しい順）: [(slug, meta), ...]
+
+    日付が抽出できない記事はカードに書いてあった日付を使い、同じ日付の中では
+    前回ホームに並んでいた順（新しい記事は先頭）を保つ。
+    """
+    order = {slug: position for position, slug in enumerate(cards)}
+    articles = []
+    for slug, meta in site.metadata.items():
+        if not slug or meta.get('type') != 'article':
+            continue
+        if not meta.get('date') and cards.get(slug, {}).get('date'):
+            meta = dict(meta, date=cards[slug]['date'])
+        articles.append((slug, meta))
+    articles.sort(key=lambda item: (item[1].get('date', ''), -order.get(item[0], -1)), reverse=True)
+    return articles
+
+
+def card_category(slug, meta, cards, tag_categories):
+    """タブの分類（拾えなければ同じタグのカードの分類、それもなければ CATEGORIES で決める）"""
+    if slug in cards:
+        return cards[slug]['category']
+    if meta.get('tag') in tag_categories:
+        return tag_categories[meta['tag']]
+    cat_key, _ = add_features.get_category(slug)
+    return NEWS_CATEGORY if cat_key == NEWS_CATEGORY else 'blog'
+
+
+def render_card(slug, meta, cards, tag_categories):
+    """ホームのカード1枚（サムネイルは拾ったもの、なければタグを載せた共通のもの）"""
+    info = add_features.get_article_info(slug, {slug: meta})
+    details = [format_date(meta.get('date', ''))]
+    if info.get('reading_time'):
+        details.append(f"約{info['reading_time']}分")
+    tag = html_lib.escape(meta.get('tag', ''))
+    thumb = cards[slug]['thumb'] if slug in cards else DEFAULT_THUMB.format(tag=tag)
+    return CARD_TEMPLATE.format(
+        slug=slug,
+        category=card_category(slug, meta, cards, tag_categories),
+        thumb=thumb,
+        tag=tag,
+        title=html_lib.escape(info.get('title', slug)),
+        desc=html_lib.escape(info.get('desc', '')),
+        meta=' • '.join(detail for detail in details if detail),
+    )
+
+
+def render_region(cards, chunks):
+    """ホームの一覧と「もっと読む」（続きがなければボタンは出さない）"""
+    more = ''
+    if chunks > 1:
+        more = MORE_TEMPLATE.format(href=f'{chunk_dir(2)}/', next=f'{chunk_dir(2)}/{CHUNK_NAME}')
+    return REGION_TEMPLATE.format(cards='\n'.join(cards), more=more)
+
+
+def write_script(site):
+    """ホームのスクリプトを書き出す（古いハッシュのファイルは消す）。戻り値は書いたか"""
+    name = f'home.{content_hash(HOME_JS)[:10]}.js'
+    assets = site.src_dir / ASSETS_DIR
+    assets.mkdir(exist_ok=True)
+    path = assets / name
+    written = write_atomic(path, HOME_JS)
+    for old in assets.iterdir():
+        if SCRIPT_PATTERN.fullmatch(old.name) and old.name != name:
+            old.unlink()
+    return f'{ASSETS_DIR}/{name}', written
+
+
+def write_home(site):
+    """ホームの一覧のステージ: 2ページ目以降の一覧ページとカードのまとまりを書き出す"""
+    index_path = site.src_dir / INDEX_NAME
+    index = load_index(index_path, INDEX_VERSION)
+    cards = collect_cards(site, index.get('cards', {}))
+    articles = home_articles(site, cards)
+    tag_categories = {meta.get('tag'): cards[slug]['category'] for slug, meta in articles if slug in cards}
+    rendered = [render_card(slug, meta, cards, tag_categories) for slug, meta in articles]
+    chunks = [rendered[start:start + HOME_PER_PAGE] for start in range(0, len(rendered), HOME_PER_PAGE)] or [[]]
+
+    pages = render_listing('.', LISTING_KIND, LISTING_NAME, articles, first=2, per_page=HOME_PER_PAGE)
+    for number in range(2, len(chunks) + 1):
+        following = f'{chunk_dir(number + 1)}/{CHUNK_NAME}' if number < len(chunks) else None
+        pages[f'{chunk_dir(number)}/{CHUNK_NAME}'] = json.dumps(
+            {'cards': chunks[number - 1], 'next': following}, ensure_ascii=False, separators=(',', ':'))
+    hashes, written, removed = sync_pages(site, pages, index.get('pages', {}))
+    script, script_written = write_script(site)
+    kept = {slug: cards[slug] for slug, _ in articles if slug in cards}
+    write_atomic(index_path, json.dumps({'version': INDEX_VERSION, 'pages': hashes, 'cards': kept},
+                                        ensure_ascii=False, indent=1))
+
+    site.home = {'region': render_region(chunks[0], len(chunks)), 'script': script}
+    if written or removed or script_written:
+        print(f"🏠 home: {len(chunks[0])} of {len(articles)} articles on the home page, "
+              f"{written + script_written} files written, {removed} removed")
+    if written or removed:
+        refresh_pages(site)
+
+
+def home_page(page, site):
+    """ホームの記事一覧を作り直し、以前の埋め込みスクリプトをホームのスクリプトに置き換える"""
+    if not site.home or not ARTICLES_REGION.search(page.html):
+        return
+    html = ARTICLES_REGION.sub(lambda m: site.home['region'], page.html, count=1)
+    for pattern in LEGACY_SCRIPTS:
+        html = pattern.sub('', html)
+    html = HOME_SCRIPT.sub('', html)
+    tag = enhance_mobile.script_tag(page.root + site.home['script'])
+    page.html = html.replace('</body>', f'{tag}</body>', 1)
@@ -0,0 +1,269 @@
+"""
+記事の画像を最適化する（WebP/AVIF・複数サイズ・<picture>・width/height）
+
+ページと同じディレクトリのPNG/JPEGを、いくつかの幅のWebP/AVIFに変換して
+<stem>-<幅>w.webp / .avif として隣に置き、ページの<img>を<picture>と srcset/sizes で包む。
+<img>には元画像の width/height を入れて、読み込み中のレイアウトのずれを防ぐ。
+
+変換結果は元画像のハッシュをキーにして .image-cache/ に残し、.image-index.json に
+記録するので、変わっていない画像は二度と変換しない。変換はCPUコア数のプロセスで並列に行う。
+Pillowがない環境では変換はせず、width/height だけを入れる（サイズはヘッダーから読む）。
+"""
+
+import json
+import os
+import posixpath
+import re
+import shutil
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .assets import HASHED_NAME, original_name
+from .manifest import content_hash
+from .output import write_atomic
+
+try:
+    from PIL import Image, features
+except ImportError:  # Pillowがなければ width/height だけ入れる
+    Image = None
+
+INDEX_NAME = '.image-index.json'
+CACHE_DIR = '.image-cache'
+INDEX_VERSION = 1
+
+SOURCE_SUFFIXES = {'.png', '.jpg', '.jpeg'}
+SKIP_DIRS = {'assets'}  # OGP画像などはクローラー向けにそのままの形式で置く
+WIDTHS = (480, 960, 1600)
+QUALITY = {'avif': 55, 'webp': 80}
+MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+# 本文の最大幅（.main-content）に合わせる
+SIZES = '(max-width: 780px) 100vw, 780px'
+
+# width/height を入れた画像が縦に伸びないように
+IMAGE_CSS = """
+  img[width][height] {
+    height: auto;
+  }
+"""
+
+IMG_TAG = re.compile(r'<img\b[^>]*>')
+SRC_ATTR = re.compile(r'\ssrc="([^"]*)"')
+SIZE_ATTRS = re.compile(r' width="\d+" height="\d+"')
+PICTURE_PATTERN = re.compile(r'<picture>(?:<source [^>]*>)+(<img\b[^>]*>)</picture>')
+
+
+def image_size(data):
+    """PNG/JPEG/GIF/WebPのヘッダーから (幅, 高さ) を読む（読めなければ None）"""
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and data[12:16] == b'IHDR':
+        return struct.unpack('>II', data[16:24])
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        return struct.unpack('<HH', data[6:10])
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        chunk = data[12:16]
+        if chunk == b'VP8 ':
+            width, height = struct.unpack('<HH', data[26:30])
+            return width & 0x3fff, height & 0x3fff
+        if chunk == b'VP8L':
+            bits = int.from_bytes(data[21:25], 'little')
+            return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1
+        if chunk == b'VP8X':
+            return int.from_bytes(data[24:27], 'little') + 1, int.from_bytes(data[27:30], 'little') + 1
+        return None
+    if data[:2] == b'\xff\xd8':
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xff:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker in (0xd8, 0x01) or 0xd0 <= marker <= 0xd7 or marker == 0xff:
+                i += 1 if marker == 0xff else 2
+                continue
+            length = struct.unpack('>H', data[i + 2:i + 4])[0]
+            # SOFn（DHT・JPG・DACは除く）に画像のサイズがある
+            if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+                height, width = struct.unpack('>HH', data[i + 5:i + 9])
+                return width, height
+            i += 2 + length
+    return None
+
+
+def target_widths(width):
+    """元画像より大きくしない。元が一番小さい幅より小さければ元の幅だけ"""
+    widths = [w for w in WIDTHS if w < width]
+    widths.append(min(width, WIDTHS[-1]))
+    return sorted(set(widths))
+
+
+def available_formats():
+    """このPillowで書き出せる形式（小さい順に並べる＝<source>の優先順）"""
+    if Image is None:
+        return []
+    formats = []
+    if features.check('avif'):
+        formats.append('avif')
+    if features.check('webp'):
+        formats.append('webp')
+    return formats
+
+
+def variant_name(rel_path, width, fmt):
+    """'news-klarna/source-screenshot.png' → 'news-klarna/source-screenshot-480w.webp'"""
+    stem = posixpath.splitext(rel_path)[0]
+    return f'{stem}-{width}w.{fmt}'
+
+
+def encode_variant(src, dest, width, fmt):
+    """1枚を縮小して変換（ワーカーで実行）"""
+    with Image.open(src) as image:
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.LANCZOS)
+        tmp = Path(f'{dest}.tmp')
+        image.save(tmp, format=fmt.upper(), quality=QUALITY[fmt],
+                   **({'method': 6} if fmt == 'webp' else {}))
+        os.replace(tmp, dest)
+    return Path(dest).stat().st_size
+
+
+def find_images(src_dir):
+    """ページのディレクトリにあるPNG/JPEG（隠しディレクトリと assets/、ハッシュ付きのコピーは除外）"""
+    images = []
+    for dirpath, dirnames, filenames in os.walk(src_dir):
+        rel_dir = Path(dirpath).relative_to(src_dir)
+        dirnames[:] = sorted(name for name in dirnames
+                             if not name.startswith('.') and not (rel_dir == Path('.') and name in SKIP_DIRS))
+        for name in sorted(filenames):
+            if Path(name).suffix.lower() in SOURCE_SUFFIXES and not HASHED_NAME.search(name):
+                images.append((rel_dir / name).as_posix())
+    return images
+
+
+class ImageIndex:
+    """画像ごとのハッシュ・サイズ・書き出したファイルの記録（src_dir/.image-index.json）"""
+
+    def __init__(self, path, images=None):
+        self.path = Path(path)
+        self.images = images or {}  # rel_path -> {'hash', 'mtime_ns', 'size', 'width', 'height', 'variants'}
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        if not path.exists():
+            return cls(path)
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            print(f"⚠️  {path.name}: 読み込めないので作り直します")
+            return cls(path)
+        if data.get('version') != INDEX_VERSION:
+            return cls(path)
+        return cls(path, data.get('images', {}))
+
+    def save(self):
+        data = {'version': INDEX_VERSION, 'images': self.images}
+        write_atomic(self.path, json.dumps(data, ensure_ascii=False, indent=1, sort_keys=True))
+
+
+def optimize_images(site):
+    """画像最適化ステージ: 変わった画像だけ変換して site.images に載せる"""
+    src_dir = site.src_dir
+    cache = src_dir / CACHE_DIR
+    index = ImageIndex.load(src_dir / INDEX_NAME)
+    formats = available_formats()
+    rel_paths = find_images(src_dir)
+
+    jobs = []  # (元画像, キャッシュ先, 幅, 形式)
+    stale = set()  # 前回書き出したが今回は要らなくなったファイル
+    for rel_path in rel_paths:
+        path = src_dir / rel_path
+        stat = path.stat()
+        entry = index.images.get(rel_path)
+        if not (entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size):
+            data = path.read_bytes()
+            size = image_size(data)
+            if size is None:
+                print(f"⚠️  {rel_path}: 画像のサイズが読めないのでスキップ")
+                index.images.pop(rel_path, None)
+                continue
+            old_variants = entry['variants'] if entry else {}
+            entry = {'hash': content_hash(data), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                     'width': size[0], 'height': size[1], 'variants': old_variants}
+            index.images[rel_path] = entry
+        old_names = {name for variants in entry['variants'].values() for _, name in variants}
+        entry['variants'] = {}
+        for fmt in formats:
+            entry['variants'][fmt] = []
+            for width in target_widths(entry['width']):
+                cached = cache / f"{entry['hash'][:16]}-{width}w.{fmt}"
+                if not cached.exists():
+                    jobs.append((str(path), str(cached), width, fmt))
+                entry['variants'][fmt].append([width, variant_name(rel_path, width, fmt)])
+        stale |= old_names - {name for variants in entry['variants'].values() for _, name in variants}
+    for rel_path in set(index.images) - set(rel_paths):
+        stale |= {name for variants in index.images[rel_path]['variants'].values() for _, name in variants}
+        del index.images[rel_path]
+
+    if jobs:
+        cache.mkdir(exist_ok=True)
+        # 変換は重いので、ページの変換の並列数（--jobs）とは関係なく全コアを使う
+        with ProcessPoolExecutor(max_workers=os.cpu_count()) as pool:
+            sizes = list(pool.map(encode_variant, *zip(*jobs)))
+        print(f"🖼  images: encoded {len(jobs)} variants ({sum(sizes):,} bytes)")
+    elif rel_paths and not formats:
+        print("⚠️  images: Pillow（WebP/AVIF対応）がないので変換はスキップし、width/heightだけ入れます")
+
+    # キャッシュからページの隣にコピー（元画像が前回コピーしたときと同じなら何もしない）
+    for entry in index.images.values():
+        names = [(width, fmt, name) for fmt, variants in entry['variants'].items() for width, name in variants]
+        if entry.get('copied') == entry['hash'] and all((src_dir / name).exists() for _, _, name in names):
+            continue
+        for width, fmt, name in names:
+            shutil.copyfile(cache / f"{entry['hash'][:16]}-{width}w.{fmt}", src_dir / name)
+        entry['copied'] = entry['hash']
+    for name in stale:
+        (src_dir / name).unlink(missing_ok=True)
+    index.save()
+    site.images = {rel_path: {key: entry[key] for key in ('width', 'height', 'variants')}
+                   for rel_path, entry in index.images.items()}
+
+
+def picture_markup(img, image, base):
+    """<img>を<picture>で包む（各形式の srcset はページからの相対パス）"""
+    sources = []
+    for fmt, variants in image['variants'].items():
+        srcset = ', '.join(f'{posixpath.relpath(name, base or ".")} {width}w' for width, name in variants)
+        sources.append(f'<source type="{MIME_TYPES[fmt]}" srcset="{srcset}" sizes="{SIZES}">')
+    if not sources:
+        return img
+    return f'<picture>{"".join(sources)}{img}</picture>'
+
+
+def responsive_images(page, site):
+    """ページの<img>に width/height を入れ、変換済みの画像があれば<picture>で包む"""
+    base = page.slug
+
+    def replace_img(match):
+        img = match.group(0)
+        src = SRC_ATTR.search(img)
+        if not src or not src.group(1) or re.match(r'[a-z]+:|/', src.group(1)):
+            return img
+        # 前回のビルドでハッシュ付きのファイルに向けた<img>は、元の画像で引く
+        image = site.images.get(original_name(posixpath.normpath(posixpath.join(base, src.group(1)))))
+        if image is None:
+            return img
+        size = f' width="{image["width"]}" height="{image["height"]}"'
+        if SIZE_ATTRS.search(img):
+            img = SIZE_ATTRS.sub(size, img, count=1)
+        elif ' width=' not in img and ' height=' not in img:
+            img = img[:src.end()] + size + img[src.end():]
+        return picture_markup(img, image, base)
+
+    # 前回のビルドで包んだ<picture>は一度外してから作り直す
+    html = PICTURE_PATTERN.sub(lambda m: m.group(1), page.html)
+    html = IMG_TAG.sub(replace_img, html)
+    if html != page.html:
+        page.html = html
@@ -0,0 +1,265 @@
+"""
+リンクとアンカーのチェック
+
+関連記事・サイドバー・目次などが出力する ../slug/ や #sec-N のリンクが、実際にあるページ・
+要素を指しているかを確かめる。書き出した後の各ページを1回だけパースして、
+  - ページにある要素の id（と <a name>）
+  - href / src / srcset とその行番号
+を集め、ツリーのファイルの一覧と合わせて、内部リンクのパス・フラグメントを確かめる。
+パースの結果はページの出力のハッシュ（マニフェスト）をキーにして .link-index.json に
+キャッシュするので、差分ビルドでは書き出したページだけをパースし直す（多ければプロセスを並列に）。
+
+外部のURL（https://...）は check_links.py --external で、asyncio のクライアントで並列に確かめる。
+--external-origin を指定すると、外部のURLへのリクエストをすべてそのサーバーに送る（Host は元のまま）
+ので、テスト用のローカルのスタブサーバーに向けられる。
+"""
+
+import asyncio
+import json
+import os
+import ssl
+from concurrent.futures import ProcessPoolExecutor
+from html.parser import HTMLParser
+from pathlib import Path
+from urllib.parse import quote, unquote, urljoin, urlsplit
+
+from .archives import SITE_URL
+from .engine import find_pages
+from .manifest import content_hash
+from .output import write_atomic
+
+INDEX_NAME = '.link-index.json'
+INDEX_VERSION = 1
+
+# 書き出したページがこれ以上あれば、パースをプロセスで並列にする
+PARALLEL_MIN = 16
+# リンクとして確かめる属性
+LINK_ATTRS = {'href', 'src', 'srcset', 'poster'}
+# 確かめないスキーム
+IGNORED_SCHEMES = ('mailto:', 'tel:', 'javascript:', 'data:', 'blob:', 'about:')
+# どのページにもあるものとして扱うフラグメント（'#top' はブラウザがページの先頭に移動する）
+IMPLICIT_FRAGMENTS = {'', 'top'}
+REPORT_LIMIT = 20
+
+EXTERNAL_CONCURRENCY = 8
+EXTERNAL_TIMEOUT = 10
+MAX_REDIRECTS = 5
+USER_AGENT = 'blogbuild-linkcheck'
+URL_SAFE = "/%:@!$&'()*+,;=?~"
+
+
+class LinkParser(HTMLParser):
+    """1ページの id とリンク（行番号付き）を集める"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.ids = set()
+        self.links = []  # [行, 属性, URL]
+
+    def handle_starttag(self, tag, attrs):
+        line = self.getpos()[0]
+        for name, value in attrs:
+            if value is None:
+                continue
+            if name == 'id' or (name == 'name' and tag == 'a'):
+                self.ids.add(value)
+            elif name in LINK_ATTRS:
+                if tag == 'link' and dict(attrs).get('rel') in ('preconnect', 'dns-prefetch'):
+                    continue
+                urls = [part.split()[0] for part in value.split(',') if part.strip()] if name == 'srcset' else [value]
+                self.links.extend([line, name, url.strip()] for url in urls)
+
+    handle_startendtag = handle_starttag
+
+
+def scan_page(path):
+    """(id の一覧, リンクの一覧)。並列にパースするときはワーカーで呼ばれる"""
+    parser = LinkParser()
+    parser.feed(Path(path).read_text(encoding='utf-8'))
+    parser.close()
+    return sorted(parser.ids), parser.links
+
+
+def list_files(src_dir):
+    """ツリーのファイルの相対パス（隠しファイル・隠しディレクトリは除く）"""
+    files = set()
+    for dirpath, dirnames, filenames in os.walk(src_dir):
+        dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+        rel_dir = Path(dirpath).relative_to(src_dir).as_posix()
+        for name in filenames:
+            if not name.startswith('.'):
+                files.add(name if rel_dir == '.' else f'{rel_dir}/{name}')
+    return files
+
+
+def load_index(path):
+    try:
+        data = json.loads(path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    return data.get('pages', {}) if data.get('version') == INDEX_VERSION else {}
+
+
+def scan_pages(src_dir, hashes):
+    """rel_path → {'output', 'ids', 'links'}（出力のハッシュが前回と同じページはキャッシュから）"""
+    index_path = src_dir / INDEX_NAME
+    previous = load_index(index_path)
+    pages = {rel_path: previous[rel_path] for rel_path, digest in hashes.items()
+             if rel_path in previous and previous[rel_path]['output'] == digest}
+    todo = sorted(set(hashes) - set(pages))
+    paths = [str(src_dir / rel_path) for rel_path in todo]
+    if len(todo) >= PARALLEL_MIN:
+        with ProcessPoolExecutor(max_workers=min(len(todo), os.cpu_count() or 1)) as pool:
+            results = list(pool.map(scan_page, paths, chunksize=max(1, len(todo) // 32)))
+    else:
+        results = [scan_page(path) for path in paths]
+    for rel_path, (ids, links) in zip(todo, results):
+        pages[rel_path] = {'output': hashes[rel_path], 'ids': ids, 'links': links}
+    if todo or set(previous) != set(pages):
+        write_atomic(index_path, json.dumps({'version': INDEX_VERSION, 'pages': pages}, ensure_ascii=False))
+    return pages, len(todo)
+
+
+def site_path(rel_path, url):
+    """ページ（rel_path）にある URL → (ツリーの中のパス, フラグメント)
+
+    公開先（SITE_URL）と同じホストでサイトの外を指していればパスは '..'、外部のURLなら None。
+    """
+    resolved = urlsplit(urljoin(SITE_URL + rel_path, url))
+    site = urlsplit(SITE_URL)
+    if (resolved.scheme, resolved.netloc) != (site.scheme, site.netloc):
+        return None, None
+    if not resolved.path.startswith(site.path):
+        return '..', None
+    path = unquote(resolved.path[len(site.path):])
+    if not path or path.endswith('/'):
+        path += 'index.html'
+    return path, unquote(resolved.fragment)
+
+
+def find_broken(pages, files):
+    """[(ページ, 行, URL, 理由)]。外部のURLは {URL: [(ページ, 行)]} で返す"""
+    broken = []
+    external = {}
+    for rel_path, page in sorted(pages.items()):
+        for line, _, url in page['links']:
+            if not url or url.startswith(IGNORED_SCHEMES):
+                continue
+            target, fragment = site_path(rel_path, url)
+            if target is None:
+                external.setdefault(urljoin(SITE_URL + rel_path, url).split('#')[0], []).append((rel_path, line))
+                continue
+            if target == '..':
+                broken.append((rel_path, line, url, 'サイトの外を指しています'))
+                continue
+            if target not in files:
+                # ディレクトリを / なしで指している（GitHub Pages はリダイレクトする）
+                if f'{target}/index.html' not in files:
+                    broken.append((rel_path, line, url, 'ファイルがありません'))
+                    continue
+                target = f'{target}/index.html'
+            if fragment not in IMPLICIT_FRAGMENTS and target in pages and fragment not in pages[target]['ids']:
+                broken.append((rel_path, line, url, f'#{fragment} がありません'))
+    return broken, external
+
+
+def check_links(site):
+    """リンクチェックのステージ: 書き出したページの内部リンクとアンカーを確かめる"""
+    hashes = {rel_path: entry['output'] for rel_path, entry in site.manifest.pages.items()}
+    pages, parsed = scan_pages(site.src_dir, hashes)
+    broken, external = find_broken(pages, list_files(site.src_dir))
+    links = sum(len(page['links']) for page in pages.values())
+    if broken:
+        print(f"🔗 links: {len(broken)} broken of {links:,} ({parsed} pages parsed)")
+        for line in format_broken(broken[:REPORT_LIMIT]):
+            print(line)
+        if len(broken) > REPORT_LIMIT:
+            print(f"   ...ほか {len(broken) - REPORT_LIMIT} 件（python3 check_links.py で全部表示）")
+    elif parsed:
+        print(f"🔗 links: {links:,} links OK ({parsed} pages parsed, {len(external)} external not checked)")
+
+
+def format_broken(broken):
+    return [f"❌ {rel_path}:{line}: {url} → {reason}" for rel_path, line, url, reason in broken]
+
+
+# --- 外部のURL ---
+
+async def fetch_status(url, origin=None, method='HEAD', timeout=EXTERNAL_TIMEOUT):
+    """URL のステータスコード（リダイレクトはたどる）。origin を指定すると接続先をそこに変える"""
+    for _ in range(MAX_REDIRECTS + 1):
+        parts = urlsplit(url)
+        target = urlsplit(origin) if origin else parts
+        secure = target.scheme == 'https'
+        port = target.port or (443 if secure else 80)
+        context = ssl.create_default_context() if secure else None
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(target.hostname, port, ssl=context), timeout)
+        try:
+            # 日本語などはパーセントエンコードして送る（すでにエンコードされた %XX はそのまま）
+            path = quote(parts.path or '/', safe=URL_SAFE)
+            if parts.query:
+                path += '?' + quote(parts.query, safe=URL_SAFE)
+            request = (f'{method} {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nUser-Agent: {USER_AGENT}\r\n'
+                       f'Accept: */*\r\nConnection: close\r\n\r\n')
+            writer.write(request.encode('ascii'))
+            await writer.drain()
+            status_line = await asyncio.wait_for(reader.readline(), timeout)
+            headers = {}
+            while True:
+                line = await asyncio.wait_for(reader.readline(), timeout)
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+        finally:
+            writer.close()
+        status = int(status_line.split()[1])
+        if status in (301, 302, 303, 307, 308) and 'location' in headers:
+            url = urljoin(url, headers['location'])
+            continue
+        if status in (405, 501) and method == 'HEAD':
+            # HEAD を受け付けないサーバーには GET で聞き直す
+            return await fetch_status(url, origin, 'GET', timeout)
+        return status
+    return 310  # リダイレクトが多すぎる
+
+
+async def check_external_async(urls, origin=None, concurrency=EXTERNAL_CONCURRENCY, timeout=EXTERNAL_TIMEOUT):
+    """URL → 問題（ステータスコードかエラー）。問題のないURLは含まない"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def check(url):
+        async with semaphore:
+            try:
+                status = await fetch_status(url, origin, timeout=timeout)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError) as e:
+                return url, f'{type(e).__name__}: {e}'.rstrip(': ')
+            return url, (f'HTTP {status}' if status >= 400 else None)
+
+    results = await asyncio.gather(*(check(url) for url in sorted(urls)))
+    return {url: problem for url, problem in results if problem}
+
+
+def check_external(urls, origin=None, concurrency=EXTERNAL_CONCURRENCY, timeout=EXTERNAL_TIMEOUT):
+    return asyncio.run(check_external_async(urls, origin, concurrency, timeout))
+
+
+def check_tree(src_dir, external=False, origin=None, concurrency=EXTERNAL_CONCURRENCY):
+    """ツリー全体のリンクを確かめる（check_links.py から）。戻り値は壊れたリンクの数"""
+    src_dir = Path(src_dir)
+    hashes = {rel_path: content_hash((src_dir / rel_path).read_bytes()) for rel_path in find_pages(src_dir)}
+    pages, parsed = scan_pages(src_dir, hashes)
+    broken, urls = find_broken(pages, list_files(src_dir))
+    for line in format_broken(broken):
+        print(line)
+    links = sum(len(page['links']) for page in pages.values())
+    print(f"\n🔗 {len(pages)} pages, {links:,} links, {len(broken)} broken internal links ({parsed} pages parsed)")
+    if not external:
+        return len(broken)
+    problems = check_external(urls, origin, concurrency)
+    for url, problem in sorted(problems.items()):
+        for rel_path, line in urls[url]:
+            print(f"❌ {rel_path}:{line}: {url} → {problem}")
+    print(f"🌐 {len(urls)} external URLs, {len(problems)} broken")
+    return len(broken) + len(problems)
@@ -0,0 +1,110 @@
+"""
+インクリメンタルビルド用のマニフェスト
+
+ページごとに「入力のハッシュ・出力のハッシュ・依存しているメタデータのハッシュ」を記録し、
+次回のビルドでは入力も依存も変わっていないページを読み込まずにスキップする。
+"""
+
+import ast
+import hashlib
+import json
+from pathlib import Path
+
+from .output import write_atomic
+
+MANIFEST_NAME = '.build-manifest.json'
+MANIFEST_VERSION = 1
+
+
+def content_hash(data):
+    """bytes / str のSHA-256"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.sha256(data).hexdigest()
+
+
+def stable_hash(obj):
+    """dictやlistを順序に依存しないJSONにしてハッシュ"""
+    return content_hash(json.dumps(obj, sort_keys=True, ensure_ascii=False))
+
+
+def code_hash(paths, data_names=()):
+    """変換コードのファイル群をまとめてハッシュ
+
+    data_names に挙げたトップレベル定数（ARTICLE_INFO など）は除外する。
+    それらはページ単位の依存として別にハッシュするので、記事1本の情報を
+    直しただけで全ページが再ビルドされることはない。
+    """
+    h = hashlib.sha256()
+    for path in sorted(Path(p) for p in paths):
+        tree = ast.parse(path.read_text(encoding='utf-8'))
+        tree.body = [node for node in tree.body if not _assigns_any(node, data_names)]
+        h.update(path.name.encode('utf-8'))
+        h.update(ast.dump(tree).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _assigns_any(node, names):
+    if not isinstance(node, ast.Assign):
+        return False
+    return any(isinstance(t, ast.Name) and t.id in names for t in node.targets)
+
+
+class Manifest:
+    """ビルドマニフェスト（src_dir/.build-manifest.json）"""
+
+    def __init__(self, path, code_hash='', pages=None):
+        self.path = Path(path)
+        self.code_hash = code_hash
+        self.pages = pages or {}  # rel_path -> entry
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        if not path.exists():
+            return cls(path)
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            print(f"⚠️  {path.name}: 読み込めないので作り直します")
+            return cls(path)
+        if data.get('version') != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, data.get('code_hash', ''), data.get('pages', {}))
+
+    def save(self):
+        data = {
+            'version': MANIFEST_VERSION,
+            'code_hash': self.code_hash,
+            'pages': self.pages,
+        }
+        write_atomic(self.path, json.dumps(data, ensure_ascii=False, indent=1, sort_keys=True))
+
+    def stat_matches(self, rel_path, stat):
+        """mtimeとサイズが前回の書き出し後と同じか（読み込み自体を省略できる）"""
+        entry = self.pages.get(rel_path)
+        return bool(entry) and entry.get('mtime_ns') == stat.st_mtime_ns and entry.get('size') == stat.st_size
+
+    def content_matches(self, rel_path, digest):
+        """内容のハッシュが前回の入力か出力と同じか（in-placeビルドでは出力と一致する）"""
+        entry = self.pages.get(rel_path)
+        return bool(entry) and digest in (entry.get('source'), entry.get('output'))
+
+    def deps_match(self, rel_path, deps):
+        """依存メタデータのハッシュが前回と同じか"""
+        entry = self.pages.get(rel_path)
+        return bool(entry) and entry.get('deps') == deps
+
+    def record(self, rel_path, source, output, deps, stat):
+        self.pages[rel_path] = {
+            'source': source,
+            'output': output,
+            'deps': deps,
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+        }
+
+    def touch(self, rel_path, stat):
+        """内容は同じでmtimeだけ変わったページの記録を更新"""
+        self.pages[rel_path]['mtime_ns'] = stat.st_mtime_ns
+        self.pages[rel_path]['size'] = stat.st_size
@@ -0,0 +1,254 @@
+"""
+記事メタデータの抽出とキャッシュ
+
+各ページのHTMLを1回のストリーミングパースで読み、<title>・meta description・og:*・
+公開日・更新日・タグ・本文テキスト（コードブロックを除く）・画像の数・ページに表示される文字を取り出す。
+結果はファイルのハッシュをキーにして .metadata-index.json にキャッシュし、
+変わっていないページは再抽出しない。
+"""
+
+import json
+import re
+from html.parser import HTMLParser
+from pathlib import Path
+
+from .manifest import content_hash
+from .output import write_atomic
+from .reading_time import reading_minutes
+
+INDEX_NAME = '.metadata-index.json'
+INDEX_VERSION = 4
+
+# 本文テキストに含めない要素（ビルドで挿入する部分は除外しないと、出力が次回の入力に混ざる）
+SKIP_TAGS = {'script', 'style', 'noscript', 'template'}
+SKIP_CLASSES = {'toc', 'share-buttons', 'related-articles', 'next-read', 'feedback-section',
+                'agent-attribution', 'reading-time'}
+VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+             'source', 'track', 'wbr'}
+
+# 文字として画面に出る属性と、CSSの content: の文字列（フォントのサブセット用）
+TEXT_ATTRS = ('alt', 'title', 'placeholder', 'value')
+CSS_CONTENT = re.compile(r'content:\s*([\'"])(.*?)\1')
+
+DATE_PATTERN = re.compile(r'(\d{4})年(\d{1,2})月(?:(\d{1,2})日)?')
+TITLE_SUFFIX = re.compile(r'\s*[|—]\s*『AI』と暮らす『非エンジニア』の日常\s*$')
+
+
+class MetadataParser(HTMLParser):
+    """1ページ分のメタデータを集めるパーサー"""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = ''
+        self.meta = {}  # name / property -> content
+        self.h1 = ''
+        self.tag = ''
+        self.meta_line = ''  # 記事ヘッダーの最初の .meta（日付が入っている）
+        self.text = []
+        self.images = 0
+        self.chars = set()  # ページに表示される文字（script・styleの中は除く）
+        self._stack = []  # (tag, 収集先, 除外するか)
+        self._skip = 0
+        self._in_article = 0
+        self._in_pre = 0
+        self._in_code = 0  # script・style の中
+
+    def _capture(self):
+        return self._stack[-1][1] if self._stack else None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        for name in TEXT_ATTRS:
+            if attrs.get(name) and tag != 'meta':
+                self.chars.update(attrs[name])
+        if tag == 'meta':
+            key = attrs.get('property') or attrs.get('name')
+            if key and 'content' in attrs:
+                self.meta.setdefault(key, attrs['content'] or '')
+            return
+        if tag == 'img' and self._in_article and not self._skip:
+            self.images += 1
+        if tag in VOID_TAGS:
+            return
+        classes = set((attrs.get('class') or '').split())
+        skip = tag in SKIP_TAGS or bool(classes & SKIP_CLASSES)
+        capture = self._capture()
+        if tag == 'title' and not self.title:
+            capture = 'title'
+        elif tag == 'h1' and not self.h1:
+            capture = 'h1'
+        elif tag == 'span' and 'tag' in classes and not self.tag:
+            capture = 'tag'
+        elif 'meta' in classes and not self.meta_line:
+            capture = 'meta_line'
+        if tag == 'article':
+            self._in_article += 1
+        if tag == 'pre':
+            self._in_pre += 1
+        if tag in ('script', 'style'):
+            self._in_code += 1
+        if skip:
+            self._skip += 1
+        self._stack.append((tag, capture, skip))
+
+    def handle_endtag(self, tag):
+        # 閉じ忘れの要素があっても対応するタグまで戻る
+        if not any(open_tag == tag for open_tag, _, _ in self._stack):
+            return
+        while self._stack:
+            open_tag, _, skip = self._stack.pop()
+            if skip:
+                self._skip -= 1
+            if open_tag == 'article':
+                self._in_article -= 1
+            if open_tag == 'pre':
+                self._in_pre -= 1
+            if open_tag in ('script', 'style'):
+                self._in_code -= 1
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if not self._in_code:
+            self.chars.update(data)
+        elif self._stack and self._stack[-1][0] == 'style':
+            for _, text in CSS_CONTENT.findall(data):
+                self.chars.update(text)
+        capture = self._capture()
+        if capture == 'title':
+            self.title += data
+        elif capture == 'h1':
+            self.h1 += data
+        elif capture == 'tag':
+            self.tag += data
+        elif capture == 'meta_line':
+            self.meta_line += data
+        if self._in_article and not self._skip and not self._in_pre:
+            self.text.append(data)
+
+
+def normalize_date(text):
+    """'2026年2月17日' → '2026-02-17'、'2026年2月' → '2026-02'"""
+    match = DATE_PATTERN.search(text or '')
+    if not match:
+        return ''
+    year, month, day = match.groups()
+    if day:
+        return f'{year}-{int(month):02d}-{int(day):02d}'
+    return f'{year}-{int(month):02d}'
+
+
+def extract_metadata(html):
+    """HTMLからメタデータを抽出"""
+    parser = MetadataParser()
+    parser.feed(html)
+    parser.close()
+    meta = parser.meta
+    text = re.sub(r'\s+', ' ', ''.join(parser.text)).strip()
+    title = meta.get('og:title') or TITLE_SUFFIX.sub('', parser.title.strip())
+    date = meta.get('article:published_time', '')[:10] or normalize_date(parser.meta_line)
+    return {
+        'title': title.strip(),
+        'desc': (meta.get('description') or meta.get('og:description') or '').strip(),
+        'og': {key: value for key, value in meta.items() if key.startswith('og:')},
+        'type': meta.get('og:type', ''),
+        'date': date,
+        'modified': meta.get('article:modified_time', '')[:10],
+        'tag': ' '.join(parser.tag.split()),
+        'h1': ' '.join(parser.h1.split()),
+        'text': text,
+        'images': parser.images,
+        'reading_time': reading_minutes(text, parser.images),
+        'chars': ''.join(sorted(char for char in parser.chars if not char.isspace())),
+    }
+
+
+class MetadataIndex:
+    """ページごとのメタデータのキャッシュ（src_dir/.metadata-index.json）"""
+
+    def __init__(self, path, pages=None):
+        self.path = Path(path)
+        self.pages = pages or {}  # rel_path -> {'hash', 'mtime_ns', 'size', 'meta'}
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        if not path.exists():
+            return cls(path)
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            print(f"⚠️  {path.name}: 読み込めないので作り直します")
+            return cls(path)
+        if data.get('version') != INDEX_VERSION:
+            return cls(path)
+        return cls(path, data.get('pages', {}))
+
+    def save(self):
+        data = {'version': INDEX_VERSION, 'pages': self.pages}
+        write_atomic(self.path, json.dumps(data, ensure_ascii=False, indent=1, sort_keys=True))
+
+    def update(self, site):
+        """変更されたページだけ再抽出。戻り値は (抽出した数, キャッシュを使った数)"""
+        extracted = cached = 0
+        for rel_path in site.rel_paths:
+            entry = self.pages.get(rel_path)
+            stat = (site.src_dir / rel_path).stat()
+            if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+                cached += 1
+                continue
+            data = site.read_bytes(rel_path)
+            digest = content_hash(data)
+            if entry and entry['hash'] == digest:
+                cached += 1
+                meta = entry['meta']
+            else:
+                extracted += 1
+                meta = extract_metadata(data.decode('utf-8'))
+            self.pages[rel_path] = {'hash': digest, 'mtime_ns': stat.st_mtime_ns,
+                                    'size': stat.st_size, 'meta': meta}
+        for rel_path in set(self.pages) - set(site.rel_paths):
+            del self.pages[rel_path]
+        return extracted, cached
+
+    def record_outputs(self, site):
+        """書き出したページの出力のハッシュと stat を記録する（メタデータは変換前に抽出したもの）
+
+        ビルドはページをその場で書き換えるので、変換前の stat のままだと次のビルドで
+        書き出したページを全部抽出し直すことになる。戻り値は記録したページの数。
+        """
+        recorded = 0
+        for page in site.pages:
+            entry = self.pages.get(page.rel_path)
+            output = site.manifest.pages.get(page.rel_path, {}).get('output')
+            if entry is None or output is None:
+                continue
+            stat = (site.src_dir / page.rel_path).stat()
+            if (entry['hash'], entry['mtime_ns'], entry['size']) != (output, stat.st_mtime_ns, stat.st_size):
+                entry.update(hash=output, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+                recorded += 1
+        return recorded
+
+    def by_slug(self):
+        """スラッグ → メタデータ（ホームは空文字）"""
+        result = {}
+        for rel_path, entry in self.pages.items():
+            parent = Path(rel_path).parent.as_posix()
+            result['' if parent == '.' else parent] = entry['meta']
+        return result
+
+
+def load_metadata(site):
+    """メタデータ抽出ステージ: インデックスを更新して site.metadata に載せる"""
+    index = MetadataIndex.load(site.src_dir / INDEX_NAME)
+    extracted, cached = index.update(site)
+    index.save()
+    site.metadata = index.by_slug()
+    print(f"📝 metadata: {extracted} extracted, {cached} cached")
+
+
+def record_metadata(site):
+    """書き出した後のステージ: 書き出したページを、抽出済みとしてインデックスに記録する"""
+    index = MetadataIndex.load(site.src_dir / INDEX_NAME)
+    if index.record_outputs(site):
+        index.save()
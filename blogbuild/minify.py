@@ -0,0 +1,168 @@
+"""
+HTML・CSS・JavaScriptの縮小
+
+見た目が変わらない範囲だけを削る。
+- HTML: コメントを消し、テキストの連続する空白を1文字にまとめる（<head>の中のタグ間の空白は消す）。
+  <pre>・<code>・<textarea>の中身はそのまま。JSON-LDは残して1行にまとめる。
+- CSS: コメントと余分な空白、} の前の ; を消す（文字列の中は触らない）。
+- JavaScript: コメント・字下げ・空行と記号の前後の空白を消す。改行は残すので、セミコロンの自動挿入は変わらない。
+"""
+
+import json
+import re
+
+# 中身をそのまま残す要素と、中身を別に縮小する要素
+RAW_TAGS = ('pre', 'code', 'textarea')
+HTML_TOKEN = re.compile(
+    r'<!--.*?-->'
+    r'|<(?P<raw>pre|code|textarea|script|style)\b[^>]*>.*?</(?P=raw)\s*>'
+    r'|<[!/?a-zA-Z][^>]*>'
+    r'|[^<]+|<',
+    re.DOTALL | re.IGNORECASE)
+OPEN_TAG = re.compile(r'<(\w+)([^>]*)>(.*)</\w+\s*>\Z', re.DOTALL)
+TYPE_ATTR = re.compile(r'\btype\s*=\s*["\']?([^"\'\s>]+)', re.IGNORECASE)
+SPACE = re.compile(r'\s+')
+JS_TYPES = {'', 'text/javascript', 'application/javascript', 'module'}
+
+CSS_TOKEN = re.compile(r'/\*.*?(?:\*/|$)|"(?:\\.|[^"\\])*"?|\'(?:\\.|[^\'\\])*\'?|[^"\'/]+|/', re.DOTALL)
+CSS_PUNCT_SPACE = re.compile(r'\s*([{};,>])\s*')
+CSS_COLON_SPACE = re.compile(r':\s+')
+
+# この記号の後の / は割り算ではなく正規表現リテラルの始まり
+JS_REGEX_PREFIX = set('(,=:[!&|?{};+-*%<>~^') | {''}
+# この記号の前後の空白は消しても意味が変わらない（+ と - は a + +b があるので除く）
+JS_TIGHT = set('{}()[];,:=<>?!&|*%')
+
+
+def collapse_space(text):
+    """空白の連続を1文字に（改行を含むなら改行、含まなければスペース）"""
+    return SPACE.sub(lambda m: '\n' if '\n' in m.group() else ' ', text)
+
+
+def minify_css(css):
+    """CSSを縮小"""
+    out = []
+    for token in CSS_TOKEN.findall(css):
+        if token.startswith('/*'):
+            continue
+        if token[0] in '"\'':
+            out.append(token)
+            continue
+        token = CSS_PUNCT_SPACE.sub(r'\1', SPACE.sub(' ', token))
+        out.append(CSS_COLON_SPACE.sub(':', token))
+    css = ''.join(out).strip()
+    return css.replace(';}', '}')
+
+
+def minify_js(js):
+    """JavaScriptからコメントと字下げを消す（文字列・テンプレート・正規表現リテラルの中は触らない）"""
+    out = []
+    i = 0
+    n = len(js)
+    last = ''  # 直前の空白でない文字（正規表現リテラルの判定用）
+    pending = ''  # 出力を保留している空白（' ' か '\n'）
+
+    def emit(text):
+        nonlocal pending
+        if pending == '\n' or (pending and not (last in JS_TIGHT or text[0] in JS_TIGHT)):
+            out.append(pending)
+        pending = ''
+        out.append(text)
+
+    while i < n:
+        char = js[i]
+        if char in '"\'`':
+            end = i + 1
+            while end < n and js[end] != char:
+                end += 2 if js[end] == '\\' else 1
+            emit(js[i:end + 1])
+            i = end + 1
+            last = char
+        elif js.startswith('//', i) or js.startswith('/*', i) or char.isspace():
+            # コメントも空白として扱う（改行を含めば改行）
+            if js.startswith('//', i):
+                end = js.find('\n', i)
+                end = n if end < 0 else end
+            elif js.startswith('/*', i):
+                end = js.find('*/', i + 2)
+                end = n if end < 0 else end + 2
+            else:
+                end = i
+                while end < n and js[end].isspace():
+                    end += 1
+            if out and (pending != '\n'):
+                pending = '\n' if '\n' in js[i:end] else ' '
+            i = end
+        elif char == '/' and last in JS_REGEX_PREFIX:
+            end = i + 1
+            in_class = False
+            while end < n and js[end] != '\n' and (js[end] != '/' or in_class):
+                if js[end] == '\\':
+                    end += 1
+                elif js[end] == '[':
+                    in_class = True
+                elif js[end] == ']':
+                    in_class = False
+                end += 1
+            match = re.match(r'/[a-z]*', js[end:])
+            end += len(match.group()) if match else 0
+            emit(js[i:end])
+            i = end
+            last = '/'
+        else:
+            emit(char)
+            last = char
+            i += 1
+    return ''.join(out)
+
+
+def minify_element(token):
+    """<script>・<style>・<pre>などの要素を中身ごと処理"""
+    match = OPEN_TAG.match(token)
+    if not match:
+        return token
+    tag, attrs, body = match.group(1).lower(), match.group(2), match.group(3)
+    if tag in RAW_TAGS:
+        return token
+    open_tag = token[:token.index('>') + 1]
+    close_tag = token[len(open_tag) + len(body):]
+    if tag == 'style':
+        return f'{open_tag}{minify_css(body)}{close_tag}'
+    script_type = TYPE_ATTR.search(attrs)
+    script_type = script_type.group(1).lower() if script_type else ''
+    if script_type == 'application/ld+json':
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return token
+        body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+        return f'{open_tag}{body}{close_tag}'
+    if script_type in JS_TYPES:
+        return f'{open_tag}{minify_js(body)}{close_tag}'
+    return token  # テンプレートなど、中身の形式がわからないものはそのまま
+
+
+def minify_html(html):
+    """HTMLを縮小"""
+    out = []
+    in_head = False
+    for match in HTML_TOKEN.finditer(html):
+        token = match.group()
+        if token.startswith('<!--'):
+            if token.startswith('<!--[if'):
+                out.append(token)  # 条件付きコメントは残す
+            continue
+        if match.group('raw'):
+            out.append(minify_element(token))
+        elif token.startswith('<') and len(token) > 1:
+            lower = token[:6].lower()
+            if lower.startswith('<head'):
+                in_head = True
+            elif lower.startswith('</head'):
+                in_head = False
+            out.append(token)
+        elif in_head and not token.strip():
+            continue
+        else:
+            out.append(collapse_space(token))
+    return ''.join(out).strip() + '\n'
@@ -0,0 +1,38 @@
+"""
+モバイル向けの共通スクリプト（目次・プログレスバー・トップに戻る）を書き出す
+
+enhance_mobile.MOBILE_JS を assets/mobile.<hash>.js に書き出し、各ページからは
+<script src defer> で読み込む。以前ページに埋め込んでいたスクロール処理は取り除く。
+"""
+
+import re
+
+import enhance_mobile
+
+from .manifest import content_hash
+from .output import write_atomic
+
+ASSETS_DIR = 'assets'
+SCRIPT_PATTERN = re.compile(r'mobile\.[0-9a-f]{10}\.js')
+
+
+def write_mobile_js(site):
+    """共通スクリプトを書き出すステージ（古いハッシュのファイルは消す）"""
+    js = enhance_mobile.MOBILE_JS
+    name = f'mobile.{content_hash(js)[:10]}.js'
+    assets = site.src_dir / ASSETS_DIR
+    assets.mkdir(exist_ok=True)
+    path = assets / name
+    if write_atomic(path, js):
+        print(f"📜 js: wrote {ASSETS_DIR}/{name} ({len(js.encode('utf-8')):,} bytes)")
+    for old in assets.iterdir():
+        if SCRIPT_PATTERN.fullmatch(old.name) and old.name != name:
+            old.unlink()
+    site.js_href = f'{ASSETS_DIR}/{name}'
+
+
+def link_mobile_js(page, site):
+    """プログレスバーかトップに戻るボタンがあるページに、共通スクリプトを読み込ませる"""
+    if 'id="progressBar"' not in page.html and 'id="backToTop"' not in page.html:
+        return
+    page.html = enhance_mobile.link_mobile_js(page.html, page.root + site.js_href)
@@ -0,0 +1,215 @@
+"""
+記事ごとのOGP画像（SNSでシェアされたときのカード）を作る
+
+どのページも og:image が同じ assets/ogp-default.png を指しているので、記事のタイトルと
+カテゴリ（CATEGORIES / ARTICLE_INFO か、ページから抽出したメタデータ）から
+1200x630 のカードを描いて assets/ogp/<slug>.<hash>.png に書き出し、
+各ページの og:image / twitter:image をそのURLに書き換える。
+
+ファイル名のハッシュはタイトル・カテゴリ・テンプレート（このファイル）・フォントから作るので、
+描き直すのは新しい記事とタイトルが変わった記事だけ。描画はCPUコア数のプロセスで並列に行う。
+描画には Pillow と .fonts/ の Noto Sans JP（フォントのサブセットと同じもの）を使い、
+ネットワークには繋がない。どちらかがなければ前回のカードを使い、それもなければ共通の画像のまま。
+.fonts/ はリポジトリに入れていない（元のフォントは大きく、サブセットにしても新しいタイトルの
+文字が入らない）ので、カードを描けるのはフォントを置いたマシンだけ。描いたカード（assets/ogp/）は
+コミットしておけば、フォントのないチェックアウト（CIなど）でもそのまま使われる。
+"""
+
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+
+import add_features
+
+from .fonts import SOURCE_DIR, SOURCE_FONTS
+from .manifest import content_hash
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # Pillowがなければ前回のカードを使う
+    Image = None
+
+OGP_DIR = 'assets/ogp'
+SITE_URL = 'https://daisuki-koshian.github.io/blog/'
+SITE_NAME = 'AIと暮らす'
+DEFAULT_IMAGE = 'assets/ogp-default.png'
+
+# カードのデザイン（色はページの :root に合わせる）
+SIZE = (1200, 630)
+MARGIN = 80
+BACKGROUND = '#fafafa'
+TEXT_COLOR = '#333333'
+LIGHT_COLOR = '#666666'
+ACCENT_COLOR = '#e63946'
+TITLE_SIZES = (72, 64, 56)  # 3行に収まるまで小さくする
+MAX_LINES = 3
+LABEL_SIZE = 30
+FOOTER_SIZE = 32
+TITLE_FONT = SOURCE_FONTS[900]
+LABEL_FONT = SOURCE_FONTS[700]
+
+CARD_PATTERN = re.compile(r'(.+)\.[0-9a-f]{10}\.png')
+OG_IMAGE = re.compile(r'(<meta (?:property="og:image"|name="twitter:image") content=")([^"]*)(")')
+# 英数字の並びは途中で折り返さない
+WRAP_TOKEN = re.compile(r'[A-Za-z0-9][A-Za-z0-9.,:%&+\-/]*|.', re.DOTALL)
+# 行頭に来てはいけない文字（前の行に残す）
+NO_LINE_START = set('、。，．・：；？！ー）」』】〕〉》”’ぁぃぅぇぉっゃゅょゎァィゥェォッャュョヮ)]},.!?')
+
+
+@lru_cache(maxsize=None)
+def load_font(path, size):
+    return ImageFont.truetype(path, size)
+
+
+def wrap_title(title, font, width):
+    """タイトルを幅に収まる行に分ける（日本語は1文字ごと、英単語は単語ごと）"""
+    lines = ['']
+    for token in WRAP_TOKEN.findall(' '.join(title.split())):
+        line = lines[-1] + token
+        if not lines[-1] or font.getlength(line) <= width or token in NO_LINE_START:
+            lines[-1] = line
+        elif token == ' ':
+            lines.append('')
+        else:
+            lines.append(token)
+    return [line.strip() for line in lines]
+
+
+def fit_title(title, font_path):
+    """(フォント, 行) — 3行に収まる一番大きい文字サイズ。収まらなければ最後の行を「…」で切る"""
+    width = SIZE[0] - MARGIN * 2
+    for size in TITLE_SIZES:
+        font = load_font(font_path, size)
+        lines = wrap_title(title, font, width)
+        if len(lines) <= MAX_LINES:
+            return font, lines
+    lines = lines[:MAX_LINES]
+    while lines[-1] and font.getlength(lines[-1] + '…') > width:
+        lines[-1] = lines[-1][:-1]
+    lines[-1] += '…'
+    return font, lines
+
+
+def render_card(dest, title, label, font_dir):
+    """1枚のカードを描く（ワーカーで実行）"""
+    title_path = str(Path(font_dir) / TITLE_FONT)
+    label_path = str(Path(font_dir) / LABEL_FONT)
+    image = Image.new('RGB', SIZE, BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((0, 0, SIZE[0], 16), fill=ACCENT_COLOR)
+
+    # カテゴリ（左上のラベル）
+    top = MARGIN
+    if label:
+        font = load_font(label_path, LABEL_SIZE)
+        left, _, right, _ = draw.textbbox((0, 0), label, font=font)
+        draw.rounded_rectangle((MARGIN, top, MARGIN + right - left + 40, top + LABEL_SIZE + 24),
+                               radius=8, fill=ACCENT_COLOR)
+        draw.text((MARGIN + 20, top + 12 + LABEL_SIZE // 2), label, font=font, fill='#ffffff', anchor='lm')
+
+    # タイトル（ラベルとフッターの間で縦に中央揃え）
+    font, lines = fit_title(title, title_path)
+    line_height = round(font.size * 1.4)
+    area_top = top + LABEL_SIZE + 24
+    area_bottom = SIZE[1] - MARGIN - FOOTER_SIZE - 24
+    y = area_top + (area_bottom - area_top - line_height * len(lines)) // 2
+    for line in lines:
+        draw.text((MARGIN, y + line_height // 2), line, font=font, fill=TEXT_COLOR, anchor='lm')
+        y += line_height
+
+    # フッター（区切り線とサイト名）
+    footer = load_font(label_path, FOOTER_SIZE)
+    draw.line((MARGIN, SIZE[1] - MARGIN - FOOTER_SIZE - 8, SIZE[0] - MARGIN, SIZE[1] - MARGIN - FOOTER_SIZE - 8),
+              fill='#e8e8e8', width=2)
+    draw.text((SIZE[0] - MARGIN, SIZE[1] - MARGIN + 8), SITE_NAME, font=footer, fill=LIGHT_COLOR, anchor='rs')
+
+    tmp = f'{dest}.tmp'
+    image.save(tmp, format='PNG', optimize=True)
+    os.replace(tmp, dest)
+    return os.path.getsize(dest)
+
+
+def card_slugs(site):
+    """カードを作るページ（og:image を持つ記事。ホームや一覧ページは共通の画像のまま）"""
+    return sorted(slug for slug, meta in site.metadata.items()
+                  if meta.get('type') == 'article' and meta.get('og', {}).get('og:image'))
+
+
+def card_label(slug, meta):
+    _, label = add_features.get_category(slug)
+    return label or meta.get('tag', '')
+
+
+def existing_cards(out):
+    """前回書き出したカード（スラッグ → ファイル名）"""
+    if not out.is_dir():
+        return {}
+    cards = {}
+    for path in out.iterdir():
+        match = CARD_PATTERN.fullmatch(path.name)
+        if match:
+            cards[match.group(1)] = path.name
+    return cards
+
+
+def render_ogp(site):
+    """OGP画像のステージ: タイトルかテンプレートが変わった記事だけ描き直す"""
+    out = site.src_dir / OGP_DIR
+    font_dir = site.src_dir / SOURCE_DIR
+    fonts = [font_dir / TITLE_FONT, font_dir / LABEL_FONT]
+    template = content_hash(Path(__file__).read_bytes())
+    font_key = '\0'.join(f'{path.name}:{path.stat().st_size}' for path in fonts if path.exists())
+    previous = existing_cards(out)
+
+    cards = {}
+    jobs = []  # (スラッグ, 書き出し先, タイトル, カテゴリ, フォントのディレクトリ)
+    for slug in card_slugs(site):
+        meta = site.metadata[slug]
+        title = add_features.get_article_info(slug, site.metadata).get('title', '')
+        if not title:
+            continue
+        label = card_label(slug, meta)
+        key = content_hash(f'{title}\0{label}\0{template}\0{font_key}')
+        name = f"{slug.replace('/', '-')}.{key[:10]}.png"
+        cards[slug] = name
+        if not (out / name).exists():
+            jobs.append((slug, str(out / name), title, label, str(font_dir)))
+
+    missing = [path.name for path in fonts if not path.exists()]
+    if jobs and (Image is None or missing):
+        reason = 'Pillowがない' if Image is None else f"{SOURCE_DIR}/ に {', '.join(missing)} がない"
+        print(f"⚠️  ogp: {reason}ので {len(jobs)} 枚のカードを描けません（前回のカードか共通の画像を使います）")
+        for slug, *_ in jobs:
+            if slug in previous:
+                cards[slug] = previous[slug]
+            else:
+                del cards[slug]
+    elif jobs:
+        out.mkdir(parents=True, exist_ok=True)
+        with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+            sizes = list(pool.map(render_card, *zip(*(job[1:] for job in jobs))))
+        print(f"🪪 ogp: rendered {len(jobs)} cards ({sum(sizes):,} bytes)")
+
+    keep = set(cards.values())
+    for name in previous.values():
+        if name not in keep:
+            (out / name).unlink()
+    site.ogp = {slug: f'{OGP_DIR}/{name}' for slug, name in sorted(cards.items())}
+
+
+def ogp_image(page, site):
+    """og:image / twitter:image を記事のカードに向ける"""
+    card = site.ogp.get(page.slug)
+    url = SITE_URL + card if card else None
+
+    def replace(match):
+        if url:
+            return match.group(1) + url + match.group(3)
+        if match.group(2).startswith(SITE_URL + OGP_DIR + '/'):
+            # カードがなくなった記事は共通の画像に戻す
+            return match.group(1) + SITE_URL + DEFAULT_IMAGE + match.group(3)
+        return match.group(0)
+
+    page.html = OG_IMAGE.sub(replace, page.html)
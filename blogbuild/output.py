@@ -0,0 +1,151 @@
+"""
+クラッシュしても壊れない書き出し
+
+どの書き出しも、同じディレクトリの一時ファイルに書いて fsync してから os.replace で置き換えるので、
+途中で止まっても書きかけのファイルが残らない。中身が同じファイルは書き直さない（更新日時も
+デプロイの差分も変えない）。
+
+ビルドのページは、まず全部をステージングのディレクトリ（src/.staging/）に書き、最後に
+変更の一覧（ジャーナル）を書いてから一気に置き換える。置き換えの途中で止まったときは、次のビルドの
+最初にジャーナルを見て置き換えを最後まで済ませる（ジャーナルがなければステージングを捨てる）ので、
+変換の前と後のページが混ざったままにならない。
+
+公開用のディレクトリ（--out）は、新しいツリーをまるごと横に作ってから入れ替える（swap_dirs）。
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import shutil
+from pathlib import Path
+
+STAGING_NAME = '.staging'
+JOURNAL_NAME = '.journal.json'
+
+# renameat2(2) の RENAME_EXCHANGE（2つのパスを1回で入れ替える）
+AT_FDCWD = -100
+RENAME_EXCHANGE = 2
+
+
+def fsync_dir(directory):
+    """ディレクトリのエントリ（rename の結果）をディスクに書く"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass  # ディレクトリを fsync できないファイルシステム
+    finally:
+        os.close(fd)
+
+
+def write_atomic(path, data, encoding='utf-8'):
+    """一時ファイルに書いてから置き換える。中身が同じなら書かずに False を返す"""
+    path = Path(path)
+    if isinstance(data, str):
+        data = data.encode(encoding)
+    try:
+        if path.stat().st_size == len(data) and path.read_bytes() == data:
+            return False
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return True
+
+
+class Staging:
+    """ページをステージングに書いておき、commit() で一気に置き換える"""
+
+    def __init__(self, src_dir):
+        self.src_dir = Path(src_dir)
+        self.dir = self.src_dir / STAGING_NAME
+        self.staged = []  # rel_path
+
+    @classmethod
+    def recover(cls, src_dir):
+        """前回のビルドが残したステージングを片付ける。戻り値は置き換えを済ませたファイルの数"""
+        staging = cls(src_dir)
+        if not staging.dir.exists():
+            return 0
+        journal = staging.dir / JOURNAL_NAME
+        try:
+            staged = json.loads(journal.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            # ジャーナルを書く前に止まった（まだ何も置き換えていない）
+            shutil.rmtree(staging.dir)
+            return 0
+        staging.staged = staged
+        return staging.apply()
+
+    def add(self, rel_path, data):
+        """ステージングに書く。今のファイルと中身が同じなら何もせず False を返す"""
+        path = self.src_dir / rel_path
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        try:
+            if path.stat().st_size == len(data) and path.read_bytes() == data:
+                return False
+        except FileNotFoundError:
+            pass
+        write_atomic(self.dir / rel_path, data)
+        self.staged.append(rel_path)
+        return True
+
+    def commit(self):
+        """ジャーナルを書いてから、ステージングのファイルで置き換える"""
+        if not self.staged:
+            return 0
+        write_atomic(self.dir / JOURNAL_NAME, json.dumps(self.staged, ensure_ascii=False))
+        fsync_dir(self.dir)
+        return self.apply()
+
+    def apply(self):
+        """ジャーナルにあるファイルを置き換えて、ステージングを消す"""
+        replaced = 0
+        directories = set()
+        for rel_path in self.staged:
+            staged = self.dir / rel_path
+            if not staged.exists():
+                continue  # 前回の apply で置き換え済み
+            target = self.src_dir / rel_path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staged, target)
+            directories.add(target.parent)
+            replaced += 1
+        for directory in directories:
+            fsync_dir(directory)
+        shutil.rmtree(self.dir, ignore_errors=True)
+        self.staged = []
+        return replaced
+
+
+def swap_dirs(a, b):
+    """2つのディレクトリを入れ替える（Linux では renameat2 で1回で、ほかでは rename を2回）"""
+    a, b = Path(a), Path(b)
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        renameat2 = None
+    if renameat2 is not None:
+        if renameat2(AT_FDCWD, os.fsencode(a), AT_FDCWD, os.fsencode(b), RENAME_EXCHANGE) == 0:
+            fsync_dir(a.parent)
+            return
+        # EINVAL（ファイルシステムが対応していない）などは rename にする
+    parked = a.with_name(a.name + '.swap')
+    os.replace(b, parked)
+    os.replace(a, b)
+    os.replace(parked, a)
+    fsync_dir(a.parent)
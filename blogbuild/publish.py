@@ -0,0 +1,179 @@
+"""
+ビルド結果を公開用ディレクトリに書き出す（縮小 + gzip/brotli）
+
+ソースのディレクトリは次回のビルドの入力でもあるので、縮小はその場ではせず、
+別のディレクトリ（--out）にコピーするときに行う。HTML・CSS・JSは縮小し、
+テキストのファイルには静的ホストやCDNがそのまま返せるよう .gz / .br を並べて置く。
+前回から変わっていないファイルは .publish-manifest.json を見てスキップする。
+
+書き出しは、新しいツリーを隣のディレクトリ（.<out>.staging）に作ってから out と入れ替える
+（変わっていないファイルは今の out からハードリンクする）ので、公開用ディレクトリが
+途中まで書き換わった状態になることはない。publish が管理していないファイル（.git など）も
+新しいツリーにリンクして残す。
+"""
+
+import gzip
+import json
+import os
+import shutil
+from pathlib import Path
+
+from .manifest import code_hash, content_hash
+from .minify import minify_css, minify_html, minify_js
+from .output import swap_dirs, write_atomic
+
+try:
+    import brotli
+except ImportError:  # brotliがなければ .gz だけ書き出す
+    brotli = None
+
+MANIFEST_NAME = '.publish-manifest.json'
+MANIFEST_VERSION = 1
+
+# 公開しないファイル（ビルド用のスクリプトやメモ）
+EXCLUDE_SUFFIXES = {'.py', '.pyc', '.sh', '.md', '.jsonl'}
+MINIFIERS = {'.html': minify_html, '.css': minify_css, '.js': minify_js}
+COMPRESS_SUFFIXES = {'.html', '.css', '.js', '.json', '.xml', '.svg', '.txt'}
+
+
+def find_files(src_dir):
+    """公開するファイル（隠しファイル・隠しディレクトリ・ビルド用のファイルは除く）"""
+    files = []
+    for dirpath, dirnames, filenames in os.walk(src_dir):
+        dirnames[:] = sorted(name for name in dirnames if not name.startswith('.'))
+        rel_dir = Path(dirpath).relative_to(src_dir)
+        for name in sorted(filenames):
+            if name.startswith('.') or Path(name).suffix.lower() in EXCLUDE_SUFFIXES:
+                continue
+            files.append((rel_dir / name).as_posix())
+    return files
+
+
+def compress(data):
+    """(gzip, brotli) の圧縮結果（brotliがなければ None）"""
+    gz = gzip.compress(data, compresslevel=9, mtime=0)
+    br = brotli.compress(data, quality=11) if brotli else None
+    return gz, br
+
+
+def publish_file(src, dest):
+    """1ファイルを縮小・圧縮して書き出す。戻り値は (元のサイズ, 縮小後, gzip, brotli)"""
+    data = src.read_bytes()
+    suffix = src.suffix.lower()
+    out = data
+    if suffix in MINIFIERS:
+        out = MINIFIERS[suffix](data.decode('utf-8')).encode('utf-8')
+    write_atomic(dest, out)
+    gz_size = br_size = None
+    if suffix in COMPRESS_SUFFIXES:
+        gz, br = compress(out)
+        write_atomic(dest.with_name(dest.name + '.gz'), gz)
+        gz_size = len(gz)
+        if br is not None:
+            write_atomic(dest.with_name(dest.name + '.br'), br)
+            br_size = len(br)
+    return len(data), len(out), gz_size, br_size
+
+
+def output_paths(rel_path):
+    """1ファイルから書き出すパス（本体と .gz / .br）"""
+    return [rel_path, rel_path + '.gz', rel_path + '.br']
+
+
+def link_file(src, dest):
+    """src を dest にハードリンクする（できなければコピー）"""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy2(src, dest)
+
+
+def carry_over(out_dir, staging, managed):
+    """今の out にある、publish が管理していないファイルを新しいツリーにリンクする"""
+    for dirpath, _, filenames in os.walk(out_dir):
+        rel_dir = Path(dirpath).relative_to(out_dir)
+        for name in filenames:
+            rel_path = (rel_dir / name).as_posix()
+            if rel_path not in managed and not (staging / rel_path).exists():
+                link_file(Path(dirpath) / name, staging / rel_path)
+
+
+def format_report(rel_path, sizes):
+    before, after, gz_size, br_size = sizes
+    ratio = (after - before) / before if before else 0
+    line = f"  {rel_path}: {before:,} → {after:,} bytes ({ratio:+.1%})"
+    if gz_size is not None:
+        line += f", gz {gz_size:,}"
+    if br_size is not None:
+        line += f", br {br_size:,}"
+    return line
+
+
+def publish(src_dir, out_dir, full=False):
+    """src_dir を縮小しながら out_dir に書き出す（変わっていないファイルはスキップ）"""
+    src_dir = Path(src_dir)
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    staging = out_dir.with_name(f'.{out_dir.name}.staging')
+    if staging.exists():
+        shutil.rmtree(staging)  # 前回の publish が途中で止まった
+    staging.mkdir()
+    try:
+        manifest = json.loads((out_dir / MANIFEST_NAME).read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        manifest = {}
+    code = code_hash([__file__, Path(__file__).with_name('minify.py')])
+    if full or manifest.get('version') != MANIFEST_VERSION or manifest.get('code') != code:
+        manifest = {'version': MANIFEST_VERSION, 'code': code, 'files': {}}
+    entries = manifest['files']
+    managed = {MANIFEST_NAME} | {path for rel_path in entries for path in output_paths(rel_path)}
+
+    rel_paths = find_files(src_dir)
+    print(f"\n📦 publish: {src_dir} → {out_dir}")
+    if brotli is None:
+        print("⚠️  brotliがないので .br は書き出しません（pip install brotli）")
+    published = skipped = 0
+    totals = [0, 0, 0, 0]
+    for rel_path in rel_paths:
+        src = src_dir / rel_path
+        dest = out_dir / rel_path
+        stat = src.stat()
+        entry = entries.get(rel_path)
+        if entry and dest.exists() and (entry['mtime_ns'], entry['size']) == (stat.st_mtime_ns, stat.st_size):
+            unchanged = True
+        else:
+            digest = content_hash(src.read_bytes())
+            unchanged = bool(entry) and dest.exists() and entry['hash'] == digest
+        if unchanged:
+            for path in output_paths(rel_path):
+                if (out_dir / path).exists():
+                    link_file(out_dir / path, staging / path)
+            skipped += 1
+            sizes = entry['sizes']
+        else:
+            sizes = publish_file(src, staging / rel_path)
+            published += 1
+        if not unchanged or (entry['mtime_ns'], entry['size']) != (stat.st_mtime_ns, stat.st_size):
+            entries[rel_path] = {'hash': digest, 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                                 'sizes': list(sizes)}
+        if rel_path.endswith('.html'):
+            print(format_report(rel_path, sizes))
+            for i, size in enumerate(sizes):
+                totals[i] += size or 0
+
+    # ソースからなくなったファイルは新しいツリーに入れない
+    for rel_path in set(entries) - set(rel_paths):
+        del entries[rel_path]
+    write_atomic(staging / MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True))
+    carry_over(out_dir, staging, managed)
+    swap_dirs(staging, out_dir)
+    shutil.rmtree(staging)  # 入れ替えたので、ここにあるのは前のツリー
+
+    before, after, gz_total, br_total = totals
+    print(f"✅ {published} files published, {skipped} unchanged")
+    if before:
+        line = f"   HTML total: {before:,} → {after:,} bytes ({(after - before) / before:+.1%}), gz {gz_total:,}"
+        if brotli:
+            line += f", br {br_total:,}"
+        print(line)
@@ -0,0 +1,43 @@
+"""
+本文から読了時間を計算する
+
+日本語は文字数、英数字は単語数で数え、それぞれの読む速さで時間に換算する。
+コードブロックと画像は本文の文字数に含めず、画像は1枚ごとに固定の時間を足す。
+"""
+
+import math
+import re
+
+JA_CHARS_PER_MINUTE = 500
+LATIN_WORDS_PER_MINUTE = 200
+SECONDS_PER_IMAGE = 12
+
+# 日本語の文字（ひらがな・カタカナ・漢字・半角カナ）
+JA_CHARS = '々〆぀-ヿ㐀-䶿一-鿿豈-﫿ｦ-ﾟ'
+
+# 1回の走査で「日本語の連続」と「英数字の単語」を拾う（記号や空白は読み飛ばす）
+TOKEN_PATTERN = re.compile(
+    rf'(?P<ja>[{JA_CHARS}]+)'
+    r"|(?P<latin>[0-9A-Za-zÀ-ɏ０-９Ａ-Ｚａ-ｚ]+(?:['’.\-][0-9A-Za-z]+)*)"
+)
+
+
+def count_text(text):
+    """(日本語の文字数, 英数字の単語数) を返す"""
+    ja_chars = 0
+    latin_words = 0
+    for match in TOKEN_PATTERN.finditer(text):
+        if match.lastgroup == 'ja':
+            ja_chars += match.end() - match.start()
+        else:
+            latin_words += 1
+    return ja_chars, latin_words
+
+
+def reading_minutes(text, images=0):
+    """読了時間（分、最低1分）"""
+    ja_chars, latin_words = count_text(text)
+    minutes = (ja_chars / JA_CHARS_PER_MINUTE
+               + latin_words / LATIN_WORDS_PER_MINUTE
+               + images * SECONDS_PER_IMAGE / 60)
+    return max(1, math.ceil(minutes))
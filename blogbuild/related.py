@@ -0,0 +1,209 @@
+"""
+本文の内容から関連記事を選ぶ（TF-IDF + コサイン類似度）
+
+日本語は文字bigram、英数字は単語でトークン化してTF-IDFベクトルを作り、
+全記事の近傍を転置インデックス経由の疎行列積（A・Aᵀ）でまとめて計算する。
+結果は .related-index.json にキャッシュし、記事が数本変わっただけなら
+その記事の行だけ計算し直して、他の記事の近傍リストを差分で更新する。
+"""
+
+import heapq
+import json
+import math
+import operator
+import re
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from .manifest import content_hash
+from .output import write_atomic
+from .reading_time import JA_CHARS
+
+INDEX_NAME = '.related-index.json'
+INDEX_VERSION = 1
+
+TOP_K = 3
+CANDIDATES = 10  # 差分更新できるように近傍は多めに持っておく
+MAX_TERMS = 150  # 1記事あたりに残す語（重みの大きい順）
+MAX_POSTINGS = 100  # 1語あたりに見る記事（重みの大きい順）
+MAX_DF_RATIO = 0.5  # これより多くの記事に出る語は区別に役立たないので無視
+REFRESH_RATIO = 0.2  # 前回の全計算からこれ以上の記事が変わったらIDFごと作り直す
+TITLE_WEIGHT = 2  # タイトルは本文より重く数える
+
+JA_RUN = re.compile(rf'[{JA_CHARS}]+')
+LATIN_WORD = re.compile(r'[0-9A-Za-z]{2,}')
+HIRAGANA_ONLY = re.compile(r'^[ぁ-ゖー]+$')
+
+
+def tokenize(text):
+    """日本語は文字bigram（ひらがなだけのものは除く）、英数字は小文字の単語"""
+    grams = []
+    for run in JA_RUN.findall(text):
+        grams += map(operator.add, run, run[1:])
+    terms = Counter(grams)
+    terms.update(word.lower() for word in LATIN_WORD.findall(text))
+    # ひらがなだけのbigramは、出てくるたびではなく異なる語ごとに1回だけ調べて外す
+    for gram in [term for term in terms if HIRAGANA_ONLY.match(term)]:
+        del terms[gram]
+    return terms
+
+
+def document_text(meta):
+    return ' '.join([meta.get('title', '')] * TITLE_WEIGHT + [meta.get('desc', ''), meta.get('text', '')])
+
+
+def tfidf_vector(terms, df, n_docs):
+    """正規化したTF-IDFベクトル（重みの大きいMAX_TERMS語だけ残す）"""
+    weights = {}
+    for term, count in terms.items():
+        freq = df.get(term, 1)
+        if n_docs >= 4 and freq > MAX_DF_RATIO * n_docs:
+            continue
+        weights[term] = (1 + math.log(count)) * (math.log((1 + n_docs) / (1 + freq)) + 1)
+    norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+    top = heapq.nlargest(MAX_TERMS, weights.items(), key=lambda item: (item[1], item[0]))
+    return {term: round(w / norm, 6) for term, w in top}
+
+
+def dot(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(term, 0.0) for term, w in a.items())
+
+
+def build_postings(vectors):
+    """語 → [(重み, スラッグ)]（重みの大きいMAX_POSTINGS件）"""
+    postings = defaultdict(list)
+    for slug, vec in vectors.items():
+        for term, w in vec.items():
+            postings[term].append((w, slug))
+    return {term: heapq.nlargest(MAX_POSTINGS, items) for term, items in postings.items()}
+
+
+def nearest(slug, vectors, postings):
+    """1記事分の行: 類似度の高い順に [(スラッグ, スコア)]"""
+    scores = defaultdict(float)
+    for term, w in vectors[slug].items():
+        for other_w, other in postings.get(term, ()):
+            scores[other] += w * other_w
+    scores.pop(slug, None)
+    top = heapq.nsmallest(CANDIDATES, scores.items(), key=lambda item: (-item[1], item[0]))
+    return [[other, round(score, 6)] for other, score in top if score > 0]
+
+
+class RelatedIndex:
+    """TF-IDFベクトルと近傍リストのキャッシュ（src_dir/.related-index.json）"""
+
+    def __init__(self, path, data=None):
+        self.path = Path(path)
+        data = data or {}
+        self.n_docs = data.get('n_docs', 0)
+        self.df = data.get('df', {})  # 2記事以上に出る語の文書頻度
+        self.docs = data.get('docs', {})  # slug -> {'hash', 'vec'}
+        self.neighbors = data.get('neighbors', {})  # slug -> [[slug, score], ...]
+        self.changed = data.get('changed', 0)  # 前回の全計算から変わった記事数
+
+    @classmethod
+    def load(cls, path):
+        path = Path(path)
+        if not path.exists():
+            return cls(path)
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            print(f"⚠️  {path.name}: 読み込めないので作り直します")
+            return cls(path)
+        if data.get('version') != INDEX_VERSION:
+            return cls(path)
+        return cls(path, data)
+
+    def save(self):
+        data = {
+            'version': INDEX_VERSION,
+            'n_docs': self.n_docs,
+            'df': self.df,
+            'docs': self.docs,
+            'neighbors': self.neighbors,
+            'changed': self.changed,
+        }
+        write_atomic(self.path, json.dumps(data, ensure_ascii=False, sort_keys=True))
+
+    def rebuild(self, articles):
+        """全記事を作り直す（IDFも再計算）"""
+        counts = {slug: tokenize(document_text(meta)) for slug, meta in articles.items()}
+        df = Counter()
+        for terms in counts.values():
+            df.update(terms.keys())
+        self.n_docs = len(articles)
+        self.df = {term: freq for term, freq in df.items() if freq > 1}
+        self.docs = {
+            slug: {'hash': content_hash(document_text(meta)),
+                   'vec': tfidf_vector(counts[slug], self.df, self.n_docs)}
+            for slug, meta in articles.items()
+        }
+        vectors = {slug: doc['vec'] for slug, doc in self.docs.items()}
+        postings = build_postings(vectors)
+        self.neighbors = {slug: nearest(slug, vectors, postings) for slug in vectors}
+        self.changed = 0
+
+    def update(self, articles, changed, removed):
+        """変わった記事の行だけ計算し直し、他の記事の近傍リストを差分で更新"""
+        for slug in removed:
+            self.docs.pop(slug, None)
+            self.neighbors.pop(slug, None)
+        for slug in changed:
+            meta = articles[slug]
+            self.docs[slug] = {'hash': content_hash(document_text(meta)),
+                               'vec': tfidf_vector(tokenize(document_text(meta)), self.df, self.n_docs)}
+        vectors = {slug: doc['vec'] for slug, doc in self.docs.items()}
+        postings = build_postings(vectors)
+        for slug in changed:
+            self.neighbors[slug] = nearest(slug, vectors, postings)
+
+        # 他の記事の近傍リストから古いスコアを外し、新しいスコアを入れ直す
+        touched = set(changed) | set(removed)
+        for slug, items in self.neighbors.items():
+            if slug in changed:
+                continue
+            had = any(other in touched for other, _ in items)
+            items = [item for item in items if item[0] not in touched]
+            for other in changed:
+                score = round(dot(vectors[slug], vectors[other]), 6)
+                if score > 0:
+                    items.append([other, score])
+            items.sort(key=lambda item: (-item[1], item[0]))
+            if had and len(items) < TOP_K:
+                # 候補が足りなくなったら、その記事だけ作り直す
+                items = nearest(slug, vectors, postings)
+            self.neighbors[slug] = items[:CANDIDATES]
+        self.changed += len(touched)
+
+    def refresh(self, articles):
+        """articles（スラッグ → メタデータ）に合わせて更新。戻り値は更新した記事数（全計算なら-1）"""
+        changed = [slug for slug, meta in articles.items()
+                   if self.docs.get(slug, {}).get('hash') != content_hash(document_text(meta))]
+        removed = [slug for slug in self.docs if slug not in articles]
+        if not changed and not removed:
+            return 0
+        if not self.docs or self.changed + len(changed) + len(removed) > REFRESH_RATIO * len(articles):
+            self.rebuild(articles)
+            return -1
+        self.update(articles, changed, removed)
+        return len(changed) + len(removed)
+
+    def top(self, slug, k=TOP_K):
+        return [other for other, _ in self.neighbors.get(slug, [])[:k]]
+
+
+def compute_related(site):
+    """関連記事ステージ: 記事ページ同士の類似度から site.related を作る"""
+    articles = {slug: meta for slug, meta in site.metadata.items() if meta.get('type') == 'article'}
+    index = RelatedIndex.load(site.src_dir / INDEX_NAME)
+    updated = index.refresh(articles)
+    if updated:
+        index.save()
+    site.related = {slug: index.top(slug) for slug in articles}
+    if updated < 0:
+        print(f"🔗 related: recomputed all {len(articles)} articles")
+    else:
+        print(f"🔗 related: {updated} updated, {len(articles) - updated} cached")
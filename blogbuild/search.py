@@ -0,0 +1,305 @@
+"""
+サイト内検索のインデックスとサイドバーの検索欄
+
+記事のタイトル・説明・本文（メタデータ抽出で集めたもの）から転置インデックスを作る。
+日本語は2文字ずつ（バイグラム）、英数字は単語ごとに区切る。インデックスは
+トークンのハッシュで小さなシャードに分けて assets/search/ に書き出し、ブラウザは
+検索語のトークンが入っているシャードだけを取りに行くので、最初の検索でも数KBしか読まない。
+
+  assets/search/index.json           : 記事の一覧（URL・タイトル）とシャードのファイル名
+  assets/search/<n>.<hash>.json      : {トークン: [記事番号, スコア, 記事番号, スコア, ...]}
+  assets/search.<hash>.js            : サイドバーの検索欄のスクリプト
+
+シャードはファイル名に内容のハッシュが入るので長期キャッシュでき、変わったものだけ書き直す。
+"""
+
+import json
+import math
+import re
+import struct
+import unicodedata
+
+import add_sidebar
+import enhance_mobile
+
+from .manifest import content_hash
+from .output import write_atomic
+
+ASSETS_DIR = 'assets'
+SEARCH_DIR = 'assets/search'
+INDEX_FILE = 'index.json'
+INDEX_VERSION = 1
+
+# シャード1つの目安の大きさ（JSONのバイト数）
+SHARD_BYTES = 4 * 1024
+MAX_SHARDS = 256
+# フィールドごとの重み（タイトルに出てくる語を優先する）
+FIELD_WEIGHTS = (10, 3, 1)
+RESULT_LIMIT = 10
+
+# ひらがな・カタカナ・漢字の並びと、英数字の並び（スクリプトと同じ正規表現を使う）
+CJK_CHARS = r'\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+TOKEN_PATTERN = rf'([{CJK_CHARS}]+)|([a-z0-9]+)'
+TOKEN = re.compile(TOKEN_PATTERN)
+
+SHARD_PATTERN = re.compile(r'\d+\.[0-9a-f]{10}\.json')
+SCRIPT_PATTERN = re.compile(r'search\.[0-9a-f]{10}\.js')
+SEARCH_SCRIPT = re.compile(r'<script src="[^"]*assets/search\.[0-9a-f]{10}\.js" defer></script>\n?')
+SIDEBAR_OPEN = '<aside class="sidebar">\n'
+TAG_SPAN = re.compile(r'<span class="sidebar-tag">([^<]*)</span>')
+
+SEARCH_JS = r"""// サイドバーの記事検索（検索語のトークンが入っているシャードだけ読み込む）
+(function() {
+  var input = document.getElementById('search-input');
+  var list = document.getElementById('search-results');
+  if (!input || !list) return;
+  var base = document.currentScript.src;
+  var root = new URL('../', base);
+  var index = null;
+  var shards = {};
+  var seq = 0;
+  var timer = 0;
+
+  // blogbuild/search.py の tokenize と同じ区切り方
+  function tokenize(text) {
+    var tokens = [];
+    var re = /TOKEN_PATTERN/g;
+    var m;
+    text = text.normalize('NFKC').toLowerCase();
+    while ((m = re.exec(text))) {
+      var run = m[1];
+      if (!run) {
+        tokens.push(m[2]);
+      } else if (run.length === 1) {
+        tokens.push(run);
+      } else {
+        for (var i = 0; i < run.length - 1; i++) tokens.push(run.substr(i, 2));
+      }
+    }
+    return tokens.filter(function(t, i) { return tokens.indexOf(t) === i; });
+  }
+
+  // FNV-1a（UTF-16のコード単位ごと）
+  function shardOf(token, count) {
+    var h = 2166136261;
+    for (var i = 0; i < token.length; i++) h = Math.imul(h ^ token.charCodeAt(i), 16777619);
+    return (h >>> 0) % count;
+  }
+
+  function load(url) {
+    return fetch(url).then(function(r) {
+      if (!r.ok) throw new Error(r.status);
+      return r.json();
+    });
+  }
+
+  function loadIndex() {
+    if (!index) index = load(new URL('search/INDEX_FILE', base));
+    return index;
+  }
+
+  function loadShard(data, n) {
+    if (!shards[n]) shards[n] = load(new URL('search/' + data.shards[n], base));
+    return shards[n];
+  }
+
+  function render(items, message) {
+    list.textContent = '';
+    if (message) {
+      var li = document.createElement('li');
+      li.textContent = message;
+      list.appendChild(li);
+    }
+    items.forEach(function(doc) {
+      var li = document.createElement('li');
+      var a = document.createElement('a');
+      a.href = new URL(doc[0], root).href;
+      a.textContent = doc[1];
+      li.appendChild(a);
+      list.appendChild(li);
+    });
+  }
+
+  function search(query) {
+    var id = ++seq;
+    var tokens = tokenize(query);
+    if (!tokens.length) {
+      render([]);
+      return;
+    }
+    loadIndex().then(function(data) {
+      var count = data.shards.length;
+      return Promise.all(tokens.map(function(t) { return loadShard(data, shardOf(t, count)); }))
+        .then(function(loaded) {
+          if (id !== seq) return;
+          // すべてのトークンを含む記事だけ残し、スコアを足す
+          var scores = null;
+          tokens.forEach(function(t, i) {
+            var postings = loaded[i][t] || [];
+            var next = {};
+            for (var j = 0; j < postings.length; j += 2) {
+              var doc = postings[j];
+              if (!scores || doc in scores) next[doc] = (scores ? scores[doc] : 0) + postings[j + 1];
+            }
+            scores = next;
+          });
+          var hits = Object.keys(scores).map(Number).sort(function(a, b) {
+            return scores[b] - scores[a] || a - b;
+          });
+          render(hits.slice(0, RESULT_LIMIT).map(function(n) { return data.docs[n]; }),
+                 hits.length ? '' : '見つかりませんでした');
+        });
+    }).catch(function() {
+      if (id === seq) render([], '検索できませんでした');
+    });
+  }
+
+  input.addEventListener('input', function() {
+    clearTimeout(timer);
+    timer = setTimeout(function() { search(input.value); }, 150);
+  });
+  input.form.addEventListener('submit', function(e) {
+    e.preventDefault();
+    search(input.value);
+  });
+  // ?q= 付きのタグはその語で検索する（スクリプトがなければ普通のリンクとして動く）
+  document.querySelectorAll('.sidebar-tag[href^="?q="]').forEach(function(tag) {
+    tag.addEventListener('click', function(e) {
+      e.preventDefault();
+      input.value = tag.textContent;
+      search(input.value);
+    });
+  });
+  var q = new URLSearchParams(location.search).get('q');
+  if (q) {
+    input.value = q;
+    search(q);
+  }
+})();
+""".replace('TOKEN_PATTERN', TOKEN_PATTERN).replace('INDEX_FILE', INDEX_FILE) \
+    .replace('RESULT_LIMIT', str(RESULT_LIMIT))
+
+
+def tokenize(text):
+    """'Claude Codeで自動化' → ['claude', 'code', '自動', '動化']（日本語が1文字だけならその1文字）"""
+    text = unicodedata.normalize('NFKC', text).lower()
+    for run, word in TOKEN.findall(text):
+        if word:
+            yield word
+        elif len(run) == 1:
+            yield run
+        else:
+            for i in range(len(run) - 1):
+                yield run[i:i + 2]
+
+
+def shard_of(token, count):
+    """トークンのシャード番号（スクリプトの shardOf と同じ FNV-1a）"""
+    h = 2166136261
+    data = token.encode('utf-16-le')
+    for unit in struct.unpack(f'<{len(data) // 2}H', data):
+        h = ((h ^ unit) * 16777619) & 0xffffffff
+    return h % count
+
+
+def search_docs(site):
+    """検索の対象にする記事（新しい順）: [(URL, タイトル, 説明, 本文)]"""
+    docs = [(f'{slug}/', meta['title'], meta.get('desc', ''), meta.get('text', ''), meta.get('date', ''))
+            for slug, meta in site.metadata.items() if slug and meta.get('type') == 'article']
+    docs.sort(key=lambda doc: (doc[4], doc[0]), reverse=True)
+    return [doc[:4] for doc in docs]
+
+
+def build_index(docs):
+    """トークン → {記事番号: スコア}"""
+    postings = {}
+    for doc_id, (_, *fields) in enumerate(docs):
+        for weight, text in zip(FIELD_WEIGHTS, fields):
+            for token in tokenize(text):
+                scores = postings.setdefault(token, {})
+                scores[doc_id] = scores.get(doc_id, 0) + weight
+    return postings
+
+
+def split_shards(postings):
+    """インデックスをシャードに分ける（1つが SHARD_BYTES 程度になる数）"""
+    total = sum(len(token.encode('utf-8')) + 6 + 8 * len(scores) for token, scores in postings.items())
+    count = min(MAX_SHARDS, max(1, math.ceil(total / SHARD_BYTES)))
+    shards = [{} for _ in range(count)]
+    for token in sorted(postings):
+        scores = postings[token]
+        shards[shard_of(token, count)][token] = [value for doc in sorted(scores) for value in (doc, scores[doc])]
+    return shards
+
+
+def dump(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+def query_index(index, load_shard, query, limit=RESULT_LIMIT):
+    """検索（スクリプトの search と同じ処理）。load_shard(ファイル名) → シャードのdict"""
+    tokens = list(dict.fromkeys(tokenize(query)))
+    if not tokens:
+        return []
+    scores = None
+    count = len(index['shards'])
+    for token in tokens:
+        postings = load_shard(index['shards'][shard_of(token, count)]).get(token, [])
+        found = {}
+        for doc, score in zip(postings[::2], postings[1::2]):
+            if scores is None or doc in scores:
+                found[doc] = (scores[doc] if scores else 0) + score
+        scores = found
+    hits = sorted(scores, key=lambda doc: (-scores[doc], doc))
+    return [index['docs'][doc] for doc in hits[:limit]]
+
+
+def write_search_index(site):
+    """検索インデックスのステージ: 変わったシャードとスクリプトだけ書き直す"""
+    docs = search_docs(site)
+    shards = split_shards(build_index(docs))
+    out = site.src_dir / SEARCH_DIR
+    out.mkdir(parents=True, exist_ok=True)
+
+    names = []
+    written = 0
+    for i, shard in enumerate(shards):
+        text = dump(shard)
+        name = f'{i}.{content_hash(text)[:10]}.json'
+        names.append(name)
+        if not (out / name).exists():
+            write_atomic(out / name, text)
+            written += 1
+    index = {'version': INDEX_VERSION, 'shards': names, 'docs': [[url, title] for url, title, *_ in docs]}
+    written += write_atomic(out / INDEX_FILE, dump(index))
+    for path in out.iterdir():
+        if SHARD_PATTERN.fullmatch(path.name) and path.name not in names:
+            path.unlink()
+
+    assets = site.src_dir / ASSETS_DIR
+    script = f'search.{content_hash(SEARCH_JS)[:10]}.js'
+    written += write_atomic(assets / script, SEARCH_JS)
+    for old in assets.iterdir():
+        if SCRIPT_PATTERN.fullmatch(old.name) and old.name != script:
+            old.unlink()
+    site.search_href = f'{ASSETS_DIR}/{script}'
+    if written:
+        size = sum((out / name).stat().st_size for name in names)
+        print(f"🔍 search: {len(docs)} articles, {len(shards)} shards ({size:,} bytes), {written} files written")
+
+
+def upgrade_sidebar(html):
+    """以前のサイドバーに検索欄を入れ、タグをその語で検索するリンクにする"""
+    if 'id="search-input"' not in html:
+        html = html.replace(SIDEBAR_OPEN, SIDEBAR_OPEN + add_sidebar.SEARCH_SECTION, 1)
+    return TAG_SPAN.sub(lambda m: f'<a class="sidebar-tag" href="?q={m.group(1).replace(" ", "+")}">'
+                                  f'{m.group(1)}</a>', html)
+
+
+def link_search(page, site):
+    """サイドバーのあるページに検索欄と検索のスクリプトを入れる"""
+    if SIDEBAR_OPEN not in page.html:
+        return
+    html = SEARCH_SCRIPT.sub('', upgrade_sidebar(page.html))
+    tag = enhance_mobile.script_tag(page.root + site.search_href)
+    page.html = html.replace('</body>', f'{tag}</body>', 1)
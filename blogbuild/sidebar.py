@@ -0,0 +1,158 @@
+"""
+サイドバー（最新記事・人気記事・タグ）をメタデータから作る
+
+add_sidebar.SIDEBAR_HTML はリンクを手で書いた固定のHTMLで、一度サイドバーを入れたページは
+二度と更新されなかった。ビルドのたびにメタデータ抽出の結果から
+  最新記事 : 日付の新しい記事 LATEST_COUNT 件
+  人気記事 : GoatCounter のエクスポート（.goatcounter.csv か .goatcounter.csv.gz）の
+             ページビューが多い記事 POPULAR_COUNT 件。なければ add_sidebar.POPULAR_ARTICLES
+  タグ     : 記事の多いタグ TAG_COUNT 件（タグの一覧ページへのリンク）
+を並べたサイドバーを1つ作り、そのハッシュを依存キー 'sidebar' にする。サイドバーが
+変わったときだけ、サイドバーのあるページを作り直す。
+
+GoatCounter のエクスポートは大きくなるので、集計結果をファイルのサイズと更新日時をキーにして
+.sidebar-index.json にキャッシュする。
+"""
+
+import csv
+import gzip
+import html as html_lib
+import io
+import json
+from collections import Counter
+from urllib.parse import quote, urlparse
+
+import add_sidebar
+
+from .archives import SITE_URL, path_name, sorted_articles
+from .output import write_atomic
+
+INDEX_NAME = '.sidebar-index.json'
+INDEX_VERSION = 1
+GOATCOUNTER_EXPORTS = ('.goatcounter.csv', '.goatcounter.csv.gz')
+
+LATEST_COUNT = 5
+POPULAR_COUNT = 3
+TAG_COUNT = 8
+# サイドバーのあるページ（add_sidebar.TARGET_ARTICLES）はどれもルートの1つ下
+ROOT = '../'
+
+SECTION_TEMPLATE = """        <div class="sidebar-section">
+          <h3>{title}</h3>
+          <ul class="{list_class}">
+{items}
+          </ul>
+        </div>
+
+"""
+
+
+def read_export(path):
+    """GoatCounter のエクスポート（CSV）のテキスト"""
+    data = path.read_bytes()
+    if path.suffix == '.gz':
+        data = gzip.decompress(data)
+    return data.decode('utf-8-sig')
+
+
+def count_pageviews(text):
+    """エクスポートのCSV → パス → ページビュー（ボットとイベントは数えない）"""
+    rows = csv.reader(io.StringIO(text))
+    header = next(rows, [])
+    try:
+        path_col = header.index('Path')
+    except ValueError:
+        return {}
+    bot_col = header.index('Bot') if 'Bot' in header else None
+    event_col = header.index('Event') if 'Event' in header else None
+    counts = Counter()
+    for row in rows:
+        if len(row) <= path_col:
+            continue
+        if bot_col is not None and row[bot_col] not in ('', '0'):
+            continue
+        if event_col is not None and row[event_col].lower() == 'true':
+            continue
+        counts[row[path_col]] += 1
+    return dict(counts)
+
+
+def load_pageviews(site):
+    """スラッグ → ページビュー（エクスポートがなければ空）。集計はキャッシュする"""
+    export = next((site.src_dir / name for name in GOATCOUNTER_EXPORTS if (site.src_dir / name).exists()), None)
+    if export is None:
+        return {}
+    stat = export.stat()
+    key = f'{export.name}:{stat.st_size}:{stat.st_mtime_ns}'
+    index_path = site.src_dir / INDEX_NAME
+    try:
+        cached = json.loads(index_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        cached = {}
+    if cached.get('version') == INDEX_VERSION and cached.get('export') == key:
+        counts = cached['pageviews']
+    else:
+        try:
+            counts = count_pageviews(read_export(export))
+        except (OSError, ValueError, csv.Error) as e:
+            print(f"⚠️  sidebar: {export.name} を読み込めません（{e}）")
+            return {}
+        write_atomic(index_path, json.dumps({'version': INDEX_VERSION, 'export': key, 'pageviews': counts},
+                                            ensure_ascii=False, indent=1, sort_keys=True))
+    # パス（/blog/day1/ など）をスラッグにまとめる
+    prefix = urlparse(SITE_URL).path
+    views = Counter()
+    for path, count in counts.items():
+        path = path.split('?')[0].split('#')[0]
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+        views[path.strip('/').removesuffix('/index.html')] += count
+    return dict(views)
+
+
+def popular_articles(site, articles, pageviews):
+    """人気記事のスラッグ（ページビューの多い順。なければ add_sidebar.POPULAR_ARTICLES）"""
+    if pageviews:
+        order = {slug: position for position, (slug, _) in enumerate(articles)}
+        ranked = sorted((slug for slug in order if pageviews.get(slug)),
+                        key=lambda slug: (-pageviews[slug], order[slug]))
+        if ranked:
+            return ranked[:POPULAR_COUNT]
+    return [slug for slug in add_sidebar.POPULAR_ARTICLES if slug in site.metadata][:POPULAR_COUNT]
+
+
+def article_item(slug, meta):
+    title = html_lib.escape(meta.get('title', slug))
+    return f'            <li><a href="{ROOT}{slug}/">{title}</a></li>'
+
+
+def render_sidebar(site, pageviews):
+    """サイドバー全体のHTML（add_sidebar.SIDEBAR_HTML と同じ形）"""
+    articles = sorted_articles(site)
+    latest = [article_item(slug, meta) for slug, meta in articles[:LATEST_COUNT]]
+    popular = [article_item(slug, site.metadata[slug]) for slug in popular_articles(site, articles, pageviews)]
+    tag_counts = Counter(meta['tag'] for _, meta in articles if path_name(meta.get('tag', '')))
+    tags = [f'            <li><a class="sidebar-tag" href="{ROOT}tag/{quote(path_name(tag))}/">'
+            f'{html_lib.escape(tag)}</a></li>'
+            for tag, _ in sorted(tag_counts.items(), key=lambda item: (-item[1], item[0]))[:TAG_COUNT]]
+
+    sections = [('最新記事', 'sidebar-list', latest), ('人気記事', 'sidebar-list', popular),
+                ('タグ', 'sidebar-tags', tags)]
+    html = '      <aside class="sidebar">\n' + add_sidebar.SEARCH_SECTION
+    for title, list_class, items in sections:
+        if items:
+            html += SECTION_TEMPLATE.format(title=title, list_class=list_class, items='\n'.join(items))
+    return html.rstrip(' \n') + '\n      </aside>'
+
+
+def build_sidebar(site):
+    """サイドバーのステージ: メタデータ（と GoatCounter のエクスポート）からサイドバーを作る"""
+    site.sidebar = render_sidebar(site, load_pageviews(site))
+
+
+def sidebar(page, site):
+    """サイドバーを入れる。もうあれば今回作ったものに置き換える"""
+    if 'class="sidebar"' in page.html:
+        page.html = add_sidebar.replace_sidebar(page.html, site.sidebar)
+    else:
+        page.html = add_sidebar.add_sidebar(page.html, site.sidebar)
@@ -0,0 +1,283 @@
+"""
+ビルドステージの定義
+
+既存スクリプト（add_features.py など）の変換関数を、ビルドエンジンのステージとして並べる。
+"""
+
+import importlib
+from pathlib import Path
+from urllib.parse import quote
+
+import add_features
+import add_goatcounter
+import add_sidebar
+import enhance_mobile
+
+from .archives import article_tags, path_name, write_archives
+from .assets import link_assets, write_assets
+from .critical_css import inline_critical_css
+from .css_bundle import bundled, clean_bundles, link_shared_css, prepare_bundles
+from .engine import SiteStage, Stage
+from .feeds import write_feeds
+from .fonts import self_host_fonts, write_fonts
+from .home import home_page, write_home
+from .images import optimize_images, responsive_images
+from .links import check_links
+from .manifest import content_hash, stable_hash
+from .metadata import load_metadata, record_metadata
+from .mobile_js import link_mobile_js, write_mobile_js
+from .ogp import ogp_image, render_ogp
+from .related import compute_related
+from .search import link_search, write_search_index
+from .sidebar import build_sidebar, sidebar
+
+add_responsive = importlib.import_module('add-responsive')
+
+
+# 変換コード（どれかが変わると全ページ再ビルド）
+CODE_FILES = [
+    add_features.__file__,
+    add_goatcounter.__file__,
+    add_sidebar.__file__,
+    enhance_mobile.__file__,
+    add_responsive.__file__,
+    *sorted(str(p) for p in Path(__file__).parent.glob('*.py')),
+]
+
+# コードではなくサイトのメタデータとして扱う定数（ページ単位の依存で追跡する）
+DATA_NAMES = ('CATEGORIES', 'ARTICLE_INFO', 'SIDEBAR_HTML', 'POPULAR_ARTICLES')
+
+
+def resolve_dependency(site, key):
+    """依存キー → メタデータのハッシュ
+
+    'categories'     : カテゴリ分類（パンくずのカテゴリ名）
+    'sidebar'        : サイドバーのHTML（メタデータから作ったもの）
+    'slug:<slug>'    : その記事のタイトル・説明・読了時間（ページから抽出したもの）
+    'related:<slug>' : その記事の関連記事リスト
+    'css'            : 共通スタイルシートの内容
+    'js'             : 共通スクリプトの内容
+    'search'         : 検索のスクリプト
+    'home'           : ホームの記事一覧とスクリプト
+    'fonts'          : 自前で配信するフォントのサブセット
+    'images:<slug>'  : そのページのディレクトリにある画像のサイズと変換済みファイル
+    'ogp:<slug>'     : その記事のOGP画像
+    'assets'         : 画像の元のパス → ハッシュ付きのパスの対応表
+    """
+    if key == 'categories':
+        return stable_hash(add_features.CATEGORIES)
+    if key == 'sidebar':
+        return content_hash(site.sidebar)
+    if key == 'css':
+        return site.css_key
+    if key == 'js':
+        return site.js_href
+    if key == 'search':
+        return site.search_href
+    if key == 'home':
+        return stable_hash(site.home)
+    if key == 'fonts':
+        return stable_hash(site.fonts)
+    if key == 'assets':
+        return stable_hash(site.assets)
+    if key.startswith('images:'):
+        prefix = key[7:] + '/' if key[7:] else ''
+        return stable_hash({path: image for path, image in site.images.items()
+                            if path.startswith(prefix) and '/' not in path[len(prefix):]})
+    if key.startswith('ogp:'):
+        return site.ogp.get(key[4:], '')
+    if key.startswith('related:'):
+        return stable_hash(site.related.get(key[8:]))
+    if key.startswith('slug:'):
+        info = add_features.get_article_info(key[5:], site.metadata)
+        return stable_hash({name: info.get(name) for name in ('title', 'desc', 'reading_time')})
+    raise KeyError(key)
+
+
+def own_metadata(page, site):
+    return [f'slug:{page.slug}']
+
+
+def related_metadata(page, site):
+    """関連記事リストと、カードに載る記事のメタデータ"""
+    related = site.related.get(page.slug, [])
+    return [f'related:{page.slug}'] + [f'slug:{slug}' for slug in related]
+
+
+def sidebar_deps(page, site):
+    return ['sidebar']
+
+
+def css_deps(page, site):
+    return ['css']
+
+
+def js_deps(page, site):
+    return ['js']
+
+
+def search_deps(page, site):
+    return ['search']
+
+
+def home_deps(page, site):
+    return ['home']
+
+
+def font_deps(page, site):
+    return ['fonts']
+
+
+def image_deps(page, site):
+    return [f'images:{page.slug}']
+
+
+def ogp_deps(page, site):
+    return [f'ogp:{page.slug}']
+
+
+def asset_deps(page, site):
+    return ['assets']
+
+
+def breadcrumb_deps(page, site):
+    return ['categories'] + own_metadata(page, site)
+
+
+def is_article(page, site):
+    """記事のページか（メタデータの og:type が article）"""
+    return site.metadata.get(page.slug, {}).get('type') == 'article'
+
+
+def is_home(page, site):
+    return page.is_home
+
+
+def has_sidebar(page, site):
+    return page.slug in add_sidebar.TARGET_ARTICLES
+
+
+def is_responsive_target(page, site):
+    return page.rel_path in add_responsive.FILES
+
+
+def is_mobile_target(page, site):
+    return page.is_home or page.slug in enhance_mobile.TARGET_DIRS
+
+
+def responsive(page, site):
+    # 共通スタイルシートにまとめた後は目印のコメントが消えているので、<link>のスニペットで判断する
+    if 'responsive' in bundled(page.html):
+        return
+    page.html = add_responsive.add_responsive_css(page.html)
+
+
+def mobile(page, site):
+    """目次・プログレスバー・トップに戻るボタン（aboutとホームは目次なし）"""
+    if enhance_mobile.is_enhanced(page.html):
+        return
+    add_toc = not page.is_home and page.slug != 'about'
+    page.html = enhance_mobile.enhance_html(page.html, add_toc=add_toc, script_src=page.root + site.js_href)
+
+
+def breadcrumb(page, site):
+    """カテゴリに登録されていない記事は、記事のタグ（タグ別の一覧）をパンくずの2番目にする"""
+    category = None
+    tags = article_tags(site.metadata.get(page.slug, {}))
+    if add_features.get_category(page.slug)[0] is None and tags:
+        category = (tags[0], f'tag/{quote(path_name(tags[0]))}/' if path_name(tags[0]) else None)
+    page.html = add_features.insert_breadcrumb(page.html, page.slug, site.metadata, category)
+
+
+def reading_time(page, site):
+    page.html = add_features.insert_reading_time(page.html, page.slug, site.metadata)
+
+
+def share_buttons(page, site):
+    page.html = add_features.insert_share_buttons(page.html, page.slug, site.metadata)
+
+
+def related_articles(page, site):
+    page.html = add_features.insert_related_articles(page.html, page.slug, site.metadata,
+                                                     site.related.get(page.slug))
+
+
+def analytics(page, site):
+    page.html = add_goatcounter.insert_goatcounter(page.html)
+
+
+# ページの変換前に1回だけ実行するステップ（時間の表でページのステージと混ざらないよう site: を付ける）
+SITE_STAGES = [
+    SiteStage('site:metadata', load_metadata),
+    SiteStage('site:archives', write_archives),
+    SiteStage('site:home', write_home),
+    SiteStage('site:sidebar', build_sidebar),
+    SiteStage('site:related', compute_related),
+    SiteStage('site:ogp', render_ogp),
+    SiteStage('site:images', optimize_images),
+    SiteStage('site:assets', write_assets),
+    SiteStage('site:css_bundle', prepare_bundles),
+    SiteStage('site:mobile_js', write_mobile_js),
+    SiteStage('site:fonts', write_fonts),
+    SiteStage('site:search', write_search_index),
+]
+
+# 適用順に注意:
+# - 読了時間は <div class="content-wrapper"> を目印にするので、サイドバーより後
+# - レスポンシブ・モバイルのCSSは全ての</style>の前に入るので、
+#   <style>を持つパンくず・シェア・関連記事より前
+# - 共通スタイルシートへのまとめは、CSSを挿入するステージが全部終わった後
+# - クリティカルCSSは共通スタイルシートの<link>を置き換えるので、そのすぐ後
+# - 画像の参照をハッシュ付きにするのは、画像の参照を入れるステージ（OGP・画像・CSS）が全部終わった後
+# 並列ビルドでワーカーに渡すので、ラムダではなく名前付き関数を使う
+STAGES = [
+    Stage('sidebar', sidebar, has_sidebar, deps=sidebar_deps),
+    Stage('responsive', responsive, is_responsive_target),
+    Stage('mobile', mobile, is_mobile_target, deps=js_deps),
+    Stage('mobile_js', link_mobile_js, deps=js_deps),
+    Stage('search', link_search, has_sidebar, deps=search_deps),
+    Stage('home', home_page, is_home, deps=home_deps),
+    Stage('breadcrumb', breadcrumb, is_article, deps=breadcrumb_deps),
+    Stage('reading_time', reading_time, is_article, deps=own_metadata),
+    Stage('share_buttons', share_buttons, is_article, deps=own_metadata),
+    Stage('related_articles', related_articles, is_article, deps=related_metadata),
+    Stage('ogp', ogp_image, deps=ogp_deps),
+    Stage('images', responsive_images, deps=image_deps),
+    Stage('fonts', self_host_fonts, deps=font_deps),
+    Stage('shared_css', link_shared_css, deps=css_deps),
+    Stage('critical_css', inline_critical_css, deps=css_deps),
+    Stage('assets', link_assets, deps=asset_deps),
+    Stage('analytics', analytics),
+]
+
+# ページを書き出した後に1回だけ実行するステップ
+FINISH_STAGES = [
+    SiteStage('finish:metadata', record_metadata),
+    SiteStage('finish:css_bundle', clean_bundles),
+    SiteStage('finish:feeds', write_feeds),
+    SiteStage('finish:links', check_links),
+]
+
+# トレースするとき（build.py --trace）にステージの中で個別に時間を測る変換
+TRACED_FUNCTIONS = [
+    (add_sidebar, 'add_sidebar'),
+    (add_sidebar, 'replace_sidebar'),
+    (add_responsive, 'add_responsive_css'),
+    (enhance_mobile, 'enhance_html'),
+    (enhance_mobile, 'add_h2_ids'),
+    (enhance_mobile, 'extract_h2_headings'),
+    (enhance_mobile, 'generate_toc_html'),
+    (enhance_mobile, 'link_mobile_js'),
+    (add_features, 'insert_breadcrumb'),
+    (add_features, 'insert_reading_time'),
+    (add_features, 'insert_share_buttons'),
+    (add_features, 'insert_related_articles'),
+    (add_goatcounter, 'insert_goatcounter'),
+]
+
+# トレースするときに正規表現の呼び出しを数えるモジュール（変換コードのすべて）
+TRACED_MODULES = [
+    add_features, add_goatcounter, add_sidebar, enhance_mobile, add_responsive,
+    *(importlib.import_module(f'{__package__}.{path.stem}') for path in sorted(Path(__file__).parent.glob('*.py'))
+      if path.stem not in ('__init__', 'trace')),
+]
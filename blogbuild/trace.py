@@ -0,0 +1,206 @@
+"""
+ビルドのトレース（build.py --trace）
+
+ステージごと・ページごとの時間に加えて、ステージの中の変換（パンくずの挿入・add_h2_ids・
+目次の生成・サイドバーの挿入・アクセス解析の挿入など）の時間、入出力のバイト数、
+正規表現の呼び出し回数・HTMLパーサーに渡した回数を記録する。
+
+結果は Chrome のトレースイベントの JSON（chrome://tracing や https://ui.perfetto.dev で開ける）
+に書き出し、時間のかかったステージとページの表を表示する。
+
+トレースしないとき（tracer が None）は、エンジンは今までどおりステージの時間だけを測る。
+変換や正規表現を数えるためのラッパーは、トレースを始めたときだけモジュールに差し込み、
+終わったら元に戻す。
+"""
+
+import functools
+import importlib
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from html.parser import HTMLParser
+
+# 正規表現の呼び出しとして数える re の関数・パターンのメソッド
+REGEX_FUNCTIONS = ('sub', 'subn', 'search', 'match', 'fullmatch', 'findall', 'finditer', 'split')
+
+
+class Tracer:
+    """スパン（名前・開始・長さ・引数）を記録して、トレースイベントにする"""
+
+    def __init__(self, functions=(), modules=(), origin=None):
+        self.functions = list(functions)  # 個別に測る変換: (モジュール, 関数名)
+        self.modules = list(modules)  # 正規表現の呼び出しを数えるモジュール
+        self.origin = time.perf_counter() if origin is None else origin  # ワーカーとも同じ基準
+        self.events = []
+        self.stack = []  # 開いているスパン: [名前, 分類, 開始, 引数]
+        self._saved = []  # 差し込む前の (対象, 名前, 値)
+
+    def __getstate__(self):
+        # ワーカーには差し込む対象と時間の基準だけを送る（モジュールは名前で）
+        return {'functions': [(module.__name__, name) for module, name in self.functions],
+                'modules': [module.__name__ for module in self.modules], 'origin': self.origin}
+
+    def __setstate__(self, state):
+        self.__init__([(importlib.import_module(module), name) for module, name in state['functions']],
+                      [importlib.import_module(module) for module in state['modules']], state['origin'])
+
+    # --- スパン ---
+
+    def begin(self, name, category, **args):
+        self.stack.append([name, category, time.perf_counter(), dict(args, regex=0, parse=0)])
+
+    def end(self, **args):
+        name, category, start, span_args = self.stack.pop()
+        end = time.perf_counter()
+        span_args.update(args)
+        self.events.append({
+            'name': name, 'cat': category, 'ph': 'X', 'pid': os.getpid(), 'tid': 0,
+            'ts': round((start - self.origin) * 1e6, 1), 'dur': round((end - start) * 1e6, 1),
+            'args': span_args,
+        })
+
+    def count(self, kind):
+        """開いているスパン全部に、正規表現（'regex'）かパース（'parse'）1回を数える"""
+        for span in self.stack:
+            span[3][kind] += 1
+
+    def take_events(self):
+        """記録したイベントを取り出す（ワーカーからページごとに返す）"""
+        events, self.events = self.events, []
+        return events
+
+    # --- 差し込み ---
+
+    def _patch(self, target, name, value):
+        self._saved.append((target, name, getattr(target, name)))
+        setattr(target, name, value)
+
+    def install(self):
+        """変換のラッパーと、正規表現・パーサーを数えるラッパーを差し込む"""
+        if self._saved:
+            return
+        for module, name in self.functions:
+            self._patch(module, name, self._wrap(getattr(module, name), f'{module.__name__}.{name}'))
+        for module in self.modules:
+            if getattr(module, 're', None) is re:
+                self._patch(module, 're', _CountingRe(self))
+            for name, value in list(vars(module).items()):
+                if isinstance(value, re.Pattern):
+                    self._patch(module, name, _CountingPattern(value, self))
+        feed = HTMLParser.feed
+
+        def counting_feed(parser, data):
+            self.count('parse')
+            return feed(parser, data)
+
+        self._patch(HTMLParser, 'feed', counting_feed)
+
+    def uninstall(self):
+        """差し込んだものを元に戻す"""
+        while self._saved:
+            target, name, value = self._saved.pop()
+            setattr(target, name, value)
+
+    def _wrap(self, func, name):
+        """変換のラッパー: 最初の文字列の引数を入力、文字列の戻り値を出力としてバイト数を記録する"""
+
+        @functools.wraps(func)
+        def traced(*args, **kwargs):
+            text = next((arg for arg in args if isinstance(arg, str)), None)
+            result = None
+            self.begin(name, 'transform')
+            try:
+                result = func(*args, **kwargs)
+                return result
+            finally:
+                self.end(bytes_in=byte_length(text), bytes_out=byte_length(result))
+
+        return traced
+
+    # --- 書き出し ---
+
+    def write(self, path):
+        """Chrome のトレースイベントの JSON を書き出す"""
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0,
+                   'args': {'name': 'build' if pid == os.getpid() else f'worker {pid}'}}
+                  for pid in sorted({event['pid'] for event in self.events})]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events + self.events, 'displayTimeUnit': 'ms'}, f, ensure_ascii=False)
+
+    def report(self, top=10):
+        """時間のかかったステージ・変換とページの表を出力"""
+        stages = defaultdict(lambda: [0, 0.0, 0, 0, 0, 0])  # 回数, µs, 入力, 出力, 正規表現, パース
+        pages = defaultdict(lambda: [0.0, '', 0.0])  # µs, 一番遅いステージ, その µs
+        for event in self.events:
+            args = event['args']
+            entry = stages[event['name']]
+            entry[0] += 1
+            entry[1] += event['dur']
+            entry[2] += args.get('bytes_in') or 0
+            entry[3] += args.get('bytes_out') or 0
+            entry[4] += args['regex']
+            entry[5] += args['parse']
+            if event['cat'] == 'stage' and 'page' in args:
+                page = pages[args['page']]
+                page[0] += event['dur']
+                if event['dur'] > page[2]:
+                    page[1:] = [event['name'], event['dur']]
+
+        print(f"\n🔥 hottest stages / transforms")
+        print(f"{'name':<40} {'calls':>6} {'ms':>9} {'KB in':>9} {'KB out':>9} {'regex':>7} {'parse':>6}")
+        for name, (calls, micros, bytes_in, bytes_out, regex, parse) in sorted(
+                stages.items(), key=lambda item: -item[1][1])[:top]:
+            print(f"{name:<40} {calls:>6} {micros / 1000:>9.1f} {bytes_in / 1024:>9.0f} {bytes_out / 1024:>9.0f} "
+                  f"{regex:>7} {parse:>6}")
+        if pages:
+            print(f"\n🔥 hottest pages")
+            print(f"{'page':<40} {'ms':>9}  slowest stage")
+            for rel_path, (micros, slowest, slowest_micros) in sorted(pages.items(), key=lambda item: -item[1][0])[:top]:
+                print(f"{rel_path:<40} {micros / 1000:>9.1f}  {slowest} ({slowest_micros / 1000:.1f} ms)")
+
+
+def byte_length(value):
+    return len(value.encode('utf-8')) if isinstance(value, str) else None
+
+
+class _CountingPattern:
+    """コンパイル済みの正規表現の代わり（検索・置換のたびに数える）"""
+
+    def __init__(self, pattern, tracer):
+        self._pattern = pattern
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        value = getattr(self._pattern, name)
+        if name not in REGEX_FUNCTIONS:
+            return value
+
+        def counted(*args, **kwargs):
+            self._tracer.count('regex')
+            return value(*args, **kwargs)
+
+        return counted
+
+
+class _CountingRe:
+    """モジュールの re の代わり（re.sub などを呼ぶたびに数える）"""
+
+    def __init__(self, tracer):
+        self._tracer = tracer
+
+    def __getattr__(self, name):
+        value = getattr(re, name)
+        if not callable(value) or isinstance(value, type):
+            return value
+        counts = name in REGEX_FUNCTIONS
+
+        def counted(pattern, *args, **kwargs):
+            if counts:
+                self._tracer.count('regex')
+            if isinstance(pattern, _CountingPattern):
+                pattern = pattern._pattern
+            return value(pattern, *args, **kwargs)
+
+        return counted
@@ -0,0 +1,185 @@
+"""
+ファイルの変更の監視（開発サーバー用）
+
+Linux では inotify（ctypes で libc を直接呼ぶ）でディレクトリを監視し、変更があったファイルの
+パスをすぐに返す。inotify が使えない環境（macOS など）や監視の上限（fs.inotify.max_user_watches）
+を超えたときは、ツリーを一定間隔で見直すポーリングに切り替える。
+
+隠しファイル・隠しディレクトリ（.git やビルドのキャッシュ）と __pycache__ は見ない。
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from pathlib import Path
+
+# inotify のイベント（<sys/inotify.h>）
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+POLL_INTERVAL = 0.3
+SKIP_DIRS = {'__pycache__'}
+
+
+def skipped(name):
+    return name.startswith('.') or name in SKIP_DIRS
+
+
+def walk_dirs(root):
+    """root とその下の監視するディレクトリ"""
+    for dirpath, dirnames, _ in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if not skipped(name))
+        yield Path(dirpath)
+
+
+def scan(root, extra_dirs=()):
+    """監視するファイル → (更新日時, サイズ)"""
+    files = {}
+    dirs = [(Path(root), True)] + [(Path(directory), False) for directory in extra_dirs]
+    for directory, recursive in dirs:
+        for current in (walk_dirs(directory) if recursive else [directory]):
+            try:
+                entries = list(os.scandir(current))
+            except OSError:
+                continue
+            for entry in entries:
+                if skipped(entry.name) or not entry.is_file():
+                    continue
+                stat = entry.stat()
+                files[Path(entry.path)] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+class PollingWatcher:
+    """一定間隔でツリーを見直して、変わったファイルを返す"""
+
+    name = 'polling'
+
+    def __init__(self, root, extra_dirs=()):
+        self.root = Path(root)
+        self.extra_dirs = list(extra_dirs)
+        self.files = scan(self.root, self.extra_dirs)
+
+    def wait(self, timeout=None):
+        """変わったファイルのパスの集合（timeout 秒のうちに何もなければ空）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            files = scan(self.root, self.extra_dirs)
+            changed = {path for path in files.keys() | self.files.keys() if files.get(path) != self.files.get(path)}
+            self.files = files
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(POLL_INTERVAL)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """inotify でディレクトリを監視して、変わったファイルを返す"""
+
+    name = 'inotify'
+
+    def __init__(self, root, extra_dirs=()):
+        libc_name = ctypes.util.find_library('c')
+        self.libc = ctypes.CDLL(libc_name, use_errno=True)
+        self.root = Path(root)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        self.dirs = {}  # wd → ディレクトリ
+        self.recursive = set()  # 下のディレクトリも監視する wd
+        try:
+            for directory in walk_dirs(root):
+                self.add_watch(directory, recursive=True)
+            for directory in extra_dirs:
+                self.add_watch(Path(directory), recursive=False)
+        except OSError:
+            self.close()
+            raise
+
+    def add_watch(self, directory, recursive):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch: {directory}')
+        self.dirs[wd] = directory
+        if recursive:
+            self.recursive.add(wd)
+
+    def wait(self, timeout=None):
+        """変わったファイルのパスの集合（timeout 秒のうちに何もなければ空）"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            changed |= self.parse(data)
+        return changed
+
+    def parse(self, data):
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # 取りこぼしたので、監視しているファイル全部が変わったことにする
+                changed |= set(scan(self.root))
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.dirs[wd]
+                self.recursive.discard(wd)
+                continue
+            if not name or skipped(name):
+                continue
+            path = directory / name
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO) and wd in self.recursive:
+                    # 新しいディレクトリも監視し、中にすでにあるファイルを変わったことにする
+                    for sub in walk_dirs(path):
+                        self.add_watch(sub, recursive=True)
+                    changed |= set(scan(path))
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def watcher(root, extra_dirs=(), polling=False):
+    """使える監視の方法で root（と extra_dirs の直下）を監視する"""
+    if not polling:
+        try:
+            return InotifyWatcher(root, extra_dirs)
+        except (OSError, AttributeError, TypeError) as e:
+            # AttributeError: libc に inotify がない（Linux 以外）
+            print(f"⚠️  inotify を使えないのでポーリングで監視します（{e}）")
+    return PollingWatcher(root, extra_dirs)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+ブログ全体を1回のパスでビルドする
+
+add_sidebar.py / add-responsive.py / enhance_mobile.py / add_features.py /
+add_goatcounter.py の変換を、各ページ1回の読み込み・1回の書き出しでまとめて適用する。
+記事のタイトル・説明などは各ページから抽出したメタデータ（.metadata-index.json）を使う。
+
+前回のビルドから入力も依存メタデータも変わっていないページはスキップする
+（src/.build-manifest.json に記録）。
+
+書き出した後、ページの出力のハッシュから sitemap.xml と feed.xml（Atom）・feed.json を更新し、
+内部リンクとアンカーを確かめる（外部のURLも確かめるときは check_links.py）。
+
+--out を指定すると、ビルド結果を縮小して .gz / .br と一緒にそのディレクトリに書き出す。
+
+--trace を指定すると、ステージ・ページ・変換ごとの時間と入出力のバイト数、正規表現・パーサーの
+呼び出し回数を Chrome のトレースイベントの JSON に書き出し、時間のかかったステージとページを表示する。
+
+使い方:
+  python3 build.py [--src /tmp/blog-work] [--full] [--jobs N] [--out DIR] [--trace FILE]
+"""
+
+import argparse
+from pathlib import Path
+
+from blogbuild.engine import build
+from blogbuild.publish import publish
+from blogbuild.stages import (CODE_FILES, DATA_NAMES, FINISH_STAGES, SITE_STAGES, STAGES, TRACED_FUNCTIONS,
+                              TRACED_MODULES, resolve_dependency)
+from blogbuild.trace import Tracer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ブログ全体をビルド')
+    parser.add_argument('--src', default='/tmp/blog-work', help='ブログのディレクトリ')
+    parser.add_argument('--full', action='store_true', help='マニフェストを無視して全ページ再ビルド')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='並列に処理するプロセス数（0でCPUコア数）')
+    parser.add_argument('--out', help='縮小したサイトを書き出すディレクトリ（--srcの外）')
+    parser.add_argument('--trace', help='トレース（Chrome のトレースイベントの JSON）を書き出すファイル')
+    args = parser.parse_args()
+    if args.out and Path(args.src).resolve() in [Path(args.out).resolve(), *Path(args.out).resolve().parents]:
+        parser.error('--out は --src の外のディレクトリを指定してください')
+
+    tracer = Tracer(TRACED_FUNCTIONS, TRACED_MODULES) if args.trace else None
+    build(args.src, STAGES, site_stages=SITE_STAGES, code_files=CODE_FILES, data_names=DATA_NAMES,
+          resolve=resolve_dependency, full=args.full, jobs=args.jobs, finish_stages=FINISH_STAGES, tracer=tracer)
+    if tracer is not None:
+        tracer.write(args.trace)
+        tracer.report()
+        print(f"\n🧭 trace: {args.trace} ({len(tracer.events):,} events)")
+    if args.out:
+        publish(args.src, args.out, full=args.full)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+ブログのリンクとアンカーのチェック
+
+ビルド済みのツリーの全ページの内部リンク（href / src / srcset）とフラグメント（#sec-N など）が
+あるファイル・要素を指しているかを確かめ、壊れたリンクをファイルと行番号付きで表示する。
+--external を指定すると、外部のURLも asyncio で並列に確かめる。--external-origin で外部への
+リクエストをローカルのスタブサーバーなどに向けられる（Host ヘッダーは元のURLのまま）。
+
+壊れたリンクがあれば終了コード1で終わる。
+
+使い方:
+  python3 check_links.py [--src /tmp/blog-work] [--external] [--external-origin http://127.0.0.1:9000]
+                         [--concurrency 8]
+"""
+
+import argparse
+import sys
+
+from blogbuild.links import EXTERNAL_CONCURRENCY, check_tree
+
+
+def main():
+    parser = argparse.ArgumentParser(description='リンクとアンカーのチェック')
+    parser.add_argument('--src', default='/tmp/blog-work', help='ビルド済みのブログのディレクトリ')
+    parser.add_argument('--external', action='store_true', help='外部のURLも確かめる')
+    parser.add_argument('--external-origin', help='外部のURLへのリクエストを送る先（例: http://127.0.0.1:9000）')
+    parser.add_argument('--concurrency', type=int, default=EXTERNAL_CONCURRENCY, help='外部のURLの同時接続数')
+    args = parser.parse_args()
+
+    broken = check_tree(args.src, external=args.external or bool(args.external_origin),
+                        origin=args.external_origin, concurrency=args.concurrency)
+    sys.exit(1 if broken else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,8 @@ import os
 import re
 from pathlib import Path
 
+from blogbuild.output import write_atomic
+
 # 追加するCSS
 TOC_CSS = """
   /* 目次 (TOC) */
@@ -60,8 +62,11 @@ PROGRESS_BAR_CSS = """
     height: 3px;
     background: #e63946;
     z-index: 9999;
-    transition: width 0.1s linear;
-    width: 0%;
+    width: 100%;
+    transform: scaleX(0);
+    transform-origin: 0 50%;
+    transition: transform 0.1s linear;
+    will-change: transform;
   }
 """
 
@@ -103,32 +108,131 @@ BACK_TO_TOP_CSS = """
   .back-to-top:hover { background: #c5303c; }
 """
 
-# 追加するJavaScript
-MOBILE_ENHANCEMENTS_JS = """
-<script>
-// TOC 折りたたみ
-document.querySelectorAll('.toc-title').forEach(t => {
-  t.addEventListener('click', () => t.parentElement.classList.toggle('collapsed'));
-});
-
-// 読了プログレスバー
-window.addEventListener('scroll', function() {
-  var h = document.documentElement;
-  var progress = (h.scrollTop / (h.scrollHeight - h.clientHeight)) * 100;
-  document.getElementById('progressBar').style.width = progress + '%';
-});
-
-// トップに戻るボタン
-var btn = document.getElementById('backToTop');
-window.addEventListener('scroll', function() {
-  btn.classList.toggle('visible', window.scrollY > 500);
-});
-btn.addEventListener('click', function() {
-  window.scrollTo({ top: 0, behavior: 'smooth' });
-});
-</script>
+# 共通スクリプト（各ページには<script src>で読み込む。ブラウザにキャッシュされる）
+# scrollリスナーは1つだけ（passive）で、処理は requestAnimationFrame で1フレーム1回にまとめる。
+# 文書の高さは ResizeObserver で変わったときだけ測り、プログレスバーは width ではなく
+# transform: scaleX で動かす（スクロールのたびにレイアウトを計算させない）。
+MOBILE_JS = """// 目次の折りたたみ・読了プログレスバー・トップに戻るボタン
+(function() {
+  var root = document.documentElement;
+  var bar = document.getElementById('progressBar');
+  var btn = document.getElementById('backToTop');
+  var maxScroll = 0;
+  var shown = false;
+  var ticking = false;
+
+  // TOC 折りたたみ
+  document.querySelectorAll('.toc-title').forEach(function(t) {
+    t.addEventListener('click', function() { t.parentElement.classList.toggle('collapsed'); });
+  });
+
+  // トップに戻るボタン
+  if (btn) {
+    btn.addEventListener('click', function() {
+      window.scrollTo({ top: 0, behavior: 'smooth' });
+    });
+  }
+
+  // 読了プログレスバー（ページ側のCSSが width で書かれていても scaleX で動くように）
+  if (bar) {
+    bar.style.width = '100%';
+    bar.style.transformOrigin = '0 50%';
+  }
+
+  function update() {
+    ticking = false;
+    var y = window.scrollY || root.scrollTop;
+    if (bar) {
+      var progress = maxScroll > 0 ? Math.min(y / maxScroll, 1) : 0;
+      bar.style.transform = 'scaleX(' + progress + ')';
+    }
+    if (btn && (y > 500) !== shown) {
+      shown = y > 500;
+      btn.classList.toggle('visible', shown);
+    }
+  }
+
+  function measure() {
+    maxScroll = root.scrollHeight - root.clientHeight;
+    update();
+  }
+
+  window.addEventListener('scroll', function() {
+    if (!ticking) {
+      ticking = true;
+      requestAnimationFrame(update);
+    }
+  }, { passive: true });
+  window.addEventListener('resize', measure, { passive: true });
+  if (window.ResizeObserver) {
+    new ResizeObserver(measure).observe(document.body);
+  } else {
+    window.addEventListener('load', measure);
+  }
+  measure();
+})();
 """
 
+MOBILE_JS_FILE = 'assets/mobile.js'
+MOBILE_SCRIPT_PATTERN = re.compile(r'<script src="[^"]*assets/mobile(?:\.[0-9a-f]{10})?\.js" defer></script>\n?')
+
+# 以前ページに直接埋め込んでいたスクリプト（見つけたら取り除いて共通スクリプトに置き換える）
+LEGACY_TOC_JS = re.compile(
+    r"[ \t]*// TOC 折りたたみ\n"
+    r"document\.querySelectorAll\('\.toc-title'\)\.forEach\(t => \{\s*"
+    r"t\.addEventListener\('click', \(\) => t\.parentElement\.classList\.toggle\('collapsed'\)\);\s*\}\);\n\n?")
+LEGACY_PROGRESS_JS = re.compile(
+    r"(?:[ \t]*// (?:読了プログレスバー|Progress bar)\n)?"
+    r"[ \t]*window\.addEventListener\('scroll', function\(\) \{\s*var h = document\.documentElement;\s*"
+    r"var progress = \(h\.scrollTop / \(h\.scrollHeight - h\.clientHeight\)\) \* 100;\s*"
+    r"document\.getElementById\('progressBar'\)\.style\.width = progress \+ '%';\s*\}\);\n\n?")
+LEGACY_BACK_TO_TOP_JS = re.compile(
+    r"(?:[ \t]*// (?:トップに戻るボタン|Back to top button)\n)?"
+    r"[ \t]*var btn = document\.getElementById\('backToTop'\);\s*"
+    r"window\.addEventListener\('scroll', function\(\) \{\s*"
+    r"btn\.classList\.toggle\('visible', window\.scrollY > 500\);\s*\}\);\s*"
+    r"btn\.addEventListener\('click', function\(\) \{\s*"
+    r"window\.scrollTo\(\{ top: 0, behavior: 'smooth' \}\);\s*\}\);\n")
+EMPTY_SCRIPT = re.compile(r'<script>\s*</script>\n*')
+
+
+def script_tag(src):
+    return f'<script src="{src}" defer></script>\n'
+
+
+# 各パターンは行頭の空白から始まって手がかりになる文字列がないので、ページ全体に当てると
+# 正規表現が1文字ずつ試すことになり遅い。目印（パターンの中にある文字列）を探して、その前後だけに当てる
+LEGACY_JS = (
+    ("querySelectorAll('.toc-title')", LEGACY_TOC_JS),
+    ("getElementById('progressBar').style.width", LEGACY_PROGRESS_JS),
+    ("getElementById('backToTop')", LEGACY_BACK_TO_TOP_JS),
+)
+LEGACY_WINDOW = 1000  # 目印の前後でパターンを探す文字数（どのスクリプトもこれより短い）
+
+
+def remove_legacy_js(content):
+    """ページに埋め込まれたスクロール処理を取り除く（空になった<script>も消す）"""
+    for marker, pattern in LEGACY_JS:
+        index = content.find(marker)
+        while index >= 0:
+            match = pattern.search(content, max(0, index - LEGACY_WINDOW), index + LEGACY_WINDOW)
+            if match and match.start() <= index < match.end():
+                content = content[:match.start()] + content[match.end():]
+                index = content.find(marker, match.start())
+            else:
+                index = content.find(marker, index + 1)
+    return EMPTY_SCRIPT.sub('', content)
+
+
+def link_mobile_js(content, src):
+    """共通スクリプトの<script src>を入れる（古いものやインラインのものは置き換える）"""
+    content = MOBILE_SCRIPT_PATTERN.sub('', remove_legacy_js(content))
+    tag = script_tag(src)
+    if '<button class="back-to-top"' in content:
+        return content.replace('<button class="back-to-top"', f'{tag}<button class="back-to-top"', 1)
+    return content.replace('</body>', f'{tag}</body>', 1)
+
+
 def extract_h2_headings(html_content):
     """記事からh2見出しを抽出"""
     # article内のh2を探す（サイドバーのh2は除外）
@@ -193,18 +297,32 @@ def add_h2_ids(html_content):
     result = re.sub(r'<article[^>]*>(.*?)</article>', process_article, html_content, flags=re.DOTALL)
     return result
 
-def enhance_article(html_path, add_toc=True):
-    """記事ファイルを拡張"""
-    print(f"Processing: {html_path}")
-    
-    with open(html_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # 既に処理済みかチェック（JavaScriptまで追加されているか）
-    if 'progress-bar' in content and 'back-to-top' in content and 'var btn = document.getElementById(\'backToTop\')' in content:
-        print(f"  → Already enhanced, skipping")
-        return
-    
+# 対象ディレクトリ
+TARGET_DIRS = [
+    'about',
+    'backtest-failures', 
+    'backtest-method',
+    'backtest-overview',
+    'comfyui',
+    'cron-heartbeat',
+    'day1',
+    'morning-briefing',
+    'multi-agent-flow',
+    'soul-md-merged',
+    'token-efficiency'
+]
+
+def has_legacy_js(content):
+    """共通スクリプトにする前の、ページに埋め込んだスクリプトがあるか"""
+    return 'var btn = document.getElementById(\'backToTop\')' in content
+
+def is_enhanced(content):
+    """JavaScriptまで追加済みかチェック（埋め込みの古いスクリプトでも可）"""
+    return ('progress-bar' in content and 'back-to-top' in content
+            and (MOBILE_SCRIPT_PATTERN.search(content) is not None or has_legacy_js(content)))
+
+def enhance_html(content, add_toc=True, script_src='../' + MOBILE_JS_FILE):
+    """HTML文字列にモバイル向け機能を追加して返す（script_src: 共通スクリプトのページからのパス）"""
     # 1. CSSを追加（</style>の前に）
     if 'toc {' not in content:
         content = content.replace('</style>', f'{TOC_CSS}\n{PROGRESS_BAR_CSS}\n{SECTION_NUMBER_CSS}\n{BACK_TO_TOP_CSS}\n</style>')
@@ -234,36 +352,43 @@ def enhance_article(html_path, add_toc=True):
     if '<button class="back-to-top"' not in content:
         content = content.replace('</body>', '<button class="back-to-top" id="backToTop">↑</button>\n</body>')
     
-    # 6. JavaScriptを追加（</body>の前、back-to-topボタンの前に）
-    if 'var btn = document.getElementById(\'backToTop\')' not in content:
-        # back-to-topボタンの直前に挿入
-        content = content.replace('<button class="back-to-top"', f'{MOBILE_ENHANCEMENTS_JS}\n<button class="back-to-top"')
+    # 6. 共通スクリプトを読み込む（back-to-topボタンの前に。埋め込みの古いスクリプトは取り除く）
+    content = link_mobile_js(content, script_src)
+    
+    return content
+
+def enhance_article(html_path, add_toc=True, script_src='../' + MOBILE_JS_FILE):
+    """記事ファイルを拡張"""
+    print(f"Processing: {html_path}")
+    
+    with open(html_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    
+    # 既に処理済みかチェック（JavaScriptまで追加されているか）
+    if is_enhanced(content) and not has_legacy_js(content):
+        print(f"  → Already enhanced, skipping")
+        return
+    
+    if is_enhanced(content):
+        # 埋め込みのスクリプトを共通スクリプトに置き換えるだけ
+        content = link_mobile_js(content, script_src)
+    else:
+        content = enhance_html(content, add_toc=add_toc, script_src=script_src)
     
     # ファイルに書き戻し
-    with open(html_path, 'w', encoding='utf-8') as f:
-        f.write(content)
+    write_atomic(html_path, content)
     
     print(f"  ✓ Enhanced")
 
 def main():
     blog_dir = Path('/tmp/blog-work')
     
-    # 対象ディレクトリ
-    article_dirs = [
-        'about',
-        'backtest-failures', 
-        'backtest-method',
-        'backtest-overview',
-        'comfyui',
-        'cron-heartbeat',
-        'day1',
-        'morning-briefing',
-        'multi-agent-flow',
-        'soul-md-merged',
-        'token-efficiency'
-    ]
+    # 共通スクリプトを書き出す
+    js_file = blog_dir / MOBILE_JS_FILE
+    write_atomic(js_file, MOBILE_JS)
+    print(f"✓ {MOBILE_JS_FILE} を書き出しました")
     
-    for dir_name in article_dirs:
+    for dir_name in TARGET_DIRS:
         html_file = blog_dir / dir_name / 'index.html'
         if html_file.exists():
             # aboutはTOC不要
@@ -276,7 +401,7 @@ def main():
     index_file = blog_dir / 'index.html'
     if index_file.exists():
         print(f"\nProcessing home page: {index_file}")
-        enhance_article(index_file, add_toc=False)
+        enhance_article(index_file, add_toc=False, script_src=MOBILE_JS_FILE)
     
     print("\n✓ All articles enhanced!")
 
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+ブログのプレビュー用のローカルサーバー
+
+起動時に build.py と同じステージで差分ビルドし、ソースのツリーを監視して、
+ページを保存するとそのページだけ作り直してブラウザをリロードする（その後で一覧・サイドバー・
+検索インデックスなどを差分ビルドで更新する）。変換コードを保存するとサーバーを起動し直す。
+監視は inotify（Linux）、使えなければポーリング。
+
+使い方:
+  python3 serve.py [--src /tmp/blog-work] [--port 8000] [--host 127.0.0.1] [--jobs N] [--poll]
+"""
+
+import argparse
+
+from blogbuild.devserver import DevServer
+from blogbuild.stages import CODE_FILES, DATA_NAMES, FINISH_STAGES, SITE_STAGES, STAGES, resolve_dependency
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ブログのプレビュー用サーバー')
+    parser.add_argument('--src', default='/tmp/blog-work', help='ブログのディレクトリ')
+    parser.add_argument('--host', default='127.0.0.1', help='待ち受けるアドレス')
+    parser.add_argument('--port', type=int, default=8000, help='待ち受けるポート')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='差分ビルドで並列に処理するプロセス数（0でCPUコア数）')
+    parser.add_argument('--poll', action='store_true', help='inotify を使わずポーリングで監視する')
+    args = parser.parse_args()
+
+    build_args = {'stages': STAGES, 'site_stages': SITE_STAGES, 'code_files': CODE_FILES,
+                  'data_names': DATA_NAMES, 'resolve': resolve_dependency, 'finish_stages': FINISH_STAGES}
+    DevServer(args.src, build_args, jobs=args.jobs, polling=args.poll).serve(args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,6 @@
+"""テストからリポジトリのルートのモジュール（blogbuild・add_features など）を読み込めるようにする"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
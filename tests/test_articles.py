@@ -0,0 +1,58 @@
+"""記事のステージ（パンくず・読了時間・シェア・関連記事）を、手で書いたブロックのある記事に当てる
+
+news-tiktok-clipping（目印のないパンくず・BreadcrumbList・「⏱ 約6分」）と
+news-ai-sidehustle（カテゴリにない記事で、手で書いた読了時間）を2回ビルドして、
+ブロックが増えず、2回目（--full）で何も変わらないことを確かめる。
+"""
+
+import shutil
+from pathlib import Path
+
+import pytest
+
+from blogbuild.engine import build
+from blogbuild.stages import CODE_FILES, DATA_NAMES, FINISH_STAGES, SITE_STAGES, STAGES, resolve_dependency
+
+ROOT = Path(__file__).resolve().parent.parent
+SLUGS = ['news-tiktok-clipping', 'news-ai-sidehustle']
+BLOCKS = ['<nav class="breadcrumb"', '"@type": "BreadcrumbList"', '⏱ 約', '<div class="share-buttons">',
+          '<div class="related-articles">']
+
+
+def run(src_dir, full=False):
+    build(src_dir, STAGES, site_stages=SITE_STAGES, code_files=CODE_FILES, data_names=DATA_NAMES,
+          resolve=resolve_dependency, full=full, finish_stages=FINISH_STAGES)
+    return {slug: (src_dir / slug / 'index.html').read_text(encoding='utf-8') for slug in SLUGS}
+
+
+@pytest.fixture(scope='module')
+def builds(tmp_path_factory):
+    src_dir = tmp_path_factory.mktemp('blog')
+    for slug in SLUGS:
+        shutil.copytree(ROOT / slug, src_dir / slug)
+    shutil.copy(ROOT / 'index.html', src_dir / 'index.html')
+    shutil.copytree(ROOT / 'assets', src_dir / 'assets')
+    return run(src_dir), run(src_dir, full=True)
+
+
+@pytest.mark.parametrize('slug', SLUGS)
+def test_blocks_are_not_duplicated(builds, slug):
+    source = (ROOT / slug / 'index.html').read_text(encoding='utf-8')
+    first, _ = builds
+    for block in BLOCKS:
+        assert first[slug].count(block) == source.count(block), block
+
+
+@pytest.mark.parametrize('slug', SLUGS)
+def test_second_build_changes_nothing(builds, slug):
+    first, second = builds
+    assert second[slug] == first[slug]
+
+
+def test_hand_written_blocks_are_kept(builds):
+    first, _ = builds
+    assert '<p><strong>⏱ 約6分</strong></p>' in first['news-tiktok-clipping']
+    assert '⏱ 約6分で読めます' in first['news-ai-sidehustle']
+    for html in first.values():
+        assert '&gt; None &gt;' not in html
+        assert '"name": null' not in html
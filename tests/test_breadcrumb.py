@@ -0,0 +1,46 @@
+"""add_features.insert_breadcrumb: ビルドが入れたパンくずだけを更新し、手で書いたものには触らない"""
+
+import add_features
+
+ARTICLES = {'x-post': {'title': 'Xの記事'}}
+PAGE = '<body>\n<div class="hero">Hero</div>\n</body>\n'
+HAND_WRITTEN_LD = '''<script type="application/ld+json">
+{
+  "@context": "https://schema.org",
+  "@type": "BreadcrumbList",
+  "itemListElement": [
+    {"@type": "ListItem", "position": 1, "name": "Home", "item": "https://daisuki-koshian.github.io/blog/"},
+    {"@type": "ListItem", "position": 2, "name": "海外AI", "item": "https://daisuki-koshian.github.io/blog/#"}
+  ]
+}
+</script>
+'''
+
+
+def test_insert_is_idempotent():
+    html = add_features.insert_breadcrumb(PAGE, 'x-post', ARTICLES, ('海外AIニュース', 'tag/news/'))
+    assert html.count('<!-- パンくずリスト -->') == 1
+    assert '<a href="../tag/news/">海外AIニュース</a>' in html
+    assert add_features.insert_breadcrumb(html, 'x-post', ARTICLES, ('海外AIニュース', 'tag/news/')) == html
+
+
+def test_no_category_leaves_the_crumb_out():
+    html = add_features.insert_breadcrumb(PAGE, 'x-post', ARTICLES)
+    assert 'None' not in html
+    assert 'null' not in html
+    assert '<a href="../">Home</a> &gt; <span class="current">Xの記事</span>' in html
+    assert '"position": 3' not in html
+
+
+def test_update_changes_only_the_build_block():
+    html = HAND_WRITTEN_LD + add_features.insert_breadcrumb(PAGE, 'x-post', ARTICLES, ('旧', 'tag/old/'))
+    updated = add_features.insert_breadcrumb(html, 'x-post', ARTICLES, ('新', 'tag/new/'))
+    assert updated.startswith(HAND_WRITTEN_LD)
+    assert '"name": "新"' in updated and '"name": "旧"' not in updated
+    assert '<a href="../tag/new/">新</a>' in updated
+
+
+def test_hand_written_breadcrumb_is_left_alone():
+    nav = '<nav class="breadcrumb">\n  <a href="../">Home</a>\n</nav>\n'
+    for html in (nav + PAGE, HAND_WRITTEN_LD + PAGE):
+        assert add_features.insert_breadcrumb(html, 'x-post', ARTICLES) == html
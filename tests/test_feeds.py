@@ -0,0 +1,75 @@
+"""blogbuild/feeds.py: lastmod はページの内容の日付から決まり、ファイルの更新日時に左右されない"""
+
+import os
+import shutil
+
+from blogbuild.engine import SiteStage, build
+from blogbuild.feeds import write_feeds
+from blogbuild.metadata import load_metadata
+
+SITE_STAGES = [SiteStage('site:metadata', load_metadata)]
+FINISH_STAGES = [SiteStage('finish:feeds', write_feeds)]
+
+PAGES = {
+    'index.html': '<title>Home</title><meta property="og:type" content="website">',
+    'a/index.html': ('<title>A</title><meta property="og:type" content="article">'
+                     '<meta property="article:published_time" content="2026-02-17T09:00:00+09:00">'),
+    'b/index.html': ('<title>B</title><meta property="og:type" content="article">'
+                     '<meta property="article:published_time" content="2026-02-01T09:00:00+09:00">'
+                     '<meta property="article:modified_time" content="2026-03-01T09:00:00+09:00">'),
+    'c/index.html': '<title>C</title><meta property="og:type" content="article">',
+    'about/index.html': '<title>About</title><meta property="og:type" content="website">',
+}
+
+
+def make_site(path):
+    for rel_path, html in PAGES.items():
+        (path / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (path / rel_path).write_text(html, encoding='utf-8')
+
+
+def run(path):
+    build(path, [], site_stages=SITE_STAGES, finish_stages=FINISH_STAGES)
+    return (path / 'sitemap.xml').read_text(encoding='utf-8')
+
+
+def lastmods(sitemap):
+    """URL → lastmod（なければ None）"""
+    result = {}
+    for url in sitemap.split('<url>')[1:]:
+        loc = url.split('<loc>')[1].split('</loc>')[0].rsplit('/blog/', 1)[1]
+        result[loc] = url.split('<lastmod>')[1].split('</lastmod>')[0] if '<lastmod>' in url else None
+    return result
+
+
+def test_lastmod_comes_from_page_dates(tmp_path):
+    make_site(tmp_path)
+    assert lastmods(run(tmp_path)) == {
+        '': '2026-03-01',  # ホームはサイトで一番新しい記事の日付
+        'a/': '2026-02-17',
+        'b/': '2026-03-01',  # 更新日があればそちら
+        'c/': None,
+        'about/': None,
+    }
+
+
+def test_feed_uses_dates_and_skips_undated_articles(tmp_path):
+    make_site(tmp_path)
+    run(tmp_path)
+    atom = (tmp_path / 'feed.xml').read_text(encoding='utf-8')
+    assert '<updated>2026-03-01T00:00:00+09:00</updated>' in atom
+    assert '<published>2026-02-01T00:00:00+09:00</published>' in atom
+    assert '/blog/c/' not in atom
+
+
+def test_fresh_checkout_gives_same_sitemap(tmp_path):
+    first = tmp_path / 'first'
+    first.mkdir()
+    make_site(first)
+    sitemap = run(first)
+    # 別のチェックアウト（更新日時もインデックスもない）でビルドし直しても変わらない
+    second = tmp_path / 'second'
+    shutil.copytree(first, second, ignore=shutil.ignore_patterns('.*', 'sitemap.xml', 'feed.*'))
+    for rel_path in PAGES:
+        os.utime(second / rel_path, (0, 0))
+    assert run(second) == sitemap
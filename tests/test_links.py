@@ -0,0 +1,131 @@
+"""blogbuild/links.py: 内部リンクのチェックと、外部のURLのステータス（ローカルのスタブサーバーで）"""
+
+import asyncio
+
+from blogbuild.links import MAX_REDIRECTS, fetch_status, find_broken
+
+
+def page(links=(), ids=()):
+    """scan_pages の1ページ分: リンクは [行, 属性, URL]"""
+    return {'links': [[line, 'href', url] for line, url in links], 'ids': sorted(ids)}
+
+
+def test_find_broken_reports_missing_file():
+    pages = {'day1/index.html': page([(10, '../day2/'), (11, '../about/')])}
+    files = {'day1/index.html', 'about/index.html'}
+    broken, _ = find_broken(pages, files)
+    assert broken == [('day1/index.html', 10, '../day2/', 'ファイルがありません')]
+
+
+def test_find_broken_reports_missing_fragment():
+    pages = {
+        'day1/index.html': page([(5, '#sec-1'), (6, '#sec-9'), (7, '../about/#profile'), (8, '#top')], ids={'sec-1'}),
+        'about/index.html': page(ids={'intro'}),
+    }
+    broken, _ = find_broken(pages, set(pages))
+    assert broken == [
+        ('day1/index.html', 6, '#sec-9', '#sec-9 がありません'),
+        ('day1/index.html', 7, '../about/#profile', '#profile がありません'),
+    ]
+
+
+def test_find_broken_accepts_directory_without_slash():
+    pages = {'day1/index.html': page([(3, '../about')]), 'about/index.html': page()}
+    broken, _ = find_broken(pages, set(pages))
+    assert broken == []
+
+
+def test_find_broken_reports_link_leaving_site():
+    pages = {'index.html': page([(4, '../other-repo/'), (5, 'https://daisuki-koshian.github.io/')])}
+    broken, external = find_broken(pages, set(pages))
+    assert [(line, reason) for _, line, _, reason in broken] == [
+        (4, 'サイトの外を指しています'),
+        (5, 'サイトの外を指しています'),
+    ]
+    assert external == {}
+
+
+def test_find_broken_collects_external_urls():
+    pages = {
+        'day1/index.html': page([(1, 'https://example.com/a#x'), (2, 'mailto:me@example.com')]),
+        'about/index.html': page([(9, 'https://example.com/a')]),
+    }
+    broken, external = find_broken(pages, set(pages))
+    assert broken == []
+    assert external == {'https://example.com/a': [('about/index.html', 9), ('day1/index.html', 1)]}
+
+
+# --- fetch_status ---
+
+# パス → (HEAD のステータス, GET のステータス, 追加のヘッダー)
+ROUTES = {
+    '/ok': (200, 200, ''),
+    '/missing': (404, 404, ''),
+    '/old': (301, 301, 'Location: /ok\r\n'),
+    '/loop': (302, 302, 'Location: /loop\r\n'),
+    '/no-head': (405, 200, ''),
+}
+
+
+async def with_stub_server(func):
+    """ROUTES に答えるHTTPサーバーを立てて func(origin, 受けたリクエスト) を実行する"""
+    requests = []
+
+    async def handle(reader, writer):
+        method, path, _ = (await reader.readline()).decode('ascii').split()
+        headers = {}
+        while (line := await reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        requests.append((method, path, headers.get('host')))
+        head, get, extra = ROUTES.get(path, (404, 404, ''))
+        status = head if method == 'HEAD' else get
+        writer.write(f'HTTP/1.1 {status} X\r\n{extra}Content-Length: 0\r\nConnection: close\r\n\r\n'.encode('ascii'))
+        await writer.drain()
+        writer.close()
+
+    server = await asyncio.start_server(handle, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        return await func(f'http://127.0.0.1:{port}', requests)
+
+
+def fetch(url):
+    """(ステータス, スタブサーバーが受けたリクエスト)"""
+    async def run(origin, requests):
+        return await fetch_status(url, origin, timeout=5), requests
+    return asyncio.run(with_stub_server(run))
+
+
+def test_fetch_status_ok():
+    status, requests = fetch('https://example.com/ok')
+    assert status == 200
+    assert requests == [('HEAD', '/ok', 'example.com')]
+
+
+def test_fetch_status_not_found():
+    status, _ = fetch('https://example.com/missing')
+    assert status == 404
+
+
+def test_fetch_status_follows_redirect():
+    status, requests = fetch('https://example.com/old')
+    assert status == 200
+    assert [path for _, path, _ in requests] == ['/old', '/ok']
+
+
+def test_fetch_status_gives_up_on_redirect_loop():
+    status, requests = fetch('https://example.com/loop')
+    assert status == 310
+    assert len(requests) == MAX_REDIRECTS + 1
+
+
+def test_fetch_status_retries_with_get_on_405():
+    status, requests = fetch('https://example.com/no-head')
+    assert status == 200
+    assert [method for method, _, _ in requests] == ['HEAD', 'GET']
+
+
+def test_fetch_status_quotes_non_ascii_path():
+    _, requests = fetch('https://example.com/タグ/?q=検索')
+    assert requests[0][1] == '/%E3%82%BF%E3%82%B0/?q=%E6%A4%9C%E7%B4%A2'
@@ -0,0 +1,114 @@
+"""blogbuild/manifest.py と差分ビルド: どのページを作り直すかの判定（依存メタデータ・内容・変換コード）"""
+
+import os
+
+from blogbuild.engine import Stage, build
+from blogbuild.manifest import Manifest, code_hash, stable_hash
+
+# ページの <title> の後ろに付ける文字列（スラッグ → 文字列）。テストの中で書き換える
+LABELS = {}
+
+
+def label(page, site):
+    page.html = page.html.replace('</title>', f' | {LABELS.get(page.slug, "")}</title>')
+
+
+def label_deps(page, site):
+    return [f'label:{page.slug}']
+
+
+def is_labeled(page, site):
+    return page.slug in LABELS
+
+
+def resolve(site, key):
+    return stable_hash(LABELS.get(key.split(':', 1)[1]))
+
+
+STAGES = [Stage('label', label, is_labeled, deps=label_deps)]
+
+
+def make_site(tmp_path):
+    for slug in ('a', 'b', 'c'):
+        (tmp_path / slug).mkdir()
+        (tmp_path / slug / 'index.html').write_text(f'<title>{slug}</title>', encoding='utf-8')
+    LABELS.clear()
+    LABELS.update({'a': 'A', 'b': 'B'})
+
+
+def rebuilt(tmp_path, **kwargs):
+    site, _ = build(tmp_path, STAGES, resolve=resolve, **kwargs)
+    return sorted(page.slug for page in site.pages)
+
+
+def test_second_build_skips_everything(tmp_path):
+    make_site(tmp_path)
+    assert rebuilt(tmp_path) == ['a', 'b', 'c']
+    assert (tmp_path / 'a' / 'index.html').read_text(encoding='utf-8') == '<title>a | A</title>'
+    assert rebuilt(tmp_path) == []
+
+
+def test_changed_dependency_rebuilds_only_that_page(tmp_path):
+    make_site(tmp_path)
+    rebuilt(tmp_path)
+    LABELS['a'] = 'A2'
+    assert rebuilt(tmp_path) == ['a']
+
+
+def test_page_without_the_stage_does_not_depend_on_it(tmp_path):
+    make_site(tmp_path)
+    rebuilt(tmp_path)
+    # c にはステージが適用されないので、c の依存キーは記録されていない
+    manifest = Manifest.load(tmp_path / '.build-manifest.json')
+    assert manifest.pages['c/index.html']['deps'] == {}
+    assert sorted(manifest.pages['a/index.html']['deps']) == ['label:a']
+
+
+def test_touched_page_with_same_content_is_not_rebuilt(tmp_path):
+    make_site(tmp_path)
+    rebuilt(tmp_path)
+    path = tmp_path / 'b' / 'index.html'
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert rebuilt(tmp_path) == []
+    manifest = Manifest.load(tmp_path / '.build-manifest.json')
+    assert manifest.stat_matches('b/index.html', path.stat())
+
+
+def test_edited_page_is_rebuilt(tmp_path):
+    make_site(tmp_path)
+    rebuilt(tmp_path)
+    (tmp_path / 'c' / 'index.html').write_text('<title>c2</title>', encoding='utf-8')
+    assert rebuilt(tmp_path) == ['c']
+
+
+def test_full_rebuilds_everything(tmp_path):
+    make_site(tmp_path)
+    rebuilt(tmp_path)
+    assert rebuilt(tmp_path, full=True) == ['a', 'b', 'c']
+
+
+def test_matches_on_unknown_page():
+    manifest = Manifest('unused')
+    assert not manifest.deps_match('x/index.html', {})
+    assert not manifest.content_matches('x/index.html', 'hash')
+
+
+def test_content_matches_source_or_output(tmp_path):
+    manifest = Manifest('unused')
+    manifest.record('a/index.html', 'source', 'output', {'k': '1'}, (tmp_path).stat())
+    assert manifest.content_matches('a/index.html', 'source')
+    assert manifest.content_matches('a/index.html', 'output')
+    assert not manifest.content_matches('a/index.html', 'other')
+    assert manifest.deps_match('a/index.html', {'k': '1'})
+    assert not manifest.deps_match('a/index.html', {'k': '2'})
+
+
+def test_code_hash_ignores_data_names(tmp_path):
+    path = tmp_path / 'transform.py'
+    path.write_text("CATEGORIES = {'a': 1}\n\ndef f():\n    return 1\n", encoding='utf-8')
+    before = code_hash([path], ['CATEGORIES'])
+    path.write_text("CATEGORIES = {'a': 2}\n\n# コメントだけ変えた\ndef f():\n    return 1\n", encoding='utf-8')
+    assert code_hash([path], ['CATEGORIES']) == before
+    path.write_text("CATEGORIES = {'a': 2}\n\ndef f():\n    return 2\n", encoding='utf-8')
+    assert code_hash([path], ['CATEGORIES']) != before
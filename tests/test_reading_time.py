@@ -0,0 +1,28 @@
+"""add_features.insert_reading_time: ビルドが入れた .reading-time の分数だけを更新する"""
+
+import add_features
+
+HERO_END = '<div class="hero">Hero\n</div>\n</div>\n\n<div class="content-wrapper">\n'
+
+
+def test_insert_and_refresh_minutes():
+    html = add_features.insert_reading_time(HERO_END, 'x-post', {'x-post': {'reading_time': 4}})
+    assert html.count('class="reading-time"') == 1
+    assert '⏱ 約4分で読めます' in html
+    html = add_features.insert_reading_time(html, 'x-post', {'x-post': {'reading_time': 7}})
+    assert html.count('class="reading-time"') == 1
+    assert '⏱ 約7分で読めます' in html and '約4分' not in html
+
+
+def test_refresh_does_not_touch_text_outside_the_element():
+    quoted = '<p>見出しの例: ⏱ 約9分で読めます</p>\n'
+    html = quoted + add_features.insert_reading_time(HERO_END, 'x-post', {'x-post': {'reading_time': 4}})
+    html = add_features.insert_reading_time(html, 'x-post', {'x-post': {'reading_time': 5}})
+    assert html.startswith(quoted)
+    assert '⏱ 約5分で読めます\n</div>' in html
+
+
+def test_hand_written_reading_time_is_left_alone():
+    for mark in ('<p><strong>⏱ 約6分</strong></p>\n', '<div style="color: #999">\n  ⏱ 約6分で読めます\n</div>\n'):
+        html = mark + HERO_END
+        assert add_features.insert_reading_time(html, 'x-post', {'x-post': {'reading_time': 5}}) == html
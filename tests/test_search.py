@@ -0,0 +1,75 @@
+"""blogbuild/search.py: トークンの区切り方とシャードの番号（サイドバーのスクリプトと同じになるか）"""
+
+import json
+import re
+import shutil
+import subprocess
+
+import pytest
+
+from blogbuild.search import SEARCH_JS, build_index, query_index, shard_of, split_shards, tokenize
+
+SAMPLES = [
+    'Claude Codeで自動化',
+    'ＡＩエージェント①',  # 全角の英字・丸数字は NFKC で半角に
+    '字',
+    'GPT-4o と o3-mini を比べた',
+    '「バックテスト」の失敗談',
+    '漢字ひらがなカタカナ混在',
+    '𠮷野家',  # サロゲートペア（スクリプトはUTF-16のコード単位で数える）
+    '',
+]
+TOKENS = ['claude', '自動', '動化', 'a', '𠮷', 'é', 'バッ']
+COUNTS = [1, 3, 7, 256]
+
+
+def test_tokenize_splits_words_and_bigrams():
+    assert list(tokenize('Claude Codeで自動化')) == ['claude', 'code', 'で自', '自動', '動化']
+    assert list(tokenize('字')) == ['字']
+    assert list(tokenize('ＡＩ①')) == ['ai1']
+
+
+def test_shard_of_is_fnv1a():
+    # FNV-1a (32bit) の既知の値
+    assert shard_of('a', 2 ** 32) == 0xe40c292c
+    assert shard_of('foobar', 2 ** 32) == 0xbf9cf968
+    assert all(0 <= shard_of(token, 7) < 7 for token in TOKENS)
+
+
+def test_query_finds_documents_with_all_tokens():
+    docs = [('a/', '自動化の話', '', 'cron で毎朝'), ('b/', '自動売買', '', 'バックテスト')]
+    shards = split_shards(build_index(docs))
+    index = {'docs': [list(doc[:2]) for doc in docs], 'shards': [str(n) for n in range(len(shards))]}
+
+    def load(name):
+        return shards[int(name)]
+
+    assert query_index(index, load, '自動') == [['a/', '自動化の話'], ['b/', '自動売買']]
+    assert query_index(index, load, '自動 cron') == [['a/', '自動化の話']]
+    assert query_index(index, load, '存在しない') == []
+
+
+def script_function(name):
+    """SEARCH_JS から関数の定義を取り出す"""
+    match = re.search(rf'^  function {name}\(.*?^  }}$', SEARCH_JS, re.MULTILINE | re.DOTALL)
+    assert match, name
+    return match.group(0)
+
+
+@pytest.mark.skipif(shutil.which('node') is None, reason='node がない')
+def test_script_agrees_with_python():
+    program = '\n'.join([
+        script_function('tokenize'),
+        script_function('shardOf'),
+        'var input = JSON.parse(require("fs").readFileSync(0, "utf8"));',
+        'console.log(JSON.stringify({',
+        '  tokens: input.samples.map(tokenize),',
+        '  shards: input.tokens.map(function(t) { return input.counts.map(function(c) { return shardOf(t, c); }); })',
+        '}));',
+    ])
+    tokens = TOKENS + [token for sample in SAMPLES for token in tokenize(sample)]
+    data = json.dumps({'samples': SAMPLES, 'tokens': tokens, 'counts': COUNTS})
+    result = json.loads(subprocess.run(['node', '-e', program], input=data, capture_output=True,
+                                       text=True, check=True).stdout)
+    assert result['tokens'] == [list(dict.fromkeys(tokenize(sample))) for sample in SAMPLES]
+    assert result['shards'] == [[shard_of(token, count) for count in COUNTS] for token in tokens]